@@ -0,0 +1,206 @@
+"""Memory benchmarks with per-operation budgets.
+
+Runs the operations of the benchmark suite (key setup, single block, bulk per
+engine and batch size; the per-block engines only at their smallest batch,
+as their cost per block does not depend on the batch) under ``tracemalloc``
+and reports, per operation and per block, the peak traced memory above the
+starting point, the memory still held afterwards and the bytes allocated along
+the way, freed or not. The allocated bytes are the allocation churn: they are
+summed from the growth of traced memory between bytecode instructions, so
+memory allocated and freed within one instruction (inside a C function) is not
+counted, and neither are objects reused from CPython's free lists. Each
+operation runs once untraced first, so one-off costs (imports, compiled code,
+caches) are not counted.
+
+    python benchmarks/memory.py              check against the budgets
+    python benchmarks/memory.py --update     write budgets from this run
+
+The run fails when an operation exceeds any of its budgets. Budgets written
+by ``--update`` are the measured values times ``--headroom``; budgets of
+operations not run here, such as those of unavailable backends, are kept.
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import sys
+import tracemalloc
+from typing import Optional
+
+from suite import PER_BLOCK_ENGINES, SCALAR_BATCH_SIZES, benchmarks
+
+BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory.json")
+DEFAULT_HEADROOM = 1.5
+# Floors for budgets, so near-zero measurements do not fail on noise.
+MIN_BUDGET = 4096
+
+
+def operations() -> dict:
+    """Operations of ``suite.benchmarks()`` measured against the budgets"""
+    skipped = {
+        f"bulk.{engine}.{size}"
+        for engine in PER_BLOCK_ENGINES
+        for size in SCALAR_BATCH_SIZES[1:]
+    }
+
+    return {name: value for name, value in benchmarks().items() if name not in skipped}
+
+
+def _allocated(function) -> int:
+    """Traced bytes allocated by one call, summed between bytecode
+    instructions"""
+    traced = tracemalloc.get_traced_memory
+    # Bytes allocated so far and traced memory at the last instruction; the
+    # tracer keeps nothing else, so it does not count its own allocations.
+    state = [0, 0]
+
+    def trace(frame, event, arg):
+        frame.f_trace_opcodes = True
+        current = traced()[0]
+        if current > state[1]:
+            state[0] += current - state[1]
+        state[1] = current
+        return trace
+
+    tracemalloc.start()
+    try:
+        state[1] = traced()[0]
+        sys.settrace(trace)
+        try:
+            function()
+        finally:
+            sys.settrace(None)
+    finally:
+        tracemalloc.stop()
+
+    return state[0]
+
+
+def measure(function) -> dict:
+    """Peak, retained and allocated traced bytes of one call, after an
+    untraced warm-up"""
+    function()
+    gc.collect()
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        function()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "peak": peak - before,
+        "retained": max(0, after - before),
+        "allocated": _allocated(function),
+    }
+
+
+def run() -> dict:
+    results = {}
+
+    print(
+        f"{'operation':<24} {'peak':>12} {'retained':>10} {'allocated':>12} "
+        f"{'peak/block':>12} {'retained/block':>15} {'allocated/block':>16}"
+    )
+
+    for name, (function, blocks) in operations().items():
+        result = measure(function)
+        results[name] = result
+
+        per_block = max(1, blocks)
+        print(
+            f"{name:<24} {result['peak']:>12} {result['retained']:>10} "
+            f"{result['allocated']:>12} "
+            f"{result['peak'] / per_block:>12.1f} "
+            f"{result['retained'] / per_block:>15.1f} "
+            f"{result['allocated'] / per_block:>16.1f}"
+        )
+
+    return results
+
+
+def budgets(results: dict, headroom: float) -> dict:
+    return {
+        name: {
+            metric: max(MIN_BUDGET, math.ceil(value * headroom))
+            for metric, value in result.items()
+        }
+        for name, result in results.items()
+    }
+
+
+def check(results: dict, limits: dict) -> list:
+    """``(operation, metric, value, budget)`` for every exceeded budget"""
+    failures = []
+
+    for name, result in results.items():
+        if name not in limits:
+            print(f"{name:<24} no budget, skipped")
+            continue
+
+        for metric, value in result.items():
+            budget = limits[name].get(metric)
+            if budget is not None and value > budget:
+                failures.append((name, metric, value, budget))
+
+    return failures
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budgets", default=BUDGETS, help="budgets JSON file")
+    parser.add_argument(
+        "--update", action="store_true", help="write budgets from this run"
+    )
+    parser.add_argument(
+        "--headroom",
+        type=float,
+        default=DEFAULT_HEADROOM,
+        help="budget as a multiple of the measured value (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    results = run()
+
+    if args.update:
+        try:
+            with open(args.budgets) as file:
+                limits = json.load(file)
+        except FileNotFoundError:
+            limits = {}
+
+        limits.update(budgets(results, args.headroom))
+        with open(args.budgets, "w") as file:
+            json.dump(limits, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+        print(f"\nbudgets written to {args.budgets}")
+        return 0
+
+    try:
+        with open(args.budgets) as file:
+            limits = json.load(file)
+    except FileNotFoundError:
+        print(f"\nno budgets at {args.budgets}, run with --update first.")
+        return 1
+
+    failures = check(results, limits)
+
+    for name, metric, value, budget in failures:
+        print(f"{name}: {metric} {value} bytes exceeds the budget of {budget} bytes.")
+
+    if failures:
+        print(f"\n{len(failures)} budget(s) exceeded.")
+        return 1
+
+    print("\nall operations within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Startup cost of ``python -c "import fragment"``, next to a bare interpreter."""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def run(code: str, repeat: int) -> list:
+    env = dict(os.environ, PYTHONPATH=SOURCE)
+    timings = []
+
+    for _ in range(repeat):
+        a = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+        b = time.perf_counter()
+
+        timings.append(b - a)
+
+    return timings
+
+
+def main(repeat: int = 20) -> None:
+    # Warm-up (fills the OS file cache and writes .pyc files)
+    run("import fragment", 2)
+
+    for label, code in (
+        ("python -c pass", "pass"),
+        ("import fragment", "import fragment"),
+        ("import fragment + Fragment256", "import fragment; fragment.Fragment256"),
+        ("import fragment + numpy engine", "import fragment; fragment.vectorized"),
+    ):
+        timings = run(code, repeat)
+        print(
+            f"{label:<32} median {statistics.median(timings) * 1e3:7.2f} ms, "
+            f"min {min(timings) * 1e3:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
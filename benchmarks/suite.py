@@ -0,0 +1,304 @@
+"""Benchmark suite with a stored baseline and regression gating.
+
+Measures ``key_schedule``, single-block ``encrypt``/``decrypt`` latency and
+bulk throughput of every available backend at several batch sizes. Each metric
+is the time of one operation: after warm-up runs, the number of calls per
+sample is doubled until a sample lasts ``MIN_SAMPLE_TIME``, and the fastest,
+median and interquartile range of the samples are reported.
+
+    python benchmarks/suite.py               compare against the baseline
+    python benchmarks/suite.py --update      write the baseline
+    python benchmarks/suite.py --tolerance 0.5
+
+The run fails when a metric's fastest sample is slower than the baseline's
+fastest sample by more than the tolerance. Interference only ever adds time,
+so the fastest sample is far steadier than the median and the gate does not
+fail on jitter alone. A fixed pure-Python workload is timed next to every
+metric and the baseline is scaled by how much faster or slower it ran, so a
+machine that is slower as a whole for a while (throttling, a busy host) does
+not fail the run either. A metric that still looks slower is measured again,
+up to ``--retries`` times, keeping its fastest run for the machine's speed.
+Metrics missing on either side (a backend that is not available here) are
+reported and skipped. Baselines are machine specific.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Optional
+
+from fragment.fragment_256 import BLOCK_SIZE, decrypt, encrypt, key_schedule
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+WARMUP = 3
+SAMPLES = 15
+MIN_SAMPLE_TIME = 0.02
+RETRIES = 2
+
+BATCH_SIZES = (16, 256, 4096)
+# Per-block Python engines are only timed on small batches.
+SCALAR_BATCH_SIZES = (16, 256)
+PER_BLOCK_ENGINES = ("scalar", "unrolled")
+
+KEY = bytes(range(32))
+BLOCK = bytes(range(32, 64))
+
+
+def engines() -> dict:
+    """Name -> (bulk encrypt function, batch sizes) of every available backend"""
+    from fragment import backends
+    from fragment.threads import default_workers
+
+    result = {}
+
+    for name in backends.available_backends():
+        backend = backends.get_backend(name)
+        workers = default_workers() if backend.parallel else 1
+
+        result[name] = (
+            lambda data, round_keys, function=backend.encrypt, workers=workers: (
+                function(data, round_keys, workers)
+            ),
+            SCALAR_BATCH_SIZES if name in PER_BLOCK_ENGINES else BATCH_SIZES,
+        )
+
+    return result
+
+
+def benchmarks() -> dict:
+    """Metric name -> (function taking no arguments, blocks per call)"""
+    round_keys = key_schedule(encryption_key=KEY)
+    result = {
+        "key_schedule": (lambda: key_schedule(encryption_key=KEY), 0),
+        "encrypt_block": (lambda: encrypt(data=BLOCK, round_keys=round_keys), 1),
+        "decrypt_block": (lambda: decrypt(data=BLOCK, round_keys=round_keys), 1),
+    }
+
+    for name, (function, sizes) in engines().items():
+        for size in sizes:
+            data = bytes(size * BLOCK_SIZE)
+            result[f"bulk.{name}.{size}"] = (
+                lambda function=function, data=data: function(data, round_keys),
+                size,
+            )
+
+    return result
+
+
+def _calibrate(function) -> int:
+    """Calls per sample for a sample to last ``MIN_SAMPLE_TIME``"""
+    loops = 1
+
+    while _time(function, loops) * loops < MIN_SAMPLE_TIME:
+        loops *= 2
+
+    return loops
+
+
+def _time(function, loops: int) -> float:
+    """Time of one call, from ``loops`` calls in a row"""
+    a = time.perf_counter()
+    for _ in range(loops):
+        function()
+
+    return (time.perf_counter() - a) / loops
+
+
+def _reference() -> int:
+    """Fixed workload timing the speed of the machine"""
+    x = 0
+    for i in range(1000):
+        x = (x * 31 + i) & 0xFFFFFFFF
+
+    return x
+
+
+def measure(
+    function, warmup: int = WARMUP, samples: int = SAMPLES, reference=None
+) -> dict:
+    """Fastest, median and interquartile range of the time of one call, in
+    seconds.
+
+    With a ``reference`` function, the fastest time of one call of it is
+    returned as well, its samples taken in turn with those of ``function`` so
+    that both see the machine in the same state.
+    """
+    for _ in range(warmup):
+        function()
+
+    loops = _calibrate(function)
+    reference_loops = _calibrate(reference) if reference else 0
+    timings = []
+    reference_timings = []
+
+    for _ in range(samples):
+        if reference:
+            reference_timings.append(_time(reference, reference_loops))
+        timings.append(_time(function, loops))
+
+    q1, median, q3 = statistics.quantiles(timings, n=4)
+    result = {"min": min(timings), "median": median, "iqr": q3 - q1, "loops": loops}
+
+    if reference:
+        result["reference"] = min(reference_timings)
+
+    return result
+
+
+def run(warmup: int = WARMUP, samples: int = SAMPLES) -> dict:
+    results = {}
+
+    for name, (function, blocks) in benchmarks().items():
+        result = measure(function, warmup, samples, _reference)
+        results[name] = result
+
+        rate = f"{blocks / result['min']:>12.0f} blocks/s" if blocks else ""
+        print(
+            f"{name:<24} {result['min'] * 1e6:>12.1f} us "
+            f"(median {result['median'] * 1e6:>10.1f} "
+            f"± {result['iqr'] * 1e6:>9.1f}) {rate}"
+        )
+
+    return results
+
+
+def remeasure(
+    results: dict, names: list, warmup: int = WARMUP, samples: int = SAMPLES
+) -> None:
+    """Measure ``names`` again, keeping the run of each in ``results`` that is
+    faster for the speed of the machine at the time"""
+    operations = benchmarks()
+
+    def relative(result: dict) -> float:
+        return result["min"] / result.get("reference", 1.0)
+
+    for name in names:
+        result = measure(operations[name][0], warmup, samples, _reference)
+
+        if relative(result) < relative(results[name]):
+            results[name] = result
+
+
+def environment() -> dict:
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names of metrics whose fastest sample is slower than the baseline's
+    beyond tolerance, once scaled by the speed of the machine"""
+    regressions = []
+    metrics = baseline["metrics"]
+
+    print(
+        f"\n{'metric':<24} {'baseline':>12} {'current':>12} {'machine':>8} "
+        f"{'change':>8}"
+    )
+
+    for name in sorted(set(results) | set(metrics)):
+        if name not in results or "min" not in metrics.get(name, {}):
+            side = "baseline" if name in results else "this run"
+            print(f"{name:<24} not in {side}, skipped")
+            continue
+
+        old, new = metrics[name]["min"], results[name]["min"]
+        # Baselines recorded without a reference are compared unscaled.
+        reference = results[name].get("reference")
+        recorded = metrics[name].get("reference")
+        speed = reference / recorded if reference and recorded else 1.0
+        change = new / (old * speed) - 1
+        status = ""
+
+        if change > tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+
+        print(
+            f"{name:<24} {old * 1e6:>9.1f} us {new * 1e6:>9.1f} us "
+            f"{speed - 1:>+8.1%} {change:>+8.1%} {status}"
+        )
+
+    return regressions
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument(
+        "--update", action="store_true", help="write the baseline instead"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=float(os.environ.get("BENCH_TOLERANCE", DEFAULT_TOLERANCE)),
+        help="allowed slowdown as a fraction (default: %(default)s)",
+    )
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=RETRIES,
+        help="times to measure a regressed metric again (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.samples < 2:
+        parser.error("--samples must be at least 2.")
+
+    results = run(args.warmup, args.samples)
+
+    if args.update:
+        with open(args.baseline, "w") as file:
+            json.dump(
+                {"environment": environment(), "metrics": results},
+                file,
+                indent=2,
+                sort_keys=True,
+            )
+            file.write("\n")
+
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print(f"\nno baseline at {args.baseline}, run with --update first.")
+        return 1
+
+    if baseline.get("environment") != environment():
+        print("\n[WARNING] baseline was recorded on a different machine or Python.")
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    for _ in range(args.retries):
+        if not regressions:
+            break
+
+        print(f"\nmeasuring {len(regressions)} metric(s) again.")
+        remeasure(results, regressions, args.warmup, args.samples)
+        regressions = compare(results, baseline, args.tolerance)
+
+    if regressions:
+        count = len(regressions)
+        print(f"\n{count} metric(s) regressed by more than {args.tolerance:.0%}.")
+        return 1
+
+    print(f"\nno regressions beyond {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Thread pool engine against the serial engine it splits up."""
+
+import secrets
+import sys
+import time
+from typing import Optional
+
+from fragment import threads
+from fragment.fragment_256 import BLOCK_SIZE, key_schedule
+
+
+def measure(function, data: bytes, round_keys: list, repeat: int = 3) -> float:
+    timings = []
+
+    for _ in range(repeat):
+        a = time.perf_counter()
+        function(data, round_keys)
+        b = time.perf_counter()
+
+        timings.append(b - a)
+
+    return min(timings)
+
+
+def main(workers: Optional[int] = None) -> None:
+    workers = workers or threads.default_workers()
+    round_keys = key_schedule(encryption_key=secrets.token_bytes(32))
+    name, (serial, _) = threads.serial_engine()
+
+    print(f"serial engine: {name}, workers: {workers}")
+    print(f"GIL disabled: {threads.gil_disabled()}")
+    print(f"threads run in parallel: {threads.threads_parallel(workers)}")
+    print(f"{'blocks':>8} {'serial MB/s':>12} {'threaded MB/s':>14} {'speedup':>8}")
+
+    for blocks in (4096, 32768, 131072):
+        data = secrets.token_bytes(blocks * BLOCK_SIZE)
+
+        serial_time = measure(serial, data, round_keys)
+        threaded_time = measure(
+            lambda x, y: threads.encrypt_blocks(x, y, workers), data, round_keys
+        )
+
+        print(
+            f"{blocks:>8} {len(data) / 1e6 / serial_time:>12.2f} "
+            f"{len(data) / 1e6 / threaded_time:>14.2f} "
+            f"{serial_time / threaded_time:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,40 @@
+"""Bulk encryption throughput of each backend, next to the scalar path."""
+
+import secrets
+import sys
+import time
+
+from suite import PER_BLOCK_ENGINES, engines
+
+from fragment.backends import backend_names
+from fragment.fragment_256 import BLOCK_SIZE, key_schedule
+
+
+def main(blocks: int = 4096) -> None:
+    round_keys = key_schedule(encryption_key=secrets.token_bytes(32))
+    data = secrets.token_bytes(blocks * BLOCK_SIZE)
+    available = engines()
+
+    for name in backend_names():
+        if name not in available:
+            print(f"[INFO] The {name} backend is not available here, skipping it.")
+
+    print(f"{'engine':<10} {'blocks':>8} {'blocks/s':>12} {'MB/s':>8}")
+
+    for name, (function, _) in available.items():
+        # The per-block engines are slow; time them on a smaller slice.
+        size = min(blocks, 256) if name in PER_BLOCK_ENGINES else blocks
+
+        # Warm-up (compiles the unrolled engine, starts pools, fills caches)
+        function(data[:BLOCK_SIZE], round_keys)
+
+        a = time.perf_counter()
+        function(data[: size * BLOCK_SIZE], round_keys)
+        b = time.perf_counter()
+
+        rate = size / (b - a)
+        print(f"{name:<10} {size:>8} {rate:>12.0f} {rate * BLOCK_SIZE / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
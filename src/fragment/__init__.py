@@ -1,37 +1,98 @@
-from random import randint
+"""Fragment-256, a 256-bit ARX block cipher based on a Feistel network.
 
+Importing the package is cheap: the cipher, modes and engines below are
+loaded from their modules on first attribute access, so NumPy and other
+heavy backends are only imported by code that uses them.
+"""
 
-def logical_not(x):
-    return ~x
+from importlib import import_module
 
+# Public name -> module that defines it.
+_EXPORTS = {
+    # Core cipher
+    "BLOCK_SIZE": "fragment_256",
+    "key_schedule": "fragment_256",
+    "encrypt": "fragment_256",
+    "decrypt": "fragment_256",
+    "Fragment256": "cipher",
+    # Instrumentation
+    "enable_instrumentation": "fragment_256",
+    "disable_instrumentation": "fragment_256",
+    "reset_instrumentation": "fragment_256",
+    "instrumentation_snapshot": "fragment_256",
+    # Key schedule cache
+    "KeyScheduleCache": "keycache",
+    "default_cache": "keycache",
+    # Modes
+    "CounterMode": "ctr",
+    "ctr_encrypt": "ctr",
+    "ctr_decrypt": "ctr",
+    "ecb_encrypt": "modes",
+    "ecb_decrypt": "modes",
+    "cbc_encrypt": "modes",
+    "cbc_decrypt": "modes",
+    "cbc_cts_encrypt": "modes",
+    "cbc_cts_decrypt": "modes",
+    # Engines
+    "compile_encryptor": "unrolled",
+    "encrypt_blocks": "backends",
+    "decrypt_blocks": "backends",
+    "register_backend": "backends",
+    "tune": "backends",
+    "encrypt_blocks_multikey": "vectorized",
+    "decrypt_blocks_multikey": "vectorized",
+    "key_schedule_batch": "vectorized",
+    "CipherPool": "pool",
+    # Streaming
+    "encrypt_iter": "ctr",
+    "decrypt_iter": "ctr",
+    "encrypt_stream": "aio",
+    "decrypt_stream": "aio",
+    # Containers and file objects
+    "ContainerReader": "container",
+    "ContainerWriter": "container",
+    "IntegrityError": "integrity",
+    "EncryptedFile": "fileio",
+    # Buffer API
+    "encrypt_into": "buffers",
+    "decrypt_into": "buffers",
+}
 
-def logical_and(x, y):
-    return x & y
+_SUBMODULES = (
+    "aio",
+    "backends",
+    "buffers",
+    "cipher",
+    "container",
+    "ctr",
+    "fileio",
+    "fragment_256",
+    "integrity",
+    "keycache",
+    "lanes",
+    "metrics",
+    "modes",
+    "pool",
+    "threads",
+    "unrolled",
+    "vectorized",
+)
 
+__all__ = list(_EXPORTS) + list(_SUBMODULES)
 
-def logical_xor(x, y):
-    return x ^ y
 
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return import_module(f".{name}", __name__)
 
-def evaluate_expression_a(x, y, z):
-    not_y = logical_not(y)
-    and_result = logical_and(not_y, z)
-    xor_result = logical_xor(and_result, x)
-    return xor_result
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
+    value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
 
-def evaluate_expression_b(x, y, z):
-    return (~y & z) ^ x
+    return value
 
 
-# Example usage:
-x = randint(0, pow(2, 32))
-y = randint(0, pow(2, 32))
-z = randint(0, pow(2, 32))
-
-res_a = evaluate_expression_a(x, y, z)
-res_b = evaluate_expression_b(x, y, z)
-
-print(f"x={x}, y={y}, z={z}")
-print("Result A:", res_a)
-print("Result B:", res_b)
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,102 @@
+"""Fragment-256 Asyncio Streaming.
+
+Counter mode encryption of asyncio streams. Incoming data is grouped into
+large chunks and the cipher work runs in a bounded executor, off the event
+loop. At most ``max_in_flight`` chunks are read ahead of the writer, so
+memory stays bounded when the consumer is slow: reading stops until the
+oldest chunk has been written and drained.
+"""
+
+import asyncio
+from collections import deque
+
+from .ctr import DEFAULT_COUNTER_BITS, CounterMode
+
+# 1 MiB, a whole number of blocks so each chunk starts on a block boundary.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+async def _read_chunk(reader, size: int) -> bytes:
+    try:
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError as error:
+        return error.partial
+
+
+async def encrypt_stream(
+    reader,
+    writer,
+    round_keys,
+    nonce: bytes,
+    counter_bits: int = DEFAULT_COUNTER_BITS,
+    initial_counter: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    executor=None,
+) -> int:
+    """Encrypt everything ``reader`` yields into ``writer`` in counter mode.
+
+    Args:
+        reader: ``asyncio.StreamReader`` (anything with ``readexactly``).
+        writer: ``asyncio.StreamWriter`` (anything with ``write``/``drain``).
+            It is drained but not closed.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+        nonce (bytes): Counter mode nonce, see ``CounterMode``.
+        counter_bits (int): Counter width.
+        initial_counter (int): Counter value of the first block.
+        chunk_size (int): Bytes per executor job.
+        max_in_flight (int): Chunks read ahead of the writer.
+        executor: ``concurrent.futures`` executor for the cipher work. Defaults
+            to the shared thread pool of ``fragment.threads``.
+
+    Returns:
+        int: Number of bytes processed.
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be positive.")
+
+    if executor is None:
+        from .threads import executor as shared_executor
+
+        executor = shared_executor()
+
+    mode = CounterMode(
+        round_keys=round_keys,
+        nonce=nonce,
+        counter_bits=counter_bits,
+        initial_counter=initial_counter,
+    )
+    loop = asyncio.get_running_loop()
+    in_flight: deque = deque()
+    offset = 0
+
+    async def write_oldest() -> None:
+        writer.write(await in_flight.popleft())
+        await writer.drain()
+
+    try:
+        while True:
+            data = await _read_chunk(reader, chunk_size)
+            if not data:
+                break
+
+            in_flight.append(
+                loop.run_in_executor(executor, mode.crypt_at, offset, data)
+            )
+            offset += len(data)
+
+            if len(in_flight) >= max_in_flight:
+                await write_oldest()
+
+        while in_flight:
+            await write_oldest()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+    return offset
+
+
+# Counter mode decryption is the same keystream XOR.
+decrypt_stream = encrypt_stream
@@ -0,0 +1,572 @@
+"""Fragment-256 Backend Registry and Autotuning.
+
+Bulk block encryption through the fastest backend for this machine. Every
+backend (``scalar``, ``unrolled``, ``lanes``, ``numpy``, ``threads``,
+``processes`` and any added with ``register_backend``) takes the same
+arguments, ``function(data, round_keys, workers)``, and returns bytes.
+
+The first bulk call loads this machine's tuned profile from the cache file, or
+runs ``tune()`` and writes one when there is none. A profile holds the fastest
+backend and worker count per input size, and the chunk size large inputs are
+split into for serial backends. ``fragment tune`` runs the tuning ahead of
+time. Setting ``FRAGMENT_BACKEND`` forces one backend and skips tuning.
+
+The cache file is ``$FRAGMENT_TUNE_CACHE`` if set, otherwise a file named
+after the machine, CPU count and Python and NumPy versions under
+``$XDG_CACHE_HOME/fragment`` (``~/.cache/fragment``), so a change to any of
+them tunes again.
+"""
+
+import atexit
+import hashlib
+import json
+import math
+import os
+import platform
+import threading
+import time
+from typing import Optional
+
+from . import metrics
+from .fragment_256 import BLOCK_SIZE, b2i, decrypt, encrypt, expand_key, i2b
+
+PROFILE_VERSION = 1
+# Input sizes timed by ``tune``, in blocks.
+TUNE_SIZES = (16, 256, 4096, 32768)
+# Chunk sizes tried for serial backends, in blocks. ``None`` is no chunking.
+CHUNK_SIZES = (1024, 4096, 16384, None)
+REPEATS = 3
+# Candidates slower than the fastest by this factor are not timed on the next
+# size when their run would grow past ``PRUNE_TIME`` seconds there. This keeps
+# per-block Python backends out of long runs without dropping backends that
+# are only slow on small inputs because of a fixed overhead.
+PRUNE_FACTOR = 4.0
+PRUNE_TIME = 0.25
+
+_backends: dict = {}
+_profile: Optional[dict] = None
+_profile_lock = threading.Lock()
+_pools: dict = {}
+_pools_lock = threading.Lock()
+
+
+class Backend:
+    """A named bulk engine and when it can be used"""
+
+    __slots__ = ("name", "encrypt", "decrypt", "available", "parallel")
+
+    def __init__(self, name, encrypt, decrypt, available, parallel) -> None:
+        self.name = name
+        self.encrypt = encrypt
+        self.decrypt = decrypt
+        self.available = available
+        self.parallel = parallel
+
+
+def register_backend(
+    name: str, encrypt, decrypt, available=None, parallel: bool = False
+) -> Backend:
+    """Add or replace a backend.
+
+    Args:
+        name (str): Backend name, as stored in profiles.
+        encrypt: ``function(data, round_keys, workers) -> bytes`` encrypting a
+            buffer of whole blocks with an expanded key schedule.
+        decrypt: Same for decryption, with the same (encryption) round keys.
+        available: Function returning whether the backend can run here
+            (default: always).
+        parallel (bool): Whether the backend uses ``workers``. Parallel
+            backends are tuned per worker count and never chunked.
+
+    A backend registered after the profile was loaded is only picked once
+    ``tune()`` runs again.
+    """
+    backend = Backend(name, encrypt, decrypt, available or (lambda: True), parallel)
+    _backends[name] = backend
+
+    return backend
+
+
+def get_backend(name: str) -> Backend:
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown backend {name!r}, expected one of {tuple(_backends)}."
+        ) from None
+
+
+def backend_names() -> list:
+    """Names of the registered backends, available here or not"""
+    return list(_backends)
+
+
+def available_backends() -> list:
+    """Names of the registered backends that can run here"""
+    return [name for name, backend in _backends.items() if backend.available()]
+
+
+# Built-in backends
+
+
+def _per_block(function, data) -> bytes:
+    return b"".join(
+        i2b(function(b2i(string=data[x : x + BLOCK_SIZE], length=4)))
+        for x in range(0, len(data), BLOCK_SIZE)
+    )
+
+
+def _scalar(decrypting: bool):
+    function = decrypt if decrypting else encrypt
+    operation = "decrypt" if decrypting else "encrypt"
+
+    def crypt(data, round_keys: list, workers: int) -> bytes:
+        metrics.record_bytes(operation, "scalar", len(data))
+
+        return _per_block(
+            lambda words: function(data=words, round_keys=round_keys), data
+        )
+
+    return crypt
+
+
+def _unrolled(decrypting: bool):
+    operation = "decrypt" if decrypting else "encrypt"
+
+    def crypt(data, round_keys: list, workers: int) -> bytes:
+        from .unrolled import compile_encryptor
+
+        metrics.record_bytes(operation, "unrolled", len(data))
+        function = compile_encryptor(round_keys[::-1] if decrypting else round_keys)
+
+        return _per_block(function, data)
+
+    return crypt
+
+
+def _lanes(decrypting: bool):
+    def crypt(data, round_keys: list, workers: int) -> bytes:
+        from .lanes import decrypt_blocks, encrypt_blocks
+
+        return (decrypt_blocks if decrypting else encrypt_blocks)(data, round_keys)
+
+    return crypt
+
+
+def _numpy(decrypting: bool):
+    def crypt(data, round_keys: list, workers: int) -> bytes:
+        from .vectorized import decrypt_blocks, encrypt_blocks
+
+        return (decrypt_blocks if decrypting else encrypt_blocks)(data, round_keys)
+
+    return crypt
+
+
+def _numpy_available() -> bool:
+    try:
+        from . import vectorized  # noqa: F401
+    except ImportError:
+        return False
+
+    return True
+
+
+def _threads(decrypting: bool):
+    def crypt(data, round_keys: list, workers: int) -> bytes:
+        from .threads import decrypt_blocks, encrypt_blocks
+
+        function = decrypt_blocks if decrypting else encrypt_blocks
+
+        return function(data, round_keys, workers)
+
+    return crypt
+
+
+def _multicore() -> bool:
+    from .threads import default_workers
+
+    return default_workers() > 1
+
+
+def _pool(workers: int):
+    """Shared ``CipherPool`` per worker count, closed at exit"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+
+        if pool is None:
+            from .pool import CipherPool
+
+            pool = _pools[workers] = CipherPool(workers=workers)
+            atexit.register(pool.close)
+
+    return pool
+
+
+def _close_pools(keep: set) -> None:
+    """Close the shared pools whose worker count is not in ``keep``"""
+    with _pools_lock:
+        closing = [_pools.pop(workers) for workers in set(_pools) - keep]
+
+    for pool in closing:
+        atexit.unregister(pool.close)
+        pool.close()
+
+
+def _processes(decrypting: bool):
+    def crypt(data, round_keys: list, workers: int) -> bytes:
+        pool = _pool(workers)
+        function = pool.decrypt if decrypting else pool.encrypt
+
+        return bytes(function(data, round_keys).result())
+
+    return crypt
+
+
+for _name, _factory, _available, _parallel in (
+    ("scalar", _scalar, None, False),
+    ("unrolled", _unrolled, None, False),
+    ("lanes", _lanes, None, False),
+    ("numpy", _numpy, _numpy_available, False),
+    ("threads", _threads, _multicore, True),
+    ("processes", _processes, _multicore, True),
+):
+    register_backend(_name, _factory(False), _factory(True), _available, _parallel)
+
+
+# Profiles
+
+
+def environment() -> dict:
+    """What a tuned profile depends on"""
+    from .threads import default_workers
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None  # type: ignore[assignment]
+
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": default_workers(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": numpy.__version__ if numpy is not None else None,
+    }
+
+
+def cache_path() -> str:
+    """Profile cache file of this machine"""
+    path = os.environ.get("FRAGMENT_TUNE_CACHE")
+    if path:
+        return path
+
+    directory = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    machine = hashlib.blake2b(
+        json.dumps(environment(), sort_keys=True).encode(), digest_size=8
+    ).hexdigest()
+
+    return os.path.join(directory, "fragment", f"tune-{machine}.json")
+
+
+def load_profile(path: Optional[str] = None) -> Optional[dict]:
+    """Profile stored at ``path``, ``None`` if missing or made elsewhere"""
+    try:
+        with open(path or cache_path()) as file:
+            profile = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        not isinstance(profile, dict)
+        or profile.get("version") != PROFILE_VERSION
+        or profile.get("environment") != environment()
+    ):
+        return None
+
+    return profile
+
+
+def save_profile(profile: dict, path: Optional[str] = None) -> str:
+    """Write ``profile`` atomically. Returns the path written."""
+    path = path or cache_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(profile, file, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(temporary, path)
+
+    return path
+
+
+def _candidates() -> list:
+    """``(backend, workers)`` pairs to time"""
+    from .threads import default_workers
+
+    cpus = default_workers()
+    counts = sorted({count for count in (2, cpus // 2, cpus) if 1 < count <= cpus})
+    result: list = []
+
+    for name in available_backends():
+        if _backends[name].parallel:
+            result.extend((name, count) for count in counts)
+        else:
+            result.append((name, 1))
+
+    return result
+
+
+def _time(function, repeats: int = REPEATS) -> float:
+    """Fastest of ``repeats`` runs, after one untimed run"""
+    function()
+    best = math.inf
+
+    for _ in range(repeats):
+        a = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - a)
+
+    return best
+
+
+def _chunked(
+    function, data: memoryview, round_keys: list, chunk: Optional[int]
+) -> bytes:
+    if chunk is None or len(data) <= chunk * BLOCK_SIZE:
+        return function(data, round_keys, 1)
+
+    step = chunk * BLOCK_SIZE
+    out = bytearray(len(data))
+
+    for start in range(0, len(data), step):
+        out[start : start + step] = function(data[start : start + step], round_keys, 1)
+
+    return bytes(out)
+
+
+def _label(name: str, workers: int) -> str:
+    return name if workers == 1 else f"{name}x{workers}"
+
+
+def tune(
+    sizes: tuple = TUNE_SIZES, save: bool = True, path: Optional[str] = None
+) -> dict:
+    """Time every available backend and make the result the active profile.
+
+    Each backend and worker count is timed on inputs of ``sizes`` blocks,
+    dropping slow ones before the next size (see ``PRUNE_FACTOR``). The
+    fastest serial backend at the largest size then picks its chunk size from
+    ``CHUNK_SIZES``. Process pools started for the timing are closed, except
+    those of a chosen backend.
+
+    Args:
+        sizes (tuple): Input sizes in blocks, ascending.
+        save (bool): Write the profile to the cache file.
+        path (str): Cache file (default: ``cache_path()``).
+
+    Returns:
+        dict: The profile. ``choices`` lists the backend and worker count for
+        inputs up to ``max_blocks`` (``None`` for the rest), ``timings`` the
+        measured seconds per size and candidate.
+    """
+    round_keys = expand_key(bytes(32))
+    candidates = _candidates()
+    winners: list = []
+    timings: dict = {}
+
+    with _pools_lock:
+        existing = set(_pools)
+
+    try:
+        for index, size in enumerate(sizes):
+            data = memoryview(bytes(size * BLOCK_SIZE))
+            results = {}
+
+            for name, workers in candidates:
+                function = _backends[name].encrypt
+                results[name, workers] = _time(
+                    lambda: function(data, round_keys, workers)
+                )
+
+            fastest = min(results.values())
+            growth = sizes[index + 1] / size if index + 1 < len(sizes) else 1
+            winners.append(min(results, key=results.__getitem__))
+            candidates = [
+                candidate
+                for candidate in candidates
+                if results[candidate] <= fastest * PRUNE_FACTOR
+                or results[candidate] * growth <= PRUNE_TIME
+            ]
+            timings[str(size)] = {
+                _label(*candidate): seconds for candidate, seconds in results.items()
+            }
+    finally:
+        _close_pools(
+            existing | {workers for name, workers in winners if name == "processes"}
+        )
+
+    # Boundaries between tuned sizes at their geometric mean.
+    choices: list = []
+    for index, (name, workers) in enumerate(winners):
+        limit = None
+        if index + 1 < len(sizes):
+            limit = math.isqrt(sizes[index] * sizes[index + 1])
+
+        if (
+            choices
+            and choices[-1]["backend"] == name
+            and choices[-1]["workers"] == workers
+        ):
+            choices[-1]["max_blocks"] = limit
+        else:
+            choices.append({"max_blocks": limit, "backend": name, "workers": workers})
+
+    chunk_blocks = None
+    name, _ = winners[-1]
+    if not _backends[name].parallel:
+        function = _backends[name].encrypt
+        data = memoryview(bytes(sizes[-1] * BLOCK_SIZE))
+        chunk_times = {
+            chunk: _time(
+                lambda chunk=chunk: _chunked(function, data, round_keys, chunk),
+                repeats=2,
+            )
+            for chunk in CHUNK_SIZES
+        }
+        chunk_blocks = min(chunk_times, key=chunk_times.__getitem__)
+        timings["chunks"] = {
+            str(chunk): seconds for chunk, seconds in chunk_times.items()
+        }
+
+    profile = {
+        "version": PROFILE_VERSION,
+        "environment": environment(),
+        "choices": choices,
+        "chunk_blocks": chunk_blocks,
+        "timings": timings,
+    }
+
+    if save:
+        try:
+            save_profile(profile, path)
+        except OSError:
+            # A read-only cache still leaves the profile active in this process.
+            pass
+
+    set_profile(profile)
+
+    return profile
+
+
+def forced_profile(name: str) -> dict:
+    """Profile running every input on backend ``name``"""
+    from .threads import default_workers
+
+    backend = get_backend(name)
+
+    return {
+        "version": PROFILE_VERSION,
+        "environment": environment(),
+        "choices": [
+            {
+                "max_blocks": None,
+                "backend": name,
+                "workers": default_workers() if backend.parallel else 1,
+            }
+        ],
+        "chunk_blocks": None,
+        "timings": {},
+    }
+
+
+def set_profile(profile: Optional[dict]) -> None:
+    """Make ``profile`` the active profile. ``None`` loads or tunes again."""
+    global _profile
+
+    _profile = profile
+
+
+def profile() -> dict:
+    """Active profile: forced, cached or freshly tuned, in that order"""
+    global _profile
+
+    if _profile is None:
+        with _profile_lock:
+            if _profile is None:
+                forced = os.environ.get("FRAGMENT_BACKEND")
+                if forced:
+                    _profile = forced_profile(forced)
+                else:
+                    _profile = load_profile()
+
+                if _profile is None:
+                    _profile = tune()
+
+    return _profile
+
+
+def select(blocks: int) -> tuple:
+    """``(Backend, workers)`` for an input of ``blocks`` blocks"""
+    for choice in profile()["choices"]:
+        if choice["max_blocks"] is None or blocks <= choice["max_blocks"]:
+            backend = _backends.get(choice["backend"])
+
+            # A profile naming a backend registered in another process.
+            if backend is not None and backend.available():
+                return backend, choice["workers"]
+
+    from .threads import serial_engine
+
+    name, _ = serial_engine()
+
+    return _backends[name], 1
+
+
+def _crypt_blocks(data, round_keys, decrypting: bool):
+    if getattr(data, "ndim", 1) == 2:
+        # (N, 8) word arrays keep going to the NumPy engine, which returns arrays.
+        from .vectorized import decrypt_blocks, encrypt_blocks
+
+        return (decrypt_blocks if decrypting else encrypt_blocks)(data, round_keys)
+
+    data = memoryview(data).cast("B")
+    if len(data) % BLOCK_SIZE:
+        raise ValueError(f"data length must be a multiple of {BLOCK_SIZE} bytes.")
+    if not len(data):
+        return b""
+
+    round_keys = expand_key(round_keys)
+    backend, workers = select(len(data) // BLOCK_SIZE)
+    function = backend.decrypt if decrypting else backend.encrypt
+
+    if backend.parallel:
+        return function(data, round_keys, workers)
+
+    return _chunked(function, data, round_keys, profile()["chunk_blocks"])
+
+
+def encrypt_blocks(data, round_keys):
+    """Encrypt a buffer of whole blocks on the tuned backend.
+
+    Args:
+        data: Bytes-like buffer of N * 32 bytes, or an (N, 8) uint32 array
+            (always encrypted by the NumPy engine).
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+
+    Returns:
+        bytes: Encrypted blocks, or an array for array input.
+    """
+    return _crypt_blocks(data, round_keys, False)
+
+
+def decrypt_blocks(data, round_keys):
+    """Decrypt a buffer of whole blocks on the tuned backend.
+
+    Takes the same arguments as ``encrypt_blocks``.
+    """
+    return _crypt_blocks(data, round_keys, True)
@@ -0,0 +1,170 @@
+"""Fragment-256 Zero-Copy Buffer API.
+
+``encrypt_into``/``decrypt_into`` read whole blocks from any buffer (bytes,
+bytearray, memoryview, mmap, NumPy array) and write the result into a
+caller-supplied writable buffer, which may be the input itself.
+
+With NumPy, big-endian words are converted in bulk by dtype casts straight
+between the caller's buffers and a per-thread workspace, and every mixer
+step runs in place on that workspace. The workspace has a fixed size and is
+reused, so steady-state calls allocate no data buffers. Without NumPy the
+big-integer lane engine is used, which does allocate.
+"""
+
+import threading
+
+from . import metrics
+from .fragment_256 import BLOCK_SIZE, expand_key
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None  # type: ignore[assignment]
+
+# Blocks per workspace pass. Bounds the workspace at 56 bytes per block.
+CHUNK_BLOCKS = 16384
+# 8 state rows, 4 round function rows and 2 scratch rows.
+WORKSPACE_ROWS = 14
+
+_local = threading.local()
+
+
+def _workspace() -> list:
+    """Per-thread workspace rows, allocated on first use"""
+    rows = getattr(_local, "rows", None)
+
+    if rows is None:
+        rows = _local.rows = list(np.empty((WORKSPACE_ROWS, CHUNK_BLOCKS), np.uint32))
+
+    return rows
+
+
+def _rotate(x, shift: int, scratch) -> None:
+    """Left circular bit shift, in place"""
+    np.left_shift(x, shift, out=scratch)
+    np.right_shift(x, 32 - shift, out=x)
+    np.bitwise_or(x, scratch, out=x)
+
+
+def _arx_mixer(data: list, scratch) -> list:
+    """Four branch ARX network, in place. Returns the permuted rows."""
+    a, b, c, d = data
+
+    np.add(a, d, out=a)
+    np.bitwise_xor(b, a, out=b)
+    _rotate(b, 13, scratch)
+    np.add(b, c, out=c)
+    np.bitwise_xor(d, c, out=d)
+    _rotate(d, 17, scratch)
+    np.add(d, a, out=a)
+    np.bitwise_xor(b, a, out=b)
+    _rotate(b, 5, scratch)
+    np.add(b, c, out=c)
+    np.bitwise_xor(d, c, out=d)
+    _rotate(d, 7, scratch)
+
+    # Word permutation of updated data
+    return [b, c, d, a]
+
+
+def _pht_mixer(data: list, e, f) -> list:
+    """4 round PHT feistel network, in place. Returns the permuted rows."""
+    a, b, c, d = data
+
+    for _ in range(4):
+        # Pseudo-Hadamard transform
+        np.add(a, b, out=e)
+        np.left_shift(b, 1, out=f)
+        np.add(f, e, out=f)
+
+        np.bitwise_xor(c, e, out=c)
+        np.bitwise_xor(d, f, out=d)
+        a, b, c, d = c, d, a, b
+
+    return [c, d, a, b]
+
+
+def _encrypt_rows(rows: list, round_keys: list) -> list:
+    """Feistel network over workspace rows. Returns the rows in output order."""
+    left, right = rows[0:4], rows[4:8]
+    data, (e, f) = rows[8:12], rows[12:14]
+
+    for round_key_set in round_keys:
+        # Round function on a copy of the left half
+        for x in range(4):
+            np.bitwise_xor(left[x], round_key_set[0][x], out=data[x])
+
+        mixed = _arx_mixer(data, e)
+        for x in range(4):
+            np.bitwise_xor(mixed[x], round_key_set[1][x], out=mixed[x])
+
+        mixed = _arx_mixer(mixed, e)
+        mixed = _pht_mixer(mixed, e, f)
+
+        for x in range(4):
+            np.bitwise_xor(right[x], mixed[x], out=right[x])
+
+        # The rows of ``data`` are reused next round in their permuted order.
+        data = mixed
+        left, right = right, left
+
+    return right + left
+
+
+def _crypt_into(out, data, round_keys: list, decrypt: bool) -> None:
+    data = memoryview(data).cast("B")
+    out = memoryview(out).cast("B")
+    length = len(data)
+
+    if length % BLOCK_SIZE:
+        raise ValueError(f"data length must be a multiple of {BLOCK_SIZE} bytes.")
+    if len(out) < length:
+        raise ValueError("output buffer is smaller than the input.")
+    if out.readonly:
+        raise TypeError("output buffer is not writable.")
+
+    if np is None:
+        from . import lanes
+
+        function = lanes.decrypt_blocks if decrypt else lanes.encrypt_blocks
+        out[:length] = function(data, round_keys)
+        return
+
+    metrics.record_bytes("decrypt" if decrypt else "encrypt", "buffers", length)
+    round_keys = round_keys[::-1] if decrypt else round_keys
+
+    source = np.frombuffer(data, dtype=">u4").reshape(-1, 8)
+    target = np.frombuffer(out[:length], dtype=">u4").reshape(-1, 8)
+    rows = _workspace()
+
+    for start in range(0, len(source), CHUNK_BLOCKS):
+        count = min(CHUNK_BLOCKS, len(source) - start)
+        chunk = rows if count == CHUNK_BLOCKS else [row[:count] for row in rows]
+
+        # Big-endian words to native rows, converted by the cast
+        for word in range(8):
+            np.copyto(chunk[word], source[start : start + count, word])
+
+        result = _encrypt_rows(chunk, round_keys)
+
+        for word in range(8):
+            np.copyto(target[start : start + count, word], result[word])
+
+
+def encrypt_into(out, data, round_keys) -> None:
+    """Encrypt the whole blocks of ``data`` into the writable buffer ``out``.
+
+    Args:
+        out: Writable buffer of at least ``len(data)`` bytes; may be ``data``.
+        data: Buffer of N * 32 bytes.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+    """
+    _crypt_into(out, data, expand_key(round_keys), False)
+
+
+def decrypt_into(out, data, round_keys) -> None:
+    """Decrypt the whole blocks of ``data`` into the writable buffer ``out``.
+
+    Takes the same arguments as ``encrypt_into``.
+    """
+    _crypt_into(out, data, expand_key(round_keys), True)
@@ -0,0 +1,71 @@
+"""Fragment-256 Cipher Context."""
+
+from . import metrics
+from .fragment_256 import BLOCK_SIZE, encrypt, i2b, key_schedule
+
+
+class Fragment256:
+    """Fragment-256 cipher bound to one key.
+
+    The key schedule and its reversed copy for decryption are derived once,
+    so each call only pays for the rounds.
+
+    Args:
+        key (bytes): Encryption key.
+    """
+
+    __slots__ = ("_encryption_keys", "_decryption_keys")
+
+    def __init__(self, key: bytes) -> None:
+        round_keys = key_schedule(encryption_key=bytes(key))
+
+        self._encryption_keys = round_keys
+        self._decryption_keys = round_keys[::-1]
+
+    def encrypt_block(self, block):
+        """Encrypt one block, given as 32 bytes or a list of eight 32-bit words.
+
+        Returns the same type it was given.
+        """
+        result = encrypt(data=block, round_keys=self._encryption_keys)
+
+        return result if isinstance(block, list) else i2b(result)
+
+    def decrypt_block(self, block):
+        """Decrypt one block, given as 32 bytes or a list of eight 32-bit words.
+
+        Returns the same type it was given.
+        """
+        result = encrypt(data=block, round_keys=self._decryption_keys)
+
+        return result if isinstance(block, list) else i2b(result)
+
+    def encrypt_blocks(self, data):
+        """Encrypt a buffer of whole blocks, or an (N, 8) uint32 array."""
+        return _crypt_blocks(data, self._encryption_keys, "encrypt")
+
+    def decrypt_blocks(self, data):
+        """Decrypt a buffer of whole blocks, or an (N, 8) uint32 array."""
+        return _crypt_blocks(data, self._decryption_keys, "decrypt")
+
+
+def _crypt_blocks(data, round_keys: list, operation: str):
+    """Run ``round_keys`` in the given order over the blocks of ``data``"""
+    try:
+        from . import vectorized
+    except ImportError:
+        vectorized = None  # type: ignore[assignment]
+
+    if vectorized is not None:
+        return vectorized._crypt_blocks(data, round_keys, operation)
+
+    data = memoryview(data).cast("B")
+    if len(data) % BLOCK_SIZE:
+        raise ValueError(f"data length must be a multiple of {BLOCK_SIZE} bytes.")
+
+    metrics.record_bytes(operation, "scalar", len(data))
+
+    return b"".join(
+        i2b(encrypt(data=data[x : x + BLOCK_SIZE], round_keys=round_keys))
+        for x in range(0, len(data), BLOCK_SIZE)
+    )
@@ -0,0 +1,322 @@
+"""Fragment-256 Command Line Interface.
+
+``python -m fragment encrypt|decrypt`` encrypts large files in counter mode.
+Input and output are memory mapped. The counter space is split into
+contiguous shards, one per task, and worker processes write their results
+straight into the output mapping, so the file is never copied into memory
+as a whole.
+
+Encrypted files are the random nonce followed by the ciphertext.
+
+``python -m fragment profile`` profiles a cipher workload, see ``profiling``.
+
+``python -m fragment tune`` times the bulk backends and caches the fastest for
+this machine, see ``backends``.
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .ctr import BLOCK_SIZE, DEFAULT_COUNTER_BITS, CounterMode, nonce_size
+
+NONCE_SIZE = nonce_size(DEFAULT_COUNTER_BITS)
+# Bytes XORed per keystream call inside a shard.
+CHUNK_SIZE = 4 * 1024 * 1024
+# Shards per worker, so a slow worker does not hold up the whole file.
+SHARDS_PER_WORKER = 4
+
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+
+    return number
+
+
+def read_key(args: argparse.Namespace) -> bytes:
+    if args.key is not None:
+        return bytes.fromhex(args.key)
+
+    with open(args.key_file, "rb") as file:
+        return file.read()
+
+
+def crypt_shard(
+    source: str,
+    target: str,
+    source_offset: int,
+    target_offset: int,
+    start: int,
+    length: int,
+    round_keys: list,
+    nonce: bytes,
+) -> int:
+    """Encrypt or decrypt ``length`` bytes at keystream offset ``start``.
+
+    Runs in a worker process: both files are mapped here, so no file data
+    passes through the process pool.
+    """
+    mode = CounterMode(round_keys=round_keys, nonce=nonce)
+
+    with open(source, "rb") as source_file, open(target, "r+b") as target_file:
+        source_map = mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+        target_map = mmap.mmap(target_file.fileno(), 0, access=mmap.ACCESS_WRITE)
+
+        with source_map, target_map:
+            with memoryview(source_map) as data, memoryview(target_map) as out:
+                for done in range(0, length, CHUNK_SIZE):
+                    size = min(CHUNK_SIZE, length - done)
+                    a = source_offset + start + done
+                    b = target_offset + start + done
+
+                    mode.crypt_into(start + done, data[a : a + size], out[b : b + size])
+
+    return length
+
+
+def shards(length: int, count: int) -> list:
+    """Split ``length`` bytes into ``count`` contiguous, block aligned ranges."""
+    blocks = -(-length // BLOCK_SIZE)
+    step = -(-blocks // max(1, count)) * BLOCK_SIZE
+
+    return [(x, min(step, length - x)) for x in range(0, length, step)]
+
+
+def crypt_file(
+    source: str,
+    target: str,
+    key: bytes,
+    decrypt: bool,
+    workers: int,
+) -> int:
+    """Encrypt or decrypt ``source`` into ``target``. Returns the payload size."""
+    from .fragment_256 import expand_key
+
+    if os.path.exists(target) and os.path.samefile(source, target):
+        raise ValueError(f"{source} and {target} are the same file.")
+
+    round_keys = expand_key(key)
+    size = os.path.getsize(source)
+
+    if decrypt:
+        if size < NONCE_SIZE:
+            raise ValueError(f"{source} is too short to hold a nonce.")
+
+        with open(source, "rb") as file:
+            nonce = file.read(NONCE_SIZE)
+
+        source_offset, target_offset, length = NONCE_SIZE, 0, size - NONCE_SIZE
+    else:
+        nonce = os.urandom(NONCE_SIZE)
+        source_offset, target_offset, length = 0, NONCE_SIZE, size
+
+    with open(target, "wb") as file:
+        if not decrypt:
+            file.write(nonce)
+        file.truncate(target_offset + length)
+
+    if not length:
+        return 0
+
+    tasks = [
+        (source, target, source_offset, target_offset, start, count, round_keys, nonce)
+        for start, count in shards(length, workers * SHARDS_PER_WORKER)
+    ]
+
+    if workers == 1:
+        for task in tasks:
+            crypt_shard(*task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(crypt_shard, *task) for task in tasks]:
+                future.result()
+
+    return length
+
+
+def command_crypt(args: argparse.Namespace) -> int:
+    a = time.perf_counter()
+
+    length = crypt_file(
+        source=args.input,
+        target=args.output,
+        key=read_key(args),
+        decrypt=args.command == "decrypt",
+        workers=args.workers,
+    )
+
+    b = time.perf_counter()
+
+    print(
+        f"{args.command}ed {length} bytes in {b - a:.3f} second(s), "
+        f"{length / 1e6 / max(b - a, 1e-9):.2f} MB/s.",
+        file=sys.stderr,
+    )
+
+    return 0
+
+
+def command_profile(args: argparse.Namespace) -> int:
+    from . import profiling
+
+    function = profiling.workload(
+        name=args.workload,
+        engine=args.engine,
+        size=args.size,
+        iterations=args.iterations,
+    )
+    groups = profiling.profile(
+        function,
+        output=args.output,
+        profiler=args.profiler,
+        interval=args.interval,
+    )
+
+    unit = "us" if args.profiler == "cprofile" else "samples"
+    print(profiling.format_groups(groups, unit))
+
+    written = [f"{args.output}.folded"]
+    if args.profiler == "cprofile":
+        written.insert(0, f"{args.output}.pstats")
+    print(f"wrote {', '.join(written)}.", file=sys.stderr)
+
+    return 0
+
+
+def format_profile(profile: dict) -> str:
+    lines = [f"{'blocks':>10} {'backend':<12} {'workers':>7}"]
+
+    lower = 1
+    for choice in profile["choices"]:
+        upper = choice["max_blocks"]
+        blocks = f"{lower}-{upper}" if upper is not None else f"{lower}+"
+        lines.append(f"{blocks:>10} {choice['backend']:<12} {choice['workers']:>7}")
+        lower = (upper or 0) + 1
+
+    chunk = profile["chunk_blocks"]
+    lines.append(f"chunk size: {f'{chunk} blocks' if chunk else 'none'}")
+
+    timings = profile["timings"]
+    # Sizes in ascending order, chunk sizes last.
+    order = sorted(timings, key=lambda size: int(size) if size.isdigit() else 1 << 62)
+
+    for size in order:
+        results = timings[size]
+        label = "chunk size" if size == "chunks" else f"{size} blocks"
+        lines.append(f"\n{label:<16} {'seconds':>12}")
+        for name, seconds in sorted(results.items(), key=lambda item: item[1]):
+            lines.append(f"  {name:<14} {seconds:>12.6f}")
+
+    return "\n".join(lines)
+
+
+def command_tune(args: argparse.Namespace) -> int:
+    from . import backends
+
+    path = args.cache or backends.cache_path()
+
+    if args.show:
+        profile = backends.load_profile(path)
+        if profile is None:
+            print(f"no profile for this machine at {path}.", file=sys.stderr)
+            return 1
+    else:
+        profile = backends.tune(save=False)
+        backends.save_profile(profile, path)
+
+    print(format_profile(profile))
+    print(f"{'read' if args.show else 'wrote'} {path}.", file=sys.stderr)
+
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="fragment",
+        description="Fragment-256 file encryption, profiling and tuning.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("encrypt", "decrypt"):
+        command = commands.add_parser(name, help=f"{name} a file in counter mode")
+        command.add_argument("input", help="input file")
+        command.add_argument("output", help="output file")
+
+        key = command.add_mutually_exclusive_group(required=True)
+        key.add_argument("--key", help="key as hex")
+        key.add_argument("--key-file", help="file holding the raw key")
+
+        command.add_argument(
+            "-j",
+            "--workers",
+            type=positive_int,
+            default=os.cpu_count() or 1,
+            help="worker processes (default: number of CPUs)",
+        )
+        command.set_defaults(handler=command_crypt)
+
+    from .backends import backend_names
+    from .profiling import DEFAULT_INTERVAL, DEFAULT_SIZE, PROFILERS, WORKLOADS
+
+    command = commands.add_parser(
+        "profile", help="profile a workload, grouped by cipher primitive"
+    )
+    command.add_argument("workload", choices=WORKLOADS, help="what to run")
+    command.add_argument(
+        "--engine", choices=backend_names(), default="numpy", help="bulk backend"
+    )
+    command.add_argument(
+        "--size",
+        type=int,
+        default=DEFAULT_SIZE,
+        help="bytes per bulk or mode run (default: %(default)s)",
+    )
+    command.add_argument(
+        "-n", "--iterations", type=int, default=1, help="workload repetitions"
+    )
+    command.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+    command.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="sampling interval in seconds (default: %(default)s)",
+    )
+    command.add_argument(
+        "-o",
+        "--output",
+        default="fragment-profile",
+        help="output path prefix for .pstats and .folded files",
+    )
+    command.set_defaults(handler=command_profile)
+
+    command = commands.add_parser(
+        "tune", help="time the bulk backends and cache the fastest"
+    )
+    command.add_argument(
+        "--show", action="store_true", help="print the cached profile, do not tune"
+    )
+    command.add_argument(
+        "--cache", help="profile file (default: per-machine cache file)"
+    )
+    command.set_defaults(handler=command_tune)
+
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as error:
+        # Missing files, malformed keys and the like are not crashes.
+        print(f"{parser.prog}: error: {error}", file=sys.stderr)
+        return 1
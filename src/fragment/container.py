@@ -0,0 +1,364 @@
+"""Fragment-256 Chunked Container Format.
+
+A container holds one counter mode stream cut into fixed-size chunks, so any
+chunk can be decrypted on its own and all chunks can be decrypted in parallel.
+Chunk ``i`` starts at keystream block ``i * chunk_size / 32``.
+
+Layout (all integers big-endian)::
+
+    header   magic "FRAG", version u16, flags u16, chunk_size u32, nonce
+    chunks   chunk_count encrypted chunks, all chunk_size bytes but the last
+    tree     Merkle tree of chunk MACs, only with FLAG_MERKLE (see integrity)
+    index    chunk_count entries of (offset u64, length u32)
+    footer   index_offset u64, chunk_count u64, magic "FRGX"
+
+With ``FLAG_MERKLE`` each chunk of ciphertext is authenticated: chunks can
+be verified in parallel, and a random read checks only its own leaf and the
+sibling tags on its path. Other flags are reserved and must be zero. The flag
+itself is not authenticated, so readers refuse containers without it unless
+told to read unauthenticated data.
+"""
+
+import os
+import struct
+import threading
+from typing import Optional
+
+from . import integrity
+from .ctr import BLOCK_SIZE, DEFAULT_COUNTER_BITS, CounterMode, nonce_size
+
+MAGIC = b"FRAG"
+FOOTER_MAGIC = b"FRGX"
+VERSION = 1
+
+FLAG_MERKLE = 0x1
+KNOWN_FLAGS = FLAG_MERKLE
+
+NONCE_SIZE = nonce_size(DEFAULT_COUNTER_BITS)
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+HEADER = struct.Struct(f">4sHHI{NONCE_SIZE}s")
+INDEX_ENTRY = struct.Struct(">QI")
+FOOTER = struct.Struct(">QQ4s")
+
+
+class ContainerError(ValueError):
+    """Malformed or unsupported container"""
+
+
+class ContainerWriter:
+    """Write plaintext of any length into a new container.
+
+    Args:
+        file: Binary file object opened for writing, positioned at the start.
+            It is not closed by the writer.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+        chunk_size (int): Plaintext bytes per chunk, a multiple of 32.
+        nonce (bytes): Counter mode nonce (default: random).
+        authenticated (bool): Store a Merkle tree of chunk MACs.
+    """
+
+    def __init__(
+        self,
+        file,
+        round_keys,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        nonce: Optional[bytes] = None,
+        authenticated: bool = False,
+    ) -> None:
+        if chunk_size < BLOCK_SIZE or chunk_size % BLOCK_SIZE:
+            raise ValueError(f"chunk_size must be a multiple of {BLOCK_SIZE} bytes.")
+
+        if nonce is None:
+            nonce = os.urandom(NONCE_SIZE)
+
+        self.file = file
+        self.chunk_size = chunk_size
+        self.flags = FLAG_MERKLE if authenticated else 0
+        self.mode = CounterMode(round_keys=round_keys, nonce=nonce)
+        self.closed = False
+
+        self._mac_keys: Optional[list] = None
+        self._leaves: list = []
+        if authenticated:
+            self._mac_keys = integrity.mac_key(self.mode.round_keys, self.mode.nonce)
+
+        self._pending = bytearray()
+        self._index: list = []
+        self._offset = HEADER.size
+
+        file.write(HEADER.pack(MAGIC, VERSION, self.flags, chunk_size, self.mode.nonce))
+
+    def write(self, data) -> int:
+        """Append plaintext. Whole chunks are encrypted and written at once."""
+        if self.closed:
+            raise ValueError("write to a closed container.")
+
+        self._pending += data
+
+        while len(self._pending) >= self.chunk_size:
+            self._write_chunk(self._pending[: self.chunk_size])
+            del self._pending[: self.chunk_size]
+
+        return memoryview(data).nbytes
+
+    def _write_chunk(self, chunk) -> None:
+        number = len(self._index)
+        data = self.mode.crypt_at(number * self.chunk_size, chunk)
+
+        if self._mac_keys is not None:
+            self._leaves.append(integrity.leaf_tag(self._mac_keys, number, data))
+
+        self.file.write(data)
+        self._index.append((self._offset, len(data)))
+        self._offset += len(data)
+
+    def close(self) -> None:
+        """Write the last partial chunk, the tree, the chunk index and the footer"""
+        if self.closed:
+            return
+
+        if self._pending:
+            self._write_chunk(self._pending)
+            self._pending = bytearray()
+
+        if self._mac_keys is not None:
+            tree = integrity.MerkleTree(self._mac_keys, self._leaves).to_bytes()
+            self.file.write(tree)
+            self._offset += len(tree)
+
+        index_offset = self._offset
+        self.file.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in self._index))
+        self.file.write(FOOTER.pack(index_offset, len(self._index), FOOTER_MAGIC))
+        self.file.flush()
+
+        self.closed = True
+
+    def __enter__(self) -> "ContainerWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ContainerReader:
+    """Random access and parallel decryption of a container.
+
+    Args:
+        file: Seekable binary file object holding the container. It is not
+            closed by the reader.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+        require_authentication (bool): Refuse a container without an integrity
+            tree. Anyone can clear ``FLAG_MERKLE`` in the header, so only pass
+            ``False`` for containers written without ``authenticated``.
+
+    Raises:
+        IntegrityError: The container has no integrity tree but one is
+            required.
+    """
+
+    def __init__(self, file, round_keys, require_authentication: bool = True) -> None:
+        file.seek(0)
+        header = file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ContainerError("file is too short to hold a container header.")
+
+        magic, version, flags, chunk_size, nonce = HEADER.unpack(header)
+
+        if magic != MAGIC:
+            raise ContainerError("not a Fragment-256 container.")
+        if version != VERSION:
+            raise ContainerError(f"unsupported container version ({version}).")
+        if flags & ~KNOWN_FLAGS:
+            raise ContainerError(f"unsupported container flags ({flags:#x}).")
+        if chunk_size < BLOCK_SIZE or chunk_size % BLOCK_SIZE:
+            raise ContainerError(f"invalid chunk size ({chunk_size}).")
+
+        size = file.seek(0, os.SEEK_END)
+        if size < HEADER.size + FOOTER.size:
+            raise ContainerError("file is too short to hold a container footer.")
+
+        file.seek(size - FOOTER.size)
+        index_offset, chunk_count, magic = FOOTER.unpack(file.read(FOOTER.size))
+
+        if magic != FOOTER_MAGIC:
+            raise ContainerError("container footer is missing, truncated file?")
+        if index_offset + chunk_count * INDEX_ENTRY.size != size - FOOTER.size:
+            raise ContainerError("container index does not fit the file.")
+
+        data_end = index_offset
+        if flags & FLAG_MERKLE:
+            data_end -= integrity.tree_size(chunk_count)
+
+        file.seek(index_offset)
+        index = list(INDEX_ENTRY.iter_unpack(file.read(chunk_count * INDEX_ENTRY.size)))
+
+        for number, (offset, length) in enumerate(index):
+            last = number == chunk_count - 1
+
+            if (
+                offset != HEADER.size + number * chunk_size
+                or not 0 < length <= chunk_size
+                or (length != chunk_size and not last)
+                or offset + length > data_end
+            ):
+                raise ContainerError(f"invalid index entry for chunk {number}.")
+
+        self.file = file
+        self.version = version
+        self.flags = flags
+        self.chunk_size = chunk_size
+        self.index = index
+        self.mode = CounterMode(round_keys=round_keys, nonce=nonce)
+
+        self._lock = threading.Lock()
+        self._tree_offset = data_end
+        self._mac_keys: Optional[list] = None
+        if self.authenticated:
+            self._mac_keys = integrity.mac_key(self.mode.round_keys, nonce)
+        elif require_authentication:
+            raise integrity.IntegrityError(
+                "container has no integrity tree and authentication is required."
+            )
+
+    @property
+    def authenticated(self) -> bool:
+        """Whether chunks are covered by a Merkle tree of MACs"""
+        return bool(self.flags & FLAG_MERKLE)
+
+    @property
+    def nonce(self) -> bytes:
+        return self.mode.nonce
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.index)
+
+    @property
+    def length(self) -> int:
+        """Plaintext length in bytes"""
+        return sum(length for _, length in self.index)
+
+    def _read(self, offset: int, length: int) -> bytes:
+        # Only reads need the lock; the cipher work runs unlocked.
+        with self._lock:
+            self.file.seek(offset)
+            return self.file.read(length)
+
+    def _ciphertext(self, number: int) -> bytes:
+        offset, length = self.index[number]
+        data = self._read(offset, length)
+
+        if len(data) != length:
+            raise ContainerError(f"chunk {number} is truncated.")
+
+        return data
+
+    def _tag(self, position: int) -> bytes:
+        """Stored tree node at byte ``position`` of the tree"""
+        return self._read(self._tree_offset + position, integrity.TAG_SIZE)
+
+    def _check_enabled(self) -> list:
+        """Round keys of the MAC key, or ``ContainerError`` without a tree"""
+        if self._mac_keys is None:
+            raise ContainerError("container has no integrity tree.")
+
+        return self._mac_keys
+
+    def _verify_chunk(self, number: int, data: bytes) -> None:
+        """Check a chunk against the stored root through its leaf and path"""
+        mac_keys = self._check_enabled()
+        count = self.chunk_count
+        path = [
+            None if position is None else self._tag(position)
+            for position in integrity.path_offsets(count, number)
+        ]
+        leaf = integrity.leaf_tag(mac_keys, number, data)
+        root = integrity.root_from_path(mac_keys, count, number, leaf, path)
+
+        integrity.check(
+            self._tag(integrity.tree_size(count) - integrity.TAG_SIZE),
+            root,
+            f"chunk {number}",
+        )
+
+    def read_chunk(self, number: int, verify: Optional[bool] = None) -> bytes:
+        """Decrypt chunk ``number`` without touching any other chunk.
+
+        Args:
+            number (int): Chunk number.
+            verify (bool): Authenticate the chunk before decrypting it
+                (default: when the container has an integrity tree).
+
+        Raises:
+            IntegrityError: The chunk or its path does not match the root.
+        """
+        if verify is None:
+            verify = self.authenticated
+        if verify:
+            self._check_enabled()
+
+        data = self._ciphertext(number)
+        if verify:
+            self._verify_chunk(number, data)
+
+        return self.mode.crypt_at(number * self.chunk_size, data)
+
+    def _executor(self, executor):
+        if executor is None:
+            from .threads import executor as shared_executor
+
+            executor = shared_executor()
+
+        return executor
+
+    def read_chunks(self, numbers=None, executor=None, verify: Optional[bool] = None):
+        """Decrypt chunks in parallel, yielding them in order.
+
+        Args:
+            numbers: Chunk numbers to decrypt (default: all of them).
+            executor: ``concurrent.futures`` executor for the cipher work.
+                Defaults to the shared thread pool of ``fragment.threads``.
+            verify (bool): See ``read_chunk``.
+        """
+        if numbers is None:
+            numbers = range(self.chunk_count)
+
+        return self._executor(executor).map(
+            lambda number: self.read_chunk(number, verify), numbers
+        )
+
+    def read_all(self, executor=None, verify: Optional[bool] = None) -> bytes:
+        """Decrypt the whole container in parallel"""
+        return b"".join(self.read_chunks(executor=executor, verify=verify))
+
+    def verify(self, executor=None) -> None:
+        """Authenticate every chunk, computing the leaf MACs in parallel.
+
+        Raises:
+            IntegrityError: Naming the first chunk that does not match its
+                stored leaf, or the tree when the root does not match.
+        """
+        mac_keys = self._check_enabled()
+
+        count = self.chunk_count
+        leaves = list(
+            self._executor(executor).map(
+                lambda number: integrity.leaf_tag(
+                    mac_keys, number, self._ciphertext(number)
+                ),
+                range(count),
+            )
+        )
+        stored = self._read(self._tree_offset, integrity.tree_size(count))
+
+        for number, leaf in enumerate(leaves):
+            position = number * integrity.TAG_SIZE
+            integrity.check(
+                stored[position : position + integrity.TAG_SIZE],
+                leaf,
+                f"chunk {number}",
+            )
+
+        tree = integrity.MerkleTree(mac_keys, leaves)
+        integrity.check(stored[-integrity.TAG_SIZE :], tree.root, "integrity tree")
@@ -0,0 +1,314 @@
+"""Fragment-256 Counter (CTR) Mode.
+
+Each counter block is the nonce followed by a big-endian block counter that
+fills the last ``counter_bits`` bits of the 256-bit block. Keystream is made
+in large batches of counter blocks, with the NumPy batch engine when NumPy is
+installed and the scalar ``encrypt`` otherwise.
+
+When the counter fits in the right half of the block (``counter_bits <= 128``)
+the first Feistel round only reads nonce words, so its round function output
+is computed once per nonce and every counter block starts at the second round.
+Nonce words also enter a batch as plain integers rather than per-block vectors.
+"""
+
+from . import metrics
+from .fragment_256 import BLOCK_SIZE, b2i, encrypt, expand_key, i2b, round_function
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None  # type: ignore[assignment]
+
+DEFAULT_COUNTER_BITS = 64
+# 1 MiB of keystream per batch.
+DEFAULT_BATCH_BLOCKS = 32768
+
+_MASK_32 = (1 << 32) - 1
+_SPAN_64 = 1 << 64
+
+
+def nonce_size(counter_bits: int = DEFAULT_COUNTER_BITS) -> int:
+    """Nonce length in bytes for a given counter width"""
+    return BLOCK_SIZE - counter_bits // 8
+
+
+def _counter_words(counter: int, count: int, words: int) -> list:
+    """Big-endian counter words for ``count`` consecutive counters, as word vectors."""
+    low = counter % _SPAN_64
+
+    # The low 64 bits are computed in uint64; split the batch where they carry.
+    if low + count > _SPAN_64:
+        head = _SPAN_64 - low
+        first = _counter_words(counter, head, words)
+        second = _counter_words(counter + head, count - head, words)
+        return [np.concatenate(pair) for pair in zip(first, second)]
+
+    values = np.arange(count, dtype=np.uint64) + np.uint64(low)
+
+    result = [values.astype(np.uint32)]
+    if words > 1:
+        result.append((values >> np.uint64(32)).astype(np.uint32))
+
+    high = counter >> 64
+    for word in range(words - 2):
+        result.append(np.full(count, (high >> (32 * word)) & _MASK_32, dtype=np.uint32))
+
+    result.reverse()
+
+    return result
+
+
+class CounterMode:
+    """Counter mode keystream generator and stream encryptor.
+
+    Args:
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+        nonce (bytes): ``nonce_size(counter_bits)`` bytes, unique per message.
+        counter_bits (int): Counter width, a multiple of 32 up to 256.
+        initial_counter (int): Counter value of the first block.
+        batch_blocks (int): Number of counter blocks encrypted per batch.
+    """
+
+    def __init__(
+        self,
+        round_keys,
+        nonce: bytes,
+        counter_bits: int = DEFAULT_COUNTER_BITS,
+        initial_counter: int = 0,
+        batch_blocks: int = DEFAULT_BATCH_BLOCKS,
+    ) -> None:
+        if counter_bits % 32 or not 32 <= counter_bits <= 256:
+            raise ValueError(
+                "counter_bits must be a multiple of 32 between 32 and 256."
+            )
+
+        if len(nonce) != nonce_size(counter_bits):
+            raise ValueError(
+                f"nonce must be {nonce_size(counter_bits)} bytes for a "
+                f"{counter_bits}-bit counter."
+            )
+
+        if not 0 <= initial_counter < 1 << counter_bits:
+            raise ValueError("initial_counter is outside the counter space.")
+
+        if batch_blocks < 1:
+            raise ValueError("batch_blocks must be positive.")
+
+        round_keys = expand_key(round_keys)
+
+        self.round_keys = round_keys
+        self.nonce = bytes(nonce)
+        self.counter_bits = counter_bits
+        self.initial_counter = initial_counter
+        self.batch_blocks = batch_blocks
+        self.position = 0
+
+        self._counter_words = counter_bits // 32
+        self._nonce_words = [
+            int.from_bytes(self.nonce[x : x + 4], "big")
+            for x in range(0, len(self.nonce), 4)
+        ]
+
+        # The first round reads only the left half (words 0 to 3). With the
+        # counter in the right half, its output is the same for every block.
+        self._first_round = None
+        if counter_bits <= 128:
+            m, n, o, p = self._nonce_words[:4]
+            self._first_round = round_function(
+                m=m, n=n, o=o, p=p, round_keys=round_keys[0]
+            )
+
+    @property
+    def max_blocks(self) -> int:
+        """Number of blocks left in the counter space"""
+        return (1 << self.counter_bits) - self.initial_counter
+
+    def _keystream_batch(self, block: int, count: int):
+        """Keystream for ``count`` blocks starting at block index ``block``."""
+        counter = self.initial_counter + block
+        metrics.record_bytes(
+            "keystream", "scalar" if np is None else "numpy", count * BLOCK_SIZE
+        )
+
+        if np is None:
+            counter_bytes = self.counter_bits // 8
+            return b"".join(
+                i2b(
+                    encrypt(
+                        *self._round_input(
+                            b2i(
+                                string=(counter + x).to_bytes(counter_bytes, "big"),
+                                length=4,
+                            )
+                        )
+                    )
+                )
+                for x in range(count)
+            )
+
+        from .vectorized import encrypt_words
+
+        data, round_keys = self._round_input(
+            _counter_words(counter, count, self._counter_words)
+        )
+        result = encrypt_words(words=data, round_keys=round_keys)
+
+        return np.stack(result, axis=1).astype(">u4").view(np.uint8).reshape(-1)
+
+    def _round_input(self, counter_words: list) -> tuple:
+        """Feistel state and remaining round keys for a batch of counter words.
+
+        Counter words may be ints or word vectors; nonce words stay ints.
+        """
+        data = self._nonce_words + counter_words
+
+        if self._first_round is None:
+            return data, self.round_keys
+
+        # Apply the precomputed first round: (L, R) -> (R ^ F(L), L)
+        left = [data[4 + x] ^ self._first_round[x] for x in range(4)]
+
+        return left + data[:4], self.round_keys[1:]
+
+    def _check_range(self, block: int, count: int) -> None:
+        if block < 0 or block + count > self.max_blocks:
+            raise ValueError("data length exceeds counter limit.")
+
+    def keystream(self, block: int, count: int) -> bytes:
+        """Keystream bytes for ``count`` blocks starting at block index ``block``"""
+        self._check_range(block, count)
+
+        return b"".join(
+            bytes(self._keystream_batch(x, min(self.batch_blocks, block + count - x)))
+            for x in range(block, block + count, self.batch_blocks)
+        )
+
+    def crypt_at(self, offset: int, data) -> bytes:
+        """XOR ``data`` with the keystream starting at byte ``offset``.
+
+        Only the keystream blocks covering ``offset`` to ``offset + len(data)``
+        are computed. Encryption and decryption are the same operation.
+        """
+        out = bytearray(memoryview(data).nbytes)
+        self.crypt_into(offset, data, out)
+
+        return bytes(out)
+
+    def crypt_into(self, offset: int, data, out) -> None:
+        """Like ``crypt_at``, but writes the result into the writable buffer ``out``.
+
+        ``out`` must hold at least ``len(data)`` bytes and may be ``data`` itself.
+        """
+        data = memoryview(data).cast("B")
+        out = memoryview(out).cast("B")
+        length = len(data)
+
+        if len(out) < length:
+            raise ValueError("output buffer is smaller than the input.")
+
+        first_block, skip = divmod(offset, BLOCK_SIZE)
+        last_block = -(-(offset + length) // BLOCK_SIZE)
+        self._check_range(first_block, last_block - first_block)
+
+        done = 0
+
+        for block in range(first_block, last_block, self.batch_blocks):
+            count = min(self.batch_blocks, last_block - block)
+            stream = self._keystream_batch(block, count)
+
+            size = min(count * BLOCK_SIZE - skip, length - done)
+            chunk = data[done : done + size]
+
+            if np is None:
+                mixed = int.from_bytes(chunk, "big") ^ int.from_bytes(
+                    stream[skip : skip + size], "big"
+                )
+                out[done : done + size] = mixed.to_bytes(size, "big")
+            else:
+                np.bitwise_xor(
+                    np.frombuffer(chunk, dtype=np.uint8),
+                    stream[skip : skip + size],
+                    out=np.frombuffer(out[done : done + size], dtype=np.uint8),
+                )
+
+            done += size
+            skip = 0
+
+    def update(self, data) -> bytes:
+        """Encrypt or decrypt the next piece of a stream of any length"""
+        result = self.crypt_at(self.position, data)
+        self.position += len(result)
+
+        return result
+
+
+def ctr_encrypt(
+    data,
+    round_keys,
+    nonce: bytes,
+    counter_bits: int = DEFAULT_COUNTER_BITS,
+    initial_counter: int = 0,
+) -> bytes:
+    """Encrypt ``data`` of any length in counter mode, without padding."""
+    mode = CounterMode(
+        round_keys=round_keys,
+        nonce=nonce,
+        counter_bits=counter_bits,
+        initial_counter=initial_counter,
+    )
+
+    return mode.crypt_at(0, data)
+
+
+# Counter mode decryption is the same keystream XOR.
+ctr_decrypt = ctr_encrypt
+
+
+def encrypt_iter(
+    chunks,
+    round_keys,
+    nonce: bytes,
+    counter_bits: int = DEFAULT_COUNTER_BITS,
+    initial_counter: int = 0,
+):
+    """Encrypt an iterable of chunks of any size, yielding ciphertext chunks.
+
+    Output is yielded as soon as whole blocks are available; only a partial
+    block is carried between chunks, so memory stays constant however large
+    the input is. The last partial block is yielded at the end.
+    """
+    mode = CounterMode(
+        round_keys=round_keys,
+        nonce=nonce,
+        counter_bits=counter_bits,
+        initial_counter=initial_counter,
+    )
+    carry = b""
+
+    for chunk in chunks:
+        chunk = memoryview(chunk).cast("B")
+
+        if carry:
+            # Complete the carried block first
+            need = BLOCK_SIZE - len(carry)
+            carry += chunk[:need]
+            chunk = chunk[need:]
+
+            if len(carry) < BLOCK_SIZE:
+                continue
+
+            yield mode.update(carry)
+            carry = b""
+
+        whole = len(chunk) - len(chunk) % BLOCK_SIZE
+        if whole:
+            yield mode.update(chunk[:whole])
+
+        carry = bytes(chunk[whole:])
+
+    if carry:
+        yield mode.update(carry)
+
+
+# Counter mode decryption is the same keystream XOR.
+decrypt_iter = encrypt_iter
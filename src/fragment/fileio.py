@@ -0,0 +1,153 @@
+"""Fragment-256 Seekable Encrypted Files.
+
+``EncryptedFile`` is a raw binary file object over a counter mode encrypted
+file, laid out as ``python -m fragment encrypt`` writes it: the nonce followed
+by the ciphertext. Plaintext offsets map one to one onto ciphertext offsets, so
+a read or write at any position computes only the keystream blocks covering
+that byte range. Writing or truncating past the end fills the gap with
+encrypted zeros, so it reads back as zeros like in any other file.
+"""
+
+import io
+import os
+from typing import Optional
+
+from .ctr import DEFAULT_COUNTER_BITS, CounterMode, nonce_size
+
+NONCE_SIZE = nonce_size(DEFAULT_COUNTER_BITS)
+# Bytes of zeros encrypted at a time when filling a gap past the end.
+FILL_SIZE = 1024 * 1024
+
+
+class EncryptedFile(io.RawIOBase):
+    """Random access plaintext view of an encrypted file.
+
+    Args:
+        file: Seekable binary file object holding the encrypted file. An empty
+            writable file gets a fresh random nonce. It is closed along with
+            this object.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+    """
+
+    def __init__(self, file, round_keys) -> None:
+        super().__init__()
+
+        if not file.seekable():
+            raise ValueError("file must be seekable.")
+
+        file.seek(0)
+        nonce = file.read(NONCE_SIZE)
+
+        if not nonce and file.writable():
+            nonce = os.urandom(NONCE_SIZE)
+            file.write(nonce)
+
+        if len(nonce) != NONCE_SIZE:
+            raise ValueError("file is too short to hold a nonce.")
+
+        self.file = file
+        self.mode = CounterMode(round_keys=round_keys, nonce=nonce)
+        self._position = 0
+
+    @property
+    def nonce(self) -> bytes:
+        return self.mode.nonce
+
+    def readable(self) -> bool:
+        return self.file.readable()
+
+    def writable(self) -> bool:
+        return self.file.writable()
+
+    def seekable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def tell(self) -> int:
+        self._checkClosed()
+
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._checkClosed()
+
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.file.seek(0, io.SEEK_END) - NONCE_SIZE + offset
+        else:
+            raise ValueError(f"invalid whence ({whence}).")
+
+        if position < 0:
+            raise ValueError(f"negative seek position {position}.")
+
+        self._position = position
+
+        return position
+
+    def readinto(self, buffer) -> int:
+        """Read and decrypt up to ``len(buffer)`` bytes at the current position"""
+        self._checkClosed()
+
+        with memoryview(buffer).cast("B") as view:
+            self.file.seek(NONCE_SIZE + self._position)
+            count = self.file.readinto(view) or 0
+
+            self.mode.crypt_into(self._position, view[:count], view[:count])
+
+        self._position += count
+
+        return count
+
+    def write(self, data) -> int:
+        """Encrypt and write ``data`` at the current position"""
+        self._checkClosed()
+
+        self._extend(self._position)
+        data = self.mode.crypt_at(self._position, data)
+
+        self.file.seek(NONCE_SIZE + self._position)
+        count = self.file.write(data)
+        count = len(data) if count is None else count
+
+        self._position += count
+
+        return count
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        self._checkClosed()
+
+        size = self._position if size is None else size
+        self._extend(size)
+        self.file.truncate(NONCE_SIZE + size)
+
+        return size
+
+    def _extend(self, size: int) -> None:
+        """Grow the plaintext to at least ``size`` bytes with zeros.
+
+        A plain file gap would hold zero ciphertext, which decrypts to
+        keystream rather than zeros.
+        """
+        end = self.file.seek(0, io.SEEK_END) - NONCE_SIZE
+
+        for offset in range(end, size, FILL_SIZE):
+            zeros = bytes(min(FILL_SIZE, size - offset))
+            self.file.write(self.mode.crypt_at(offset, zeros))
+
+    def flush(self) -> None:
+        if not self.closed:
+            self.file.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        try:
+            super().close()
+        finally:
+            self.file.close()
@@ -1,10 +1,21 @@
 """Fragment-256 Core Functionality."""
 
-import secrets
 import time
+from functools import wraps
+from typing import Union
 
+from . import metrics
 
-def b2i(string: bytes, length: int) -> list[int]:
+# Block size in bytes (256 bits).
+BLOCK_SIZE = 32
+
+# MD5 Hash for: FRAGMENT-256 Is My Passion Project. Do Not Use. Not Tested. Just Look.
+CONSTANTS = (0xB248E256, 0x6E86B410, 0x10A50869, 0x6947535F)
+# 32-bit round key words squeezed out of the key schedule sponge.
+NUMBER_OF_KEYS = 256
+
+
+def b2i(string: Union[bytes, bytearray, memoryview], length: int) -> list[int]:
     """Split bytestring into a list of integers"""
     return [
         int.from_bytes(string[x : x + length], "big")
@@ -100,36 +111,30 @@ def key_schedule_mixer(key_state: list, constants: tuple, repetitions: int):
     return key_state
 
 
-def key_schedule(encryption_key: bytes) -> list:
-    # MD5 Hash for: FRAGMENT-256 Is My Passion Project. Do Not Use. Not Tested. Just Look.
-    CONSTANTS = (0xB248E256, 0x6E86B410, 0x10A50869, 0x6947535F)
-
-    # Initial key state.
-    key_state = [0, 0, 0, 0]
-
-    # Convert bytesring to list of integers
-    key_b2i = b2i(string=encryption_key, length=4)
-
-    # ==== Key absorbtion state
-    for key in key_b2i:
+def absorb(key_state: list, key_words: list, constants: tuple) -> list:
+    """Key absorbtion phase of the key schedule sponge"""
+    for key in key_words:
         key_state[0] ^= key
 
         # Apply 4 round ARX mixer
         key_state = key_schedule_mixer(
-            key_state=key_state, constants=CONSTANTS, repetitions=4
+            key_state=key_state, constants=constants, repetitions=4
         )
 
-    # ==== Extended key mixing state
+    return key_state
+
+
+def extended_mix(key_state: list, constants: tuple) -> list:
+    """Extended key mixing phase of the key schedule sponge"""
     # Apply 8 round ARX mixer
-    key_state = key_schedule_mixer(
-        key_state=key_state, constants=CONSTANTS, repetitions=8
-    )
+    return key_schedule_mixer(key_state=key_state, constants=constants, repetitions=8)
 
-    # ==== Key squeezing state
-    NUMBER_OF_KEYS = 256
+
+def squeeze(key_state: list, constants: tuple, number_of_keys: int) -> list:
+    """Key squeezing phase of the key schedule sponge"""
     round_keys = []
 
-    for round_number in range(NUMBER_OF_KEYS):
+    for round_number in range(number_of_keys):
         # XOR key_state[0] with round number
         key_state[0] ^ round_number
 
@@ -138,9 +143,32 @@ def key_schedule(encryption_key: bytes) -> list:
 
         # Apply 4 round ARX mixer
         key_state = key_schedule_mixer(
-            key_state=key_state, constants=CONSTANTS, repetitions=4
+            key_state=key_state, constants=constants, repetitions=4
         )
 
+    return round_keys
+
+
+def key_schedule(encryption_key: bytes) -> list:
+    a = time.perf_counter()
+
+    # Initial key state.
+    key_state = [0, 0, 0, 0]
+
+    # Convert bytesring to list of integers
+    key_b2i = b2i(string=encryption_key, length=4)
+
+    # ==== Key absorbtion state
+    key_state = absorb(key_state=key_state, key_words=key_b2i, constants=CONSTANTS)
+
+    # ==== Extended key mixing state
+    key_state = extended_mix(key_state=key_state, constants=CONSTANTS)
+
+    # ==== Key squeezing state
+    round_keys = squeeze(
+        key_state=key_state, constants=CONSTANTS, number_of_keys=NUMBER_OF_KEYS
+    )
+
     # ==== Sort round keys
     # Temporary rounds key list. Split keys into sets[lists] containing for 4-32bit keys.
     t_round_keys = [round_keys[i : i + 4] for i in range(0, NUMBER_OF_KEYS, 4)]
@@ -149,9 +177,43 @@ def key_schedule(encryption_key: bytes) -> list:
     # 8-32bit keys per round, over 2 iterations. 4 keys, something, 4 keys, and something.
     f_round_keys = [t_round_keys[i : i + 2] for i in range(0, len(t_round_keys), 2)]
 
+    metrics.observe_key_schedule(time.perf_counter() - a)
+
     return f_round_keys
 
 
+def expand_key(round_keys) -> list:
+    """Round keys as given, or the cached key schedule when given the key itself.
+
+    Accepts the output of ``key_schedule``, a NumPy array holding a key
+    schedule (flat, as a row of ``key_schedule_batch``, or shaped like
+    ``prepare_round_keys``), or the key as bytes, bytearray or memoryview.
+    Raises ``ValueError`` for an array that does not hold a full schedule.
+    """
+    if isinstance(round_keys, list):
+        return round_keys
+
+    if isinstance(round_keys, (bytes, bytearray, memoryview)):
+        from .keycache import default_cache
+
+        return default_cache.get(key=bytes(round_keys))
+
+    if hasattr(round_keys, "reshape") and hasattr(round_keys, "tolist"):
+        # Any other size would run the wrong number of rounds without error.
+        size = getattr(round_keys, "size", None)
+        if size != NUMBER_OF_KEYS:
+            raise ValueError(
+                f"a key schedule array holds {NUMBER_OF_KEYS} words, not {size}."
+            )
+
+        return round_keys.reshape(-1, 2, 4).tolist()
+
+    raise TypeError(
+        "expected round keys (list or array) or a key (bytes, bytearray or "
+        f"memoryview), not {type(round_keys).__name__}."
+    )
+
+
 def round_function(m: int, n: int, o: int, p: int, round_keys: list) -> list:
     data = [m, n, o, p]
 
@@ -173,7 +235,9 @@ def round_function(m: int, n: int, o: int, p: int, round_keys: list) -> list:
     return data
 
 
-def encrypt(data: list, round_keys: list) -> list:
+def encrypt(data: Union[list, bytes, bytearray, memoryview], round_keys: list) -> list:
+    round_keys = expand_key(round_keys)
+
     if not isinstance(data, list):
         data = b2i(string=data, length=4)
 
@@ -199,9 +263,8 @@ def encrypt(data: list, round_keys: list) -> list:
     return [e, f, g, h, a, b, c, d]
 
 
-def decrypt(data: list, round_keys: list) -> list:
-    if not isinstance(round_keys, list):
-        round_keys = key_schedule(round_keys)
+def decrypt(data: Union[list, bytes, bytearray, memoryview], round_keys: list) -> list:
+    round_keys = expand_key(round_keys)
 
     if not isinstance(data, list):
         data = b2i(string=data, length=4)
@@ -215,7 +278,99 @@ def decrypt(data: list, round_keys: list) -> list:
     return result
 
 
+# ==== Instrumentation
+# Off by default. Enabling it swaps counting and timing wrappers into this
+# module's globals, which every call inside the module looks up, and disabling
+# restores the originals, so the hot path runs unwrapped while it is off.
+# Engines with their own kernels (NumPy, lanes, unrolled) are not counted.
+
+INSTRUMENTED_FUNCTIONS = (
+    "arx_mixer",
+    "pht_mixer",
+    "round_function",
+    "key_schedule_mixer",
+)
+KEY_SCHEDULE_PHASES = ("absorb", "extended_mix", "squeeze")
+
+_originals: dict = {}
+_calls = dict.fromkeys(INSTRUMENTED_FUNCTIONS + KEY_SCHEDULE_PHASES, 0)
+_seconds = dict.fromkeys(KEY_SCHEDULE_PHASES, 0.0)
+
+
+def _counted(name: str, function):
+    @wraps(function)
+    def counted(*args, **kwargs):
+        _calls[name] += 1
+
+        return function(*args, **kwargs)
+
+    return counted
+
+
+def _timed(name: str, function):
+    @wraps(function)
+    def timed(*args, **kwargs):
+        _calls[name] += 1
+        a = time.perf_counter()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _seconds[name] += time.perf_counter() - a
+
+    return timed
+
+
+def instrumentation_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable_instrumentation() -> None:
+    """Install the counting and timing variants of the instrumented functions"""
+    if _originals:
+        return
+
+    for name in INSTRUMENTED_FUNCTIONS + KEY_SCHEDULE_PHASES:
+        _originals[name] = function = globals()[name]
+        wrapper = _timed if name in KEY_SCHEDULE_PHASES else _counted
+        globals()[name] = wrapper(name, function)
+
+
+def disable_instrumentation() -> None:
+    """Restore the original functions. Counters keep their values."""
+    globals().update(_originals)
+    _originals.clear()
+
+
+def reset_instrumentation() -> None:
+    """Zero all counters and timers"""
+    for name in _calls:
+        _calls[name] = 0
+    for name in _seconds:
+        _seconds[name] = 0.0
+
+
+def instrumentation_snapshot() -> dict:
+    """Counters and key schedule phase timers, as plain data.
+
+    Returns:
+        dict: ``enabled``, ``calls`` (function -> count) and ``phases``
+        (phase -> ``{"calls": count, "seconds": total}``).
+    """
+    return {
+        "enabled": instrumentation_enabled(),
+        "calls": {name: _calls[name] for name in INSTRUMENTED_FUNCTIONS},
+        "phases": {
+            name: {"calls": _calls[name], "seconds": _seconds[name]}
+            for name in KEY_SCHEDULE_PHASES
+        },
+    }
+
+
 def main() -> None:
+    # Imported here, it is only needed by the demo and is slow to import.
+    import secrets
+
     secret_key = secrets.token_bytes(32)
     iv = secrets.token_bytes(32)
 
@@ -0,0 +1,250 @@
+"""Fragment-256 Merkle Tree Integrity.
+
+Every chunk of ciphertext gets a MAC, and the MACs are combined into a Merkle
+tree whose root is itself a MAC. Chunks can then be verified independently and
+in parallel, and a single chunk is authenticated by its leaf and the sibling
+tags on its path to the root.
+
+The MAC is a PMAC-style construction built only on Fragment-256 block
+encryption, so all blocks of a message are encrypted in one batch rather than
+chained as in CBC-MAC. For a message of ``n`` blocks ``M_i`` and a 24-byte
+label ``L`` naming its place in the tree::
+
+    D_i = E(L || i)                     per-block offsets, as a CTR keystream
+    S   = E(M_0 ^ D_0) ^ ... ^ E(M_n-1 ^ D_n-1)
+    tag = E(S ^ (L || byte length))
+
+The last block is zero padded; the length in the final block tells padded
+messages apart. MACs use their own key schedule, expanded from a key made of a
+domain tag, the nonce and the cipher's round keys. The MAC key is therefore
+never a cipher output, which a counter mode keystream block could repeat, and
+each tree is bound to one encrypted stream.
+"""
+
+import hmac
+import struct
+
+from .fragment_256 import BLOCK_SIZE, expand_key, i2b, key_schedule
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None  # type: ignore[assignment]
+
+TAG_SIZE = BLOCK_SIZE
+
+# Domain, level or zero, position or count, zero
+LABEL = struct.Struct(">4sIQQ")
+_COUNTER = struct.Struct(">Q")
+_MAC_KEY_DOMAIN = b"FRAG-MAC"
+
+
+class IntegrityError(ValueError):
+    """Data does not match its MAC"""
+
+
+def mac_key(round_keys, nonce: bytes) -> list:
+    """Round keys of the MAC key for the stream encrypted under ``nonce``"""
+    words = [word for pair in expand_key(round_keys) for keys in pair for word in keys]
+    key = _MAC_KEY_DOMAIN + _COUNTER.pack(len(nonce)) + bytes(nonce) + i2b(words)
+
+    return key_schedule(encryption_key=key)
+
+
+def _encrypt_blocks(data: bytes, round_keys: list) -> bytes:
+    from .threads import serial_engine
+
+    _, (encrypt_blocks, _) = serial_engine()
+
+    return bytes(encrypt_blocks(data, round_keys))
+
+
+def _xor(x: bytes, y: bytes) -> bytes:
+    return (int.from_bytes(x, "big") ^ int.from_bytes(y, "big")).to_bytes(len(x), "big")
+
+
+def _fold(data: bytes, messages: int) -> list:
+    """XOR of all blocks of each of ``messages`` equal-length messages"""
+    if not data:
+        return [bytes(BLOCK_SIZE)] * messages
+
+    if np is not None:
+        blocks = np.frombuffer(data, dtype=np.uint64).reshape(messages, -1, 4)
+        folded = np.bitwise_xor.reduce(blocks, axis=1)
+
+        return [row.tobytes() for row in folded]
+
+    size = len(data) // messages
+    result = []
+
+    for start in range(0, len(data), size):
+        state = 0
+        for x in range(start, start + size, BLOCK_SIZE):
+            state ^= int.from_bytes(data[x : x + BLOCK_SIZE], "big")
+        result.append(state.to_bytes(BLOCK_SIZE, "big"))
+
+    return result
+
+
+def macs(round_keys: list, labels: list, data, length: int) -> list:
+    """MAC tags of several messages of the same length, computed in one batch.
+
+    Args:
+        round_keys: Round keys of the MAC key, see ``mac_key``.
+        labels (list): One 24-byte label per message.
+        data: The messages back to back, ``len(labels) * length`` bytes.
+        length (int): Bytes per message.
+
+    Returns:
+        list: One ``TAG_SIZE`` byte tag per message.
+    """
+    blocks = -(-length // BLOCK_SIZE)
+    padded = blocks * BLOCK_SIZE
+    data = memoryview(data).cast("B")
+
+    if len(data) != len(labels) * length:
+        raise ValueError("data length does not match the labels.")
+
+    if padded != length:
+        data = b"".join(
+            bytes(data[x : x + length]) + bytes(padded - length)
+            for x in range(0, len(data), length)
+        )
+
+    offsets = b"".join(
+        label + _COUNTER.pack(x) for label in labels for x in range(blocks)
+    )
+    offsets = _encrypt_blocks(offsets, round_keys)
+    sums = _fold(_encrypt_blocks(_xor(data, offsets), round_keys), len(labels))
+
+    final = b"".join(
+        _xor(total, label + _COUNTER.pack(length)) for label, total in zip(labels, sums)
+    )
+    final = _encrypt_blocks(final, round_keys)
+
+    return [final[x : x + TAG_SIZE] for x in range(0, len(final), TAG_SIZE)]
+
+
+def leaf_label(index: int) -> bytes:
+    return LABEL.pack(b"LEAF", 0, index, 0)
+
+
+def node_label(level: int, position: int) -> bytes:
+    return LABEL.pack(b"NODE", level, position, 0)
+
+
+def root_label(count: int) -> bytes:
+    return LABEL.pack(b"ROOT", 0, count, 0)
+
+
+def leaf_tag(round_keys: list, index: int, data) -> bytes:
+    """Tag of chunk ``index``"""
+    return macs(round_keys, [leaf_label(index)], data, memoryview(data).nbytes)[0]
+
+
+def level_sizes(count: int) -> list:
+    """Number of nodes on each tree level, from the leaves up to the top node.
+
+    An odd node at the end of a level is promoted to the next level unchanged.
+    """
+    sizes = [count]
+
+    while sizes[-1] > 1:
+        sizes.append(-(-sizes[-1] // 2))
+
+    return sizes
+
+
+def tree_size(count: int) -> int:
+    """Bytes taken by the stored tree of ``count`` leaves, root included"""
+    return (sum(level_sizes(count)) + 1) * TAG_SIZE
+
+
+def _parents(round_keys: list, level: int, nodes: list) -> list:
+    pairs = len(nodes) // 2
+    parents = macs(
+        round_keys,
+        [node_label(level + 1, x) for x in range(pairs)],
+        b"".join(nodes[: 2 * pairs]),
+        2 * TAG_SIZE,
+    )
+
+    return parents + nodes[2 * pairs :]
+
+
+def _root(round_keys: list, count: int, top: bytes) -> bytes:
+    return macs(round_keys, [root_label(count)], top, len(top))[0]
+
+
+class MerkleTree:
+    """Merkle tree over leaf tags.
+
+    Args:
+        round_keys: Round keys of the MAC key, see ``mac_key``.
+        leaves (list): Leaf tags in chunk order.
+    """
+
+    def __init__(self, round_keys: list, leaves: list) -> None:
+        levels = [list(leaves)]
+
+        # Each level is computed in one batch.
+        while len(levels[-1]) > 1:
+            levels.append(_parents(round_keys, len(levels) - 1, levels[-1]))
+
+        self.levels = levels
+        self.root = _root(round_keys, len(leaves), b"".join(levels[-1]))
+
+    def path(self, index: int) -> list:
+        """Sibling tags from leaf ``index`` up, ``None`` where a node is promoted"""
+        path = []
+
+        for nodes in self.levels[:-1]:
+            sibling = index ^ 1
+            path.append(nodes[sibling] if sibling < len(nodes) else None)
+            index //= 2
+
+        return path
+
+    def to_bytes(self) -> bytes:
+        """Levels from the leaves up, followed by the root"""
+        return b"".join(b"".join(nodes) for nodes in self.levels) + self.root
+
+
+def path_offsets(count: int, index: int) -> list:
+    """Byte offsets in a stored tree of the siblings on the path of leaf ``index``.
+
+    ``None`` where the node has no sibling.
+    """
+    offsets = []
+    start = 0
+
+    for size in level_sizes(count)[:-1]:
+        sibling = index ^ 1
+        offsets.append((start + sibling) * TAG_SIZE if sibling < size else None)
+        start += size
+        index //= 2
+
+    return offsets
+
+
+def root_from_path(
+    round_keys: list, count: int, index: int, leaf: bytes, path: list
+) -> bytes:
+    """Root recomputed from a leaf tag and the sibling tags on its path"""
+    node = leaf
+
+    for level, sibling in enumerate(path):
+        if sibling is not None:
+            pair = node + sibling if index % 2 == 0 else sibling + node
+            node = macs(
+                round_keys, [node_label(level + 1, index // 2)], pair, len(pair)
+            )[0]
+        index //= 2
+
+    return _root(round_keys, count, node)
+
+
+def check(expected: bytes, actual: bytes, what: str) -> None:
+    """Constant-time tag comparison, raising ``IntegrityError`` on mismatch"""
+    if not hmac.compare_digest(expected, actual):
+        raise IntegrityError(f"{what} failed authentication.")
@@ -0,0 +1,141 @@
+"""Fragment-256 Key Schedule Cache."""
+
+import hashlib
+import secrets
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .fragment_256 import key_schedule
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def schedule_size(round_keys: list) -> int:
+    """Approximate memory held by a nested round key list, in bytes"""
+    if isinstance(round_keys, list):
+        return sys.getsizeof(round_keys) + sum(schedule_size(x) for x in round_keys)
+
+    return sys.getsizeof(round_keys)
+
+
+class KeyScheduleCache:
+    """LRU cache of key schedules.
+
+    Entries are keyed by a salted BLAKE2b digest of the key, so the raw key is
+    never stored. The salt is random per cache, so digests cannot be compared
+    across processes.
+
+    Args:
+        max_entries (int): Maximum number of cached schedules.
+        max_bytes (int): Maximum approximate memory held by cached schedules.
+    """
+
+    def __init__(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+
+        self._salt = secrets.token_bytes(16)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, key: bytes) -> bytes:
+        """Cache key for an encryption key"""
+        return hashlib.blake2b(bytes(key), key=self._salt, digest_size=32).digest()
+
+    def get(self, key: bytes) -> list:
+        """Key schedule for ``key``, computed on a miss.
+
+        The returned list is shared with the cache and must not be modified.
+        """
+        digest = self.digest(key)
+
+        with self._lock:
+            entry = self._entries.get(digest)
+
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+
+        round_keys = key_schedule(encryption_key=bytes(key))
+        size = schedule_size(round_keys)
+
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = (round_keys, size)
+                self.size += size
+                self._evict()
+
+        return round_keys
+
+    def invalidate(self, key: bytes) -> bool:
+        """Drop the schedule of ``key``. Returns whether it was cached."""
+        with self._lock:
+            entry = self._entries.pop(self.digest(key), None)
+
+            if entry is None:
+                return False
+
+            self.size -= entry[1]
+            return True
+
+    def clear(self) -> None:
+        """Drop every cached schedule"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def configure(
+        self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None
+    ) -> None:
+        """Change the budgets, evicting at once if the cache is now over them"""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.size > self.max_bytes
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Cache counters as a dict"""
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared cache used by ``encrypt``/``decrypt`` when given a key instead of round keys.
+default_cache = KeyScheduleCache()
@@ -0,0 +1,268 @@
+"""Fragment-256 Runtime Metrics.
+
+An optional registry of cipher metrics, off until ``enable()`` is called:
+
+- bytes and calls per operation and engine, recorded by the bulk engines,
+  counter mode and the CBC chain;
+- a histogram of key schedule latency, recorded by ``key_schedule`` and
+  ``key_schedule_batch`` (one observation per key of its share of the batch),
+  so every schedule counts whether it goes through the cache or not;
+- key schedule cache statistics, read when rendering.
+
+Every thread records into its own shard, so the hot path takes no lock and
+shares no counters; shards are only summed by ``render()``. The shard of a
+thread that has ended is folded into a retired total. While metrics are
+disabled, recording is a single ``None`` check.
+
+``render()`` returns the metrics in the Prometheus text format and ``serve()``
+exposes them on a local HTTP endpoint.
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+
+# Upper bounds of the key schedule latency buckets, in seconds.
+KEY_SCHEDULE_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 1.0)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9464
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = None
+
+
+class _Shard:
+    """One thread's metrics"""
+
+    __slots__ = ("bytes", "calls", "buckets", "seconds", "observations")
+
+    def __init__(self) -> None:
+        self.bytes: dict = {}
+        self.calls: dict = {}
+        self.buckets = [0] * (len(KEY_SCHEDULE_BUCKETS) + 1)
+        self.seconds = 0.0
+        self.observations = 0
+
+    def add(self, other: "_Shard") -> None:
+        """Add the counts of ``other``, which may be recording concurrently"""
+        for totals, counts in ((self.bytes, other.bytes), (self.calls, other.calls)):
+            for key, value in dict(counts).items():
+                totals[key] = totals.get(key, 0) + value
+
+        for bucket, value in enumerate(list(other.buckets)):
+            self.buckets[bucket] += value
+        self.seconds += other.seconds
+        self.observations += other.observations
+
+
+class _Owner:
+    """Holds a thread's shard in the thread-local; dropped when the thread ends"""
+
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard: _Shard) -> None:
+        self.shard = shard
+
+
+def _retire(registry_ref: weakref.ref, shard: _Shard) -> None:
+    registry = registry_ref()
+    if registry is not None:
+        registry._retire(shard)
+
+
+class MetricsRegistry:
+    """Per-thread aggregated cipher metrics"""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list = []
+        self._retired = _Shard()
+        # Reentrant: a finalizer may retire a shard from inside snapshot().
+        self._lock = threading.RLock()
+
+    def _shard(self) -> _Shard:
+        owner = getattr(self._local, "owner", None)
+
+        if owner is None:
+            owner = self._local.owner = _Owner(_Shard())
+
+            # Only taken once per thread. When the thread ends, its shard is
+            # folded into the retired totals, so the totals never go backwards
+            # and the shard list only holds live threads.
+            with self._lock:
+                self._shards.append(owner.shard)
+
+            finalizer = weakref.finalize(owner, _retire, weakref.ref(self), owner.shard)
+            finalizer.atexit = False
+
+        return owner.shard
+
+    def _retire(self, shard: _Shard) -> None:
+        # The retired totals are replaced rather than updated, so a snapshot
+        # never sees a shard both live and retired.
+        retired = _Shard()
+        with self._lock:
+            retired.add(self._retired)
+            retired.add(shard)
+
+            self._shards.remove(shard)
+            self._retired = retired
+
+    def record_bytes(self, operation: str, engine: str, count: int) -> None:
+        shard = self._shard()
+        key = (operation, engine)
+
+        shard.bytes[key] = shard.bytes.get(key, 0) + count
+        shard.calls[key] = shard.calls.get(key, 0) + 1
+
+    def observe_key_schedule(self, seconds: float, count: int = 1) -> None:
+        shard = self._shard()
+
+        shard.buckets[bisect_left(KEY_SCHEDULE_BUCKETS, seconds)] += count
+        shard.seconds += seconds * count
+        shard.observations += count
+
+    def snapshot(self) -> dict:
+        """Totals over all threads, as plain data"""
+        with self._lock:
+            shards = [self._retired, *self._shards]
+
+        total = _Shard()
+        for shard in shards:
+            total.add(shard)
+
+        return {
+            "bytes": total.bytes,
+            "calls": total.calls,
+            "key_schedule": {
+                "buckets": total.buckets,
+                "seconds": total.seconds,
+                "count": total.observations,
+            },
+        }
+
+    def render(self) -> str:
+        """Metrics and key schedule cache statistics in Prometheus text format"""
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name: str, kind: str, help: str) -> None:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, help in (
+            ("bytes", "Bytes processed by operation and engine."),
+            ("calls", "Calls by operation and engine."),
+        ):
+            family(f"fragment_{name}_total", "counter", help)
+            for (operation, engine), value in sorted(snapshot[name].items()):
+                lines.append(
+                    f'fragment_{name}_total{{operation="{operation}",'
+                    f'engine="{engine}"}} {value}'
+                )
+
+        histogram = snapshot["key_schedule"]
+        family(
+            "fragment_key_schedule_seconds",
+            "histogram",
+            "Key schedule latency.",
+        )
+        cumulative = 0
+        for bound, value in zip(KEY_SCHEDULE_BUCKETS + ("+Inf",), histogram["buckets"]):
+            cumulative += value
+            lines.append(
+                f'fragment_key_schedule_seconds_bucket{{le="{bound}"}} {cumulative}'
+            )
+        lines.append(f"fragment_key_schedule_seconds_sum {histogram['seconds']!r}")
+        lines.append(f"fragment_key_schedule_seconds_count {histogram['count']}")
+
+        from .keycache import default_cache
+
+        stats = default_cache.stats()
+        for name, kind, help in (
+            ("entries", "gauge", "Key schedules held by the cache."),
+            ("bytes", "gauge", "Approximate memory held by the cache."),
+            ("hits", "counter", "Key schedule cache hits."),
+            ("misses", "counter", "Key schedule cache misses."),
+            ("evictions", "counter", "Key schedule cache evictions."),
+        ):
+            metric = f"fragment_key_cache_{name}"
+            metric += "_total" if kind == "counter" else ""
+            family(metric, kind, help)
+            lines.append(f"{metric} {stats[name]}")
+
+        return "\n".join(lines) + "\n"
+
+
+def enable() -> MetricsRegistry:
+    """Start recording. Returns the active registry."""
+    global _registry
+
+    if _registry is None:
+        _registry = MetricsRegistry()
+
+    return _registry
+
+
+def disable() -> None:
+    """Stop recording and drop the recorded metrics"""
+    global _registry
+
+    _registry = None
+
+
+def enabled() -> bool:
+    return _registry is not None
+
+
+def record_bytes(operation: str, engine: str, count: int) -> None:
+    """Count ``count`` bytes processed by ``engine`` for ``operation``"""
+    registry = _registry
+    if registry is not None:
+        registry.record_bytes(operation, engine, count)
+
+
+def observe_key_schedule(seconds: float, count: int = 1) -> None:
+    """Add ``count`` key schedules of ``seconds`` each to the histogram"""
+    registry = _registry
+    if registry is not None:
+        registry.observe_key_schedule(seconds, count)
+
+
+def render() -> str:
+    """Prometheus text of the active registry (empty counters when disabled)"""
+    return (_registry or MetricsRegistry()).render()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Serve ``render()`` over HTTP from a daemon thread.
+
+    Binds to localhost by default. Returns the server; call its ``shutdown()``
+    to stop it. ``port=0`` picks a free port (see ``server.server_port``).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+
+    threading.Thread(
+        target=server.serve_forever, name="fragment-metrics", daemon=True
+    ).start()
+
+    return server
@@ -0,0 +1,227 @@
+"""Fragment-256 Block Modes: ECB, CBC and CBC with Ciphertext Stealing.
+
+ECB and CBC decryption have no dependency between blocks, so every block is
+decrypted in one batch by the bulk engine (split across threads where threads
+run in parallel). CBC decryption then XORs the whole batch with the ciphertext
+shifted by one block. CBC encryption is inherently sequential and runs one
+block at a time.
+
+Ciphertext stealing follows CBC-CS3 (NIST SP 800-38A addendum): messages of
+any length of at least one block are encrypted without padding, and the last
+two ciphertext blocks are always swapped.
+"""
+
+from . import metrics
+from .fragment_256 import BLOCK_SIZE, b2i, encrypt, expand_key, i2b
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None  # type: ignore[assignment]
+
+# Messages at least this long are chained through the unrolled engine, which
+# pays a one-off compile for a faster block.
+UNROLL_MIN_BLOCKS = 128
+
+
+def _xor(x, y) -> bytes:
+    if np is not None:
+        return np.bitwise_xor(
+            np.frombuffer(x, dtype=np.uint8), np.frombuffer(y, dtype=np.uint8)
+        ).tobytes()
+
+    return (int.from_bytes(x, "big") ^ int.from_bytes(y, "big")).to_bytes(len(x), "big")
+
+
+def _check_blocks(data: memoryview) -> None:
+    if len(data) % BLOCK_SIZE:
+        raise ValueError(f"data length must be a multiple of {BLOCK_SIZE} bytes.")
+
+
+def _check_iv(iv) -> bytes:
+    iv = bytes(iv)
+    if len(iv) != BLOCK_SIZE:
+        raise ValueError(f"iv must be {BLOCK_SIZE} bytes.")
+
+    return iv
+
+
+def _batch(data, round_keys: list, decrypt: bool) -> bytes:
+    from . import threads
+
+    function = threads.decrypt_blocks if decrypt else threads.encrypt_blocks
+
+    return bytes(function(data, round_keys)) if len(data) else b""
+
+
+def ecb_encrypt(data, round_keys) -> bytes:
+    """Encrypt whole blocks independently, in one batch.
+
+    Args:
+        data: Bytes-like buffer of N * 32 bytes.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+
+    Returns:
+        bytes: Encrypted blocks.
+    """
+    data = memoryview(data).cast("B")
+    _check_blocks(data)
+
+    return _batch(data, expand_key(round_keys), False)
+
+
+def ecb_decrypt(data, round_keys) -> bytes:
+    """Decrypt whole blocks independently, in one batch.
+
+    Takes the same arguments as ``ecb_encrypt``.
+    """
+    data = memoryview(data).cast("B")
+    _check_blocks(data)
+
+    return _batch(data, expand_key(round_keys), True)
+
+
+def _chain(data: memoryview, round_keys: list, iv: bytes) -> bytes:
+    """CBC encryption of whole blocks, one block after the other"""
+    blocks = len(data) // BLOCK_SIZE
+
+    if blocks >= UNROLL_MIN_BLOCKS:
+        from .unrolled import compile_encryptor
+
+        encrypt_block = compile_encryptor(round_keys)
+        engine = "unrolled"
+    else:
+
+        def encrypt_block(words: list) -> list:
+            return encrypt(data=words, round_keys=round_keys)
+
+        engine = "scalar"
+
+    metrics.record_bytes("cbc_encrypt", engine, len(data))
+
+    state = b2i(string=iv, length=4)
+    out = []
+
+    for x in range(0, len(data), BLOCK_SIZE):
+        block = b2i(string=data[x : x + BLOCK_SIZE], length=4)
+        state = encrypt_block([a ^ b for a, b in zip(block, state)])
+        out.append(i2b(state))
+
+    return b"".join(out)
+
+
+def cbc_encrypt(data, round_keys, iv) -> bytes:
+    """Encrypt whole blocks in CBC mode.
+
+    Args:
+        data: Bytes-like buffer of N * 32 bytes.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+        iv (bytes): 32-byte initialization vector, unpredictable per message.
+
+    Returns:
+        bytes: Ciphertext, as long as ``data``.
+    """
+    data = memoryview(data).cast("B")
+    _check_blocks(data)
+
+    return _chain(data, expand_key(round_keys), _check_iv(iv))
+
+
+def cbc_decrypt(data, round_keys, iv) -> bytes:
+    """Decrypt whole blocks in CBC mode, all blocks in one batch.
+
+    Takes the same arguments as ``cbc_encrypt``.
+    """
+    data = memoryview(data).cast("B")
+    _check_blocks(data)
+    iv = _check_iv(iv)
+
+    if not len(data):
+        return b""
+
+    decrypted = _batch(data, expand_key(round_keys), True)
+
+    # Plaintext block i is D(C_i) ^ C_i-1, with the IV before the first block.
+    return _xor(decrypted[:BLOCK_SIZE], iv) + _xor(
+        decrypted[BLOCK_SIZE:], data[:-BLOCK_SIZE]
+    )
+
+
+def cbc_cts_encrypt(data, round_keys, iv) -> bytes:
+    """Encrypt a message of any length of at least 32 bytes in CBC-CS3 mode.
+
+    Args:
+        data: Bytes-like buffer of at least 32 bytes.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+        iv (bytes): 32-byte initialization vector, unpredictable per message.
+
+    Returns:
+        bytes: Ciphertext, as long as ``data``.
+    """
+    data = memoryview(data).cast("B")
+    round_keys = expand_key(round_keys)
+    iv = _check_iv(iv)
+    length = len(data)
+
+    if length < BLOCK_SIZE:
+        raise ValueError(f"data must be at least {BLOCK_SIZE} bytes.")
+    if length == BLOCK_SIZE:
+        return _chain(data, round_keys, iv)
+
+    # Whole blocks before the final, possibly partial, block.
+    head = (length - 1) // BLOCK_SIZE * BLOCK_SIZE
+    tail = length - head
+
+    chained = _chain(data[:head], round_keys, iv)
+    previous = chained[-BLOCK_SIZE:]
+
+    # Final block zero padded: the padding XORs to the tail of ``previous``.
+    last = i2b(
+        encrypt(
+            data=_xor(data[head:], previous[:tail]) + previous[tail:],
+            round_keys=round_keys,
+        )
+    )
+
+    return chained[:-BLOCK_SIZE] + last + previous[:tail]
+
+
+def cbc_cts_decrypt(data, round_keys, iv) -> bytes:
+    """Decrypt a CBC-CS3 message. Takes the same arguments as ``cbc_cts_encrypt``.
+
+    All blocks but one are decrypted in a single batch; the block whose tail
+    was stolen is decrypted once it has been rebuilt.
+    """
+    data = memoryview(data).cast("B")
+    round_keys = expand_key(round_keys)
+    iv = _check_iv(iv)
+    length = len(data)
+
+    if length < BLOCK_SIZE:
+        raise ValueError(f"data must be at least {BLOCK_SIZE} bytes.")
+    if length == BLOCK_SIZE:
+        return cbc_decrypt(data, round_keys, iv)
+
+    head = (length - 1) // BLOCK_SIZE * BLOCK_SIZE
+    tail = length - head
+    # Plain CBC blocks, then the full final block, then the stolen part.
+    chained = data[: head - BLOCK_SIZE]
+    stolen = data[head:]
+
+    decrypted = _batch(data[:head], round_keys, True)
+    final = decrypted[-BLOCK_SIZE:]
+
+    # D(final) = (stolen ^ last plaintext) || tail of the stolen-from block.
+    previous = bytes(stolen) + final[tail:]
+    last = _xor(final[:tail], stolen)
+
+    before = bytes(chained[-BLOCK_SIZE:]) if len(chained) else iv
+    penultimate = _xor(i2b(encrypt(data=previous, round_keys=round_keys[::-1])), before)
+
+    if not len(chained):
+        return penultimate + last
+
+    first = _xor(decrypted[:BLOCK_SIZE], iv)
+    rest = _xor(decrypted[BLOCK_SIZE : len(chained)], chained[:-BLOCK_SIZE])
+
+    return first + rest + penultimate + last
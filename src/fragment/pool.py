@@ -0,0 +1,404 @@
+"""Fragment-256 Persistent Worker Pool.
+
+Long-lived worker processes for bulk block encryption in a service. Block
+data never passes through a pipe: the pool owns a ring of shared memory slabs,
+a job is copied into free slabs, and only the slab index, length and key id are
+sent over the control channel. A key (or a key schedule) is sent to each
+worker once, and the worker keeps the expanded key schedule for later jobs.
+Workers hold a bounded number of key schedules, evicting the least recently
+used, and the pool mirrors each worker's table to know which keys to resend.
+
+A worker that dies fails the segments it still held, and later jobs go to
+the remaining workers. Each worker sends its results over its own pipe, so a
+worker killed while sending cannot block the others.
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from typing import Optional
+
+from .fragment_256 import BLOCK_SIZE
+
+DEFAULT_SLAB_SIZE = 4 * 1024 * 1024
+# Key schedules kept per worker, and key ids kept by the pool.
+DEFAULT_MAX_KEYS = 256
+
+
+def _worker(index: int, slab_names: list, tasks, results, max_keys: int) -> None:
+    try:
+        from .vectorized import decrypt_blocks, encrypt_blocks
+    except ImportError:
+        from .lanes import decrypt_blocks, encrypt_blocks
+
+    from .fragment_256 import expand_key
+
+    # Workers share the parent's resource tracker, so attaching is safe.
+    slabs = [shared_memory.SharedMemory(name=name) for name in slab_names]
+    # Key id -> key schedule, expanded once per worker, in LRU order. A key
+    # that fails to expand keeps its exception, raised by the jobs using it.
+    round_keys: OrderedDict = OrderedDict()
+
+    for message in iter(tasks.get, None):
+        if message[0] == "key":
+            _, key_id, key = message
+
+            try:
+                round_keys[key_id] = expand_key(key)
+            except Exception as exception:
+                round_keys[key_id] = exception
+
+            if len(round_keys) > max_keys:
+                round_keys.popitem(last=False)
+            continue
+
+        _, job_id, segment, slab, length, key_id, decrypt = message
+        function = decrypt_blocks if decrypt else encrypt_blocks
+
+        try:
+            round_keys.move_to_end(key_id)
+            keys = round_keys[key_id]
+            if isinstance(keys, Exception):
+                raise keys
+
+            with slabs[slab].buf[:length] as view:
+                view[:] = function(view, keys)
+
+            error = None
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+
+        results.send((job_id, segment, slab, error))
+
+    for slab in slabs:
+        slab.close()
+
+
+class _Job:
+    __slots__ = ("data", "key", "decrypt", "out", "remaining", "future")
+
+    def __init__(self, data, key, decrypt: bool) -> None:
+        self.data = data
+        self.key = key
+        self.decrypt = decrypt
+        self.out = bytearray(len(data))
+        self.remaining = 0
+        self.future: Future = Future()
+
+
+def _set_result(future: Future, result) -> None:
+    try:
+        future.set_result(result)
+    except InvalidStateError:
+        # Already failed by an earlier segment.
+        pass
+
+
+def _set_exception(future: Future, exception: Exception) -> None:
+    try:
+        future.set_exception(exception)
+    except InvalidStateError:
+        pass
+
+
+class CipherPool:
+    """Persistent worker processes fed through shared memory slabs.
+
+    Args:
+        workers (int): Worker processes (default: number of CPUs).
+        slab_size (int): Bytes per slab, rounded down to whole blocks. Jobs
+            larger than a slab are split across several.
+        slabs (int): Slabs in the ring (default: two per worker). Submission
+            waits for a free slab, which bounds the memory held in flight.
+        context: ``multiprocessing`` context used to start the workers.
+        max_keys (int): Key schedules kept per worker. Older keys are evicted
+            and sent again when a later job uses them.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        slab_size: int = DEFAULT_SLAB_SIZE,
+        slabs: Optional[int] = None,
+        context=None,
+        max_keys: int = DEFAULT_MAX_KEYS,
+    ) -> None:
+        workers = workers or os.cpu_count() or 1
+        slab_size -= slab_size % BLOCK_SIZE
+
+        if slab_size < BLOCK_SIZE:
+            raise ValueError(f"slab_size must be at least {BLOCK_SIZE} bytes.")
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1.")
+
+        context = context or multiprocessing.get_context()
+
+        self.slab_size = slab_size
+        self._max_keys = max_keys
+        self._slabs = [
+            shared_memory.SharedMemory(create=True, size=slab_size)
+            for _ in range(slabs or 2 * workers)
+        ]
+        self._free: queue.Queue = queue.Queue()
+        for index in range(len(self._slabs)):
+            self._free.put(index)
+
+        self._tasks = [context.SimpleQueue() for _ in range(workers)]
+        pipes = [context.Pipe(duplex=False) for _ in range(workers)]
+        self._results = [reader for reader, _ in pipes]
+        self._processes = [
+            context.Process(
+                target=_worker,
+                args=(
+                    index,
+                    [slab.name for slab in self._slabs],
+                    tasks,
+                    writer,
+                    max_keys,
+                ),
+                daemon=True,
+            )
+            for index, (tasks, (_, writer)) in enumerate(zip(self._tasks, pipes))
+        ]
+        for process in self._processes:
+            process.start()
+        # Only the workers write, so a pipe reports EOF once its worker is gone.
+        for _, writer in pipes:
+            writer.close()
+
+        # Per worker: number of outstanding segments, (job id, segment) -> slab
+        # of each, whether it is running, and the key ids it holds in LRU order.
+        self._load = [0] * workers
+        self._assigned: list = [{} for _ in range(workers)]
+        self._alive = [True] * workers
+        self._known_keys: list = [OrderedDict() for _ in range(workers)]
+        # Key digest -> key id, in LRU order. Ids are never reused.
+        self._key_ids: OrderedDict = OrderedDict()
+        self._key_counter = itertools.count()
+
+        self._jobs: dict = {}
+        self._job_ids = itertools.count()
+        self._pending: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._dispatcher.start()
+        self._collector.start()
+
+    def encrypt(self, buffer, key) -> Future:
+        """Encrypt a buffer of whole blocks. The future resolves to a bytearray.
+
+        ``key`` is the encryption key or the output of ``key_schedule``.
+        ``buffer`` is read after this returns and must not change until the
+        future is done.
+        """
+        return self._submit(buffer, key, False)
+
+    def decrypt(self, buffer, key) -> Future:
+        """Decrypt a buffer of whole blocks. The future resolves to a bytearray."""
+        return self._submit(buffer, key, True)
+
+    def _submit(self, buffer, key, decrypt: bool) -> Future:
+        if self._closed:
+            raise RuntimeError("pool is closed.")
+
+        data = memoryview(buffer).cast("B")
+        if len(data) % BLOCK_SIZE:
+            raise ValueError(f"data length must be a multiple of {BLOCK_SIZE} bytes.")
+
+        job = _Job(data, key if isinstance(key, list) else bytes(key), decrypt)
+
+        if not len(data):
+            job.future.set_result(job.out)
+        else:
+            self._pending.put(job)
+
+        return job.future
+
+    def _key_id(self, key) -> int:
+        from .keycache import default_cache
+
+        if isinstance(key, list):
+            # Key schedules are identified by their words, apart from raw keys.
+            words = (word for round_key in key for half in round_key for word in half)
+            key = b"schedule" + b"".join(word.to_bytes(4, "big") for word in words)
+
+        digest = default_cache.digest(key)
+        key_id = self._key_ids.pop(digest, None)
+        if key_id is None:
+            key_id = next(self._key_counter)
+
+        self._key_ids[digest] = key_id
+        if len(self._key_ids) > self._max_keys:
+            self._key_ids.popitem(last=False)
+
+        return key_id
+
+    def _send_key(self, worker: int, key_id: int, key) -> None:
+        """Send ``key`` unless ``worker`` holds it, mirroring the worker's LRU."""
+        known = self._known_keys[worker]
+
+        if key_id in known:
+            known.move_to_end(key_id)
+            return
+
+        self._tasks[worker].put(("key", key_id, key))
+        known[key_id] = None
+        if len(known) > self._max_keys:
+            known.popitem(last=False)
+
+    def _dispatch(self) -> None:
+        for job in iter(self._pending.get, None):
+            segments = range(0, len(job.data), self.slab_size)
+
+            try:
+                key_id = self._key_id(job.key)
+            except Exception as exception:
+                _set_exception(job.future, exception)
+                continue
+
+            with self._lock:
+                job_id = next(self._job_ids)
+                job.remaining = len(segments)
+                self._jobs[job_id] = job
+
+            for segment, offset in enumerate(segments):
+                slab = self._free.get()
+                chunk = job.data[offset : offset + self.slab_size]
+                self._slabs[slab].buf[: len(chunk)] = chunk
+
+                with self._lock:
+                    alive = [x for x, running in enumerate(self._alive) if running]
+                    if alive:
+                        worker = min(alive, key=self._load.__getitem__)
+                        self._load[worker] += 1
+                        self._assigned[worker][job_id, segment] = slab
+
+                if not alive:
+                    self._finish(job_id, segment, slab, "no worker is running.")
+                    for rest in range(segment + 1, len(segments)):
+                        self._finish(job_id, rest, None, "no worker is running.")
+                    break
+
+                self._send_key(worker, key_id, job.key)
+                self._tasks[worker].put(
+                    ("crypt", job_id, segment, slab, len(chunk), key_id, job.decrypt)
+                )
+
+            job.data = None
+            job.key = None
+
+    def _finish(
+        self, job_id: int, segment: int, slab: Optional[int], error: Optional[str]
+    ) -> None:
+        """Take one segment's result and free its slab, if it was given one."""
+        job = self._jobs[job_id]
+
+        if error is not None:
+            _set_exception(job.future, RuntimeError(error))
+        elif slab is not None and not job.future.done():
+            offset = segment * self.slab_size
+            size = min(self.slab_size, len(job.out) - offset)
+            # The buffer of an open slab is never None.
+            buffer = self._slabs[slab].buf[:size]  # type: ignore[index]
+            job.out[offset : offset + size] = buffer
+
+        if slab is not None:
+            self._free.put(slab)
+
+        with self._lock:
+            job.remaining -= 1
+
+            if job.remaining:
+                return
+
+            del self._jobs[job_id]
+
+        _set_result(job.future, job.out)
+
+    def _collect(self) -> None:
+        """Take results and worker exits until every worker has exited."""
+        readers = {reader: index for index, reader in enumerate(self._results)}
+        sentinels = {
+            process.sentinel: index for index, process in enumerate(self._processes)
+        }
+
+        while sentinels:
+            for ready in wait([*readers, *sentinels]):
+                if ready in readers:
+                    if not self._receive(readers[ready]):
+                        del readers[ready]
+                elif ready in sentinels:
+                    index = sentinels.pop(ready)
+                    self._processes[index].join()
+
+                    # Results sent before the exit are taken first, so whatever
+                    # the worker still holds is lost.
+                    reader = self._results[index]
+                    if reader in readers:
+                        while reader.poll() and self._receive(index):
+                            pass
+                        del readers[reader]
+
+                    self._exited(index, self._processes[index].exitcode)
+
+    def _receive(self, worker: int) -> bool:
+        """Take one result of ``worker``. ``False`` once its pipe is closed."""
+        try:
+            job_id, segment, slab, error = self._results[worker].recv()
+        except (EOFError, OSError):
+            # Closed, possibly in the middle of a message by a killed worker.
+            return False
+
+        with self._lock:
+            self._load[worker] -= 1
+            del self._assigned[worker][job_id, segment]
+
+        self._finish(job_id, segment, slab, error)
+
+        return True
+
+    def _exited(self, worker: int, exitcode: Optional[int]) -> None:
+        with self._lock:
+            self._alive[worker] = False
+            lost = self._assigned[worker]
+            self._assigned[worker] = {}
+
+        for (job_id, segment), slab in lost.items():
+            error = f"worker {worker} exited with code {exitcode}."
+            self._finish(job_id, segment, slab, error)
+
+    def close(self) -> None:
+        """Finish queued jobs, stop the workers and free the slabs"""
+        if self._closed:
+            return
+
+        self._closed = True
+        self._pending.put(None)
+        self._dispatcher.join()
+
+        for tasks in self._tasks:
+            tasks.put(None)
+        # The collector returns once every worker has exited.
+        self._collector.join()
+
+        for reader in self._results:
+            reader.close()
+
+        for slab in self._slabs:
+            slab.close()
+            slab.unlink()
+
+    def __enter__(self) -> "CipherPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
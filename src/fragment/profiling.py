@@ -0,0 +1,334 @@
+"""Fragment-256 Profiling.
+
+Runs a cipher workload under ``cProfile`` or a built-in sampling profiler and
+writes collapsed stacks (one ``frame;frame;frame weight`` line per stack) that
+flamegraph tools read, plus ``.pstats`` with ``cProfile``. The time is also
+summed per cipher primitive: each stack's weight goes to the innermost frame
+that belongs to a known primitive, so helpers such as ``modulo_addition`` or
+``int.from_bytes`` count towards the mixer or conversion that called them.
+
+``cProfile`` records only caller/callee pairs, so its stacks are rebuilt by
+splitting each function's time across its callers in proportion to the time
+spent through each of them. Weights are microseconds with ``cProfile`` and
+samples with the sampling profiler.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+
+from .fragment_256 import BLOCK_SIZE
+from .unrolled import SOURCE_NAME as UNROLLED_SOURCE
+
+WORKLOADS = ("key_schedule", "block", "bulk", "ecb", "cbc", "cts", "ctr")
+PROFILERS = ("cprofile", "sampling")
+
+DEFAULT_SIZE = 64 * 1024
+DEFAULT_INTERVAL = 0.001
+
+# Function name -> primitive. Names are shared by the scalar and batch engines.
+PRIMITIVES = {
+    "arx_mixer": "arx_mixer",
+    "_arx_mixer": "arx_mixer",
+    "pht_mixer": "pht_mixer",
+    "_pht_mixer": "pht_mixer",
+    "round_function": "round_function",
+    "key_schedule_mixer": "key_schedule_mixer",
+    "key_schedule": "key_schedule",
+    "key_schedule_batch": "key_schedule",
+    "absorb": "key_schedule",
+    "extended_mix": "key_schedule",
+    "squeeze": "key_schedule",
+    "encrypt": "feistel",
+    "decrypt": "feistel",
+    "encrypt_words": "feistel",
+    "_encrypt_lanes": "feistel",
+    "_encrypt_rows": "feistel",
+    "b2i": "b2i/i2b conversion",
+    "i2b": "b2i/i2b conversion",
+    "to_blocks": "b2i/i2b conversion",
+    "from_blocks": "b2i/i2b conversion",
+    "_pack": "b2i/i2b conversion",
+    "_unpack": "b2i/i2b conversion",
+    "_counter_words": "counter mode",
+    "_keystream_batch": "counter mode",
+    "crypt_into": "counter mode",
+    "_xor": "xor",
+}
+
+# Every profiled stack starts at this function; frames above it are dropped.
+_ROOT = "workload_root"
+
+
+def _package_module(filename: str) -> Optional[str]:
+    """Module name for files of this package, ``None`` for anything else"""
+    if os.path.dirname(os.path.abspath(filename)) != os.path.dirname(__file__):
+        return None
+
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def _label(filename: str, name: str) -> str:
+    module = _package_module(filename)
+    if module is not None:
+        return f"{module}.{name}"
+
+    if filename == UNROLLED_SOURCE:
+        return f"unrolled.{name}"
+
+    if filename == "~":
+        # Built-ins, named like "<method 'from_bytes' of 'int' objects>"
+        return name.strip("<>").replace("'", "")
+
+    return f"{os.path.splitext(os.path.basename(filename))[0]}.{name}"
+
+
+def primitive(frame: tuple) -> Optional[str]:
+    """Primitive of a ``(filename, function)`` frame, ``None`` if unknown"""
+    filename, name = frame
+    if filename == UNROLLED_SOURCE:
+        return "unrolled block"
+    if _package_module(filename) is None:
+        return None
+
+    return PRIMITIVES.get(name)
+
+
+def workload(
+    name: str,
+    key: bytes = bytes(32),
+    engine: str = "numpy",
+    size: int = DEFAULT_SIZE,
+    iterations: int = 1,
+):
+    """Callable that runs one of ``WORKLOADS`` ``iterations`` times.
+
+    Args:
+        name (str): ``key_schedule``, ``block`` (one block encrypted and
+            decrypted), ``bulk`` (``size`` bytes through ``engine``) or a mode
+            over ``size`` bytes: ``ecb``, ``cbc``, ``cts`` or ``ctr``.
+        key (bytes): Encryption key.
+        engine (str): Bulk backend, see ``backends.backend_names()``.
+        size (int): Bytes per bulk or mode run, rounded down to whole blocks
+            except for ``cts`` and ``ctr``.
+        iterations (int): Repetitions of the workload.
+    """
+    from .fragment_256 import decrypt, encrypt, expand_key, key_schedule
+
+    round_keys = expand_key(key)
+    blocks = bytes(size - size % BLOCK_SIZE)
+    data = bytes(size)
+    iv = bytes(BLOCK_SIZE)
+
+    if name == "key_schedule":
+
+        def run() -> None:
+            key_schedule(encryption_key=key)
+
+    elif name == "block":
+
+        def run() -> None:
+            decrypt(data=encrypt(data=iv, round_keys=round_keys), round_keys=round_keys)
+
+    elif name == "bulk":
+        function = _engine(engine)
+
+        def run() -> None:
+            function(blocks, round_keys)
+
+    elif name in ("ecb", "cbc"):
+        from . import modes
+
+        encrypt_mode = getattr(modes, f"{name}_encrypt")
+        decrypt_mode = getattr(modes, f"{name}_decrypt")
+        extra = (iv,) if name == "cbc" else ()
+
+        def run() -> None:
+            decrypt_mode(encrypt_mode(blocks, round_keys, *extra), round_keys, *extra)
+
+    elif name == "cts":
+        from .modes import cbc_cts_decrypt, cbc_cts_encrypt
+
+        def run() -> None:
+            cbc_cts_decrypt(cbc_cts_encrypt(data, round_keys, iv), round_keys, iv)
+
+    elif name == "ctr":
+        from .ctr import ctr_encrypt, nonce_size
+
+        nonce = bytes(nonce_size())
+
+        def run() -> None:
+            ctr_encrypt(data, round_keys, nonce)
+
+    else:
+        raise ValueError(f"unknown workload {name!r}, expected one of {WORKLOADS}.")
+
+    def repeated() -> None:
+        for _ in range(iterations):
+            run()
+
+    return repeated
+
+
+def _engine(name: str):
+    """Encrypt function of the registered backend ``name``"""
+    from .backends import get_backend
+    from .threads import default_workers
+
+    backend = get_backend(name)
+    workers = default_workers() if backend.parallel else 1
+
+    def crypt(data: bytes, round_keys: list) -> bytes:
+        return backend.encrypt(data, round_keys, workers)
+
+    return crypt
+
+
+def workload_root(function) -> None:
+    function()
+
+
+def _is_root(frame: tuple) -> bool:
+    return frame[1] == _ROOT and _package_module(frame[0]) == "profiling"
+
+
+def profile_cprofile(function) -> tuple:
+    """Run ``function`` under ``cProfile``.
+
+    Returns:
+        tuple: ``pstats.Stats`` and a ``Counter`` of stacks (tuples of
+        ``(filename, function)`` frames) to microseconds.
+    """
+    profiler = cProfile.Profile()
+    profiler.runcall(workload_root, function)
+    profiler.create_stats()
+
+    # Function -> (calls, primitive calls, self time, total time, callers)
+    table = profiler.stats
+    stats = pstats.Stats(profiler)
+
+    callees: dict = {}
+    for callee, (_, _, _, _, callers) in table.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((callee, edge[3]))
+
+    stacks: Counter = Counter()
+    roots = [func for func in table if _is_root((func[0], func[2]))]
+
+    def walk(path: tuple, func: tuple, fraction: float) -> None:
+        _, _, self_time, total_time, _ = table[func]
+        path = path + ((func[0], func[2]),)
+
+        weight = round(self_time * fraction * 1e6)
+        if weight:
+            stacks[path] += weight
+
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = table[callee][3]
+            if (callee[0], callee[2]) in path or not callee_total:
+                continue
+
+            share = fraction * min(1.0, edge_time / callee_total)
+            if share > 1e-6:
+                walk(path, callee, share)
+
+    for root in roots:
+        walk((), root, 1.0)
+
+    return stats, stacks
+
+
+def profile_sampling(function, interval: float = DEFAULT_INTERVAL) -> Counter:
+    """Run ``function`` while another thread samples its stack.
+
+    Returns:
+        Counter: Stacks (tuples of ``(filename, function)`` frames) to samples.
+    """
+    target = threading.get_ident()
+    stacks: Counter = Counter()
+    done = threading.Event()
+
+    def sampler() -> None:
+        while not done.wait(interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name))
+                if _is_root(stack[-1]):
+                    stacks[tuple(reversed(stack))] += 1
+                    break
+                frame = frame.f_back
+
+    # Let the sampler take the GIL about as often as it asks for it.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(min(switch_interval, interval))
+    thread = threading.Thread(target=sampler, name="fragment-sampler", daemon=True)
+    thread.start()
+
+    try:
+        workload_root(function)
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(switch_interval)
+
+    return stacks
+
+
+def group(stacks: Counter) -> Counter:
+    """Weight per primitive, ``other`` for stacks outside every primitive"""
+    groups: Counter = Counter()
+
+    for stack, weight in stacks.items():
+        name = next(filter(None, map(primitive, reversed(stack))), "other")
+        groups[name] += weight
+
+    return groups
+
+
+def write_collapsed(stacks: Counter, path: str) -> None:
+    """Write stacks in the collapsed format of ``flamegraph.pl`` and speedscope"""
+    with open(path, "w") as file:
+        for stack, weight in sorted(stacks.items()):
+            frames = ";".join(_label(*frame) for frame in stack)
+            file.write(f"{frames} {weight}\n")
+
+
+def format_groups(groups: Counter, unit: str) -> str:
+    total = sum(groups.values()) or 1
+    lines = [f"{'primitive':<22} {'share':>7} {unit:>12}"]
+
+    for name, weight in groups.most_common():
+        lines.append(f"{name:<22} {weight / total:>7.1%} {weight:>12}")
+
+    return "\n".join(lines)
+
+
+def profile(
+    function,
+    output: str,
+    profiler: str = "cprofile",
+    interval: float = DEFAULT_INTERVAL,
+) -> Counter:
+    """Profile ``function`` and write ``output.folded`` (and ``output.pstats``).
+
+    Returns:
+        Counter: Weight per primitive, see ``group``.
+    """
+    if profiler == "cprofile":
+        stats, stacks = profile_cprofile(function)
+        stats.dump_stats(f"{output}.pstats")
+    elif profiler == "sampling":
+        stacks = profile_sampling(function, interval)
+    else:
+        raise ValueError(f"unknown profiler {profiler!r}, expected one of {PROFILERS}.")
+
+    write_collapsed(stacks, f"{output}.folded")
+
+    return group(stacks)
@@ -0,0 +1,156 @@
+"""Fragment-256 Thread Pool Engine.
+
+Bulk encryption split into independent block ranges run on a thread pool.
+Threads only help when they actually run in parallel: on free-threaded
+CPython, or with NumPy kernels that release the GIL. Whether they do is
+measured once per engine at run time; when they do not, the serial engine
+is used directly.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .fragment_256 import BLOCK_SIZE, expand_key
+
+# Smallest range worth handing to a thread.
+MIN_BLOCKS_PER_THREAD = 4096
+# Threaded run must beat the serial run by this factor to count as parallel.
+PARALLEL_SPEEDUP = 1.25
+
+# Thread pools by worker count, and (engine, workers) -> measured parallelism.
+_executors: dict = {}
+_executor_lock = threading.Lock()
+_parallel: dict = {}
+
+
+def gil_disabled() -> bool:
+    """True on free-threaded CPython running without the GIL"""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def serial_engine() -> tuple:
+    """Name and (encrypt_blocks, decrypt_blocks) of the best serial engine."""
+    try:
+        from . import vectorized
+    except ImportError:
+        from . import lanes
+
+        return "lanes", (lanes.encrypt_blocks, lanes.decrypt_blocks)
+
+    return "numpy", (vectorized.encrypt_blocks, vectorized.decrypt_blocks)
+
+
+def executor(workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """Shared thread pool of ``workers`` threads, created on first use"""
+    workers = workers or default_workers()
+
+    with _executor_lock:
+        if workers not in _executors:
+            _executors[workers] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="fragment"
+            )
+
+        return _executors[workers]
+
+
+def _run(
+    function, data: memoryview, round_keys: list, out, ranges: list, workers: int
+) -> None:
+    def task(start: int, stop: int) -> None:
+        out[start:stop] = function(data[start:stop], round_keys)
+
+    pool = executor(workers)
+    futures = [pool.submit(task, start, stop) for start, stop in ranges]
+
+    for future in futures:
+        future.result()
+
+
+def _ranges(length: int, parts: int) -> list:
+    blocks = length // BLOCK_SIZE
+    step = -(-blocks // parts) * BLOCK_SIZE
+
+    return [(x, min(x + step, length)) for x in range(0, length, step)]
+
+
+def threads_parallel(workers: Optional[int] = None) -> bool:
+    """Whether ``workers`` threads run the serial engine in parallel here.
+
+    Measured once per engine and worker count.
+    """
+    workers = workers or default_workers()
+    name, (function, _) = serial_engine()
+
+    if workers < 2:
+        return False
+
+    if (name, workers) not in _parallel:
+        round_keys = expand_key(bytes(32))
+        data = memoryview(bytes(workers * MIN_BLOCKS_PER_THREAD * BLOCK_SIZE))
+        out = bytearray(len(data))
+
+        # Warm-up (imports, key schedule cache)
+        function(data[:BLOCK_SIZE], round_keys)
+
+        a = time.perf_counter()
+        function(data, round_keys)
+        b = time.perf_counter()
+        _run(function, data, round_keys, out, _ranges(len(data), workers), workers)
+        c = time.perf_counter()
+
+        _parallel[name, workers] = (b - a) / (c - b) >= PARALLEL_SPEEDUP
+
+    return _parallel[name, workers]
+
+
+def _crypt_blocks(data, round_keys, workers: Optional[int], decrypt: bool) -> bytes:
+    data = memoryview(data).cast("B")
+    if len(data) % BLOCK_SIZE:
+        raise ValueError(f"data length must be a multiple of {BLOCK_SIZE} bytes.")
+
+    _, functions = serial_engine()
+    function = functions[decrypt]
+    round_keys = expand_key(round_keys)
+
+    workers = workers or default_workers()
+    parts = min(workers, len(data) // (BLOCK_SIZE * MIN_BLOCKS_PER_THREAD))
+
+    if parts < 2 or not threads_parallel(workers):
+        return function(data, round_keys)
+
+    out = bytearray(len(data))
+    _run(function, data, round_keys, out, _ranges(len(data), parts), workers)
+
+    return bytes(out)
+
+
+def encrypt_blocks(data, round_keys, workers: Optional[int] = None) -> bytes:
+    """Encrypt a buffer of whole blocks on the thread pool.
+
+    Args:
+        data: Bytes-like buffer of N * 32 bytes.
+        round_keys: Output of ``key_schedule`` or the encryption key itself.
+        workers (int): Threads to split the blocks across (default: CPUs).
+
+    Returns:
+        bytes: Encrypted blocks.
+    """
+    return _crypt_blocks(data, round_keys, workers, False)
+
+
+def decrypt_blocks(data, round_keys, workers: Optional[int] = None) -> bytes:
+    """Decrypt a buffer of whole blocks on the thread pool.
+
+    Takes the same arguments as ``encrypt_blocks``.
+    """
+    return _crypt_blocks(data, round_keys, workers, True)
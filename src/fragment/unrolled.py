@@ -0,0 +1,133 @@
+"""Fragment-256 Unrolled Engine.
+
+Generates straight-line Python source for all rounds of one key schedule,
+with the round keys baked in as constants and every intermediate value held
+in a local variable. The word permutations of ``arx_mixer`` and ``pht_mixer``
+are resolved at generation time by renaming locals, so they cost nothing at
+run time. Each source is compiled once and cached per key schedule.
+"""
+
+from functools import lru_cache
+
+from .fragment_256 import b2i, expand_key
+
+MASK = "0xFFFFFFFF"
+CACHE_SIZE = 256
+# File name of the generated code in tracebacks and profiles.
+SOURCE_NAME = "<fragment-256 unrolled>"
+
+
+def _rotate(name: str, shift: int) -> str:
+    return f"{name} = (({name} << {shift}) & {MASK}) | ({name} >> {32 - shift})"
+
+
+def _arx_mixer(lines: list, names: list) -> list:
+    """Emit one ARX mixer over four locals and return the permuted names."""
+    a, b, c, d = names
+
+    lines += [
+        f"{a} = ({a} + {d}) & {MASK}",
+        f"{b} ^= {a}",
+        _rotate(b, 13),
+        f"{c} = ({b} + {c}) & {MASK}",
+        f"{d} ^= {c}",
+        _rotate(d, 17),
+        f"{a} = ({d} + {a}) & {MASK}",
+        f"{b} ^= {a}",
+        _rotate(b, 5),
+        f"{c} = ({b} + {c}) & {MASK}",
+        f"{d} ^= {c}",
+        _rotate(d, 7),
+    ]
+
+    # Word permutation of updated data
+    return [b, c, d, a]
+
+
+def _pht_mixer(lines: list, names: list) -> list:
+    """Emit the 4 round PHT feistel network and return the permuted names."""
+    a, b, c, d = names
+
+    for _ in range(4):
+        lines += [
+            f"t = ({a} + {b}) & {MASK}",
+            f"{d} ^= (t + ({b} << 1)) & {MASK}",
+            f"{c} ^= t",
+        ]
+        a, b, c, d = c, d, a, b
+
+    return [c, d, a, b]
+
+
+def generate_source(round_keys: list, name: str = "encrypt_block") -> str:
+    """Python source of an unrolled encryption function for ``round_keys``.
+
+    The function takes a list of eight 32-bit words and returns the result as
+    a list, like ``fragment_256.encrypt``.
+    """
+    left = ["a", "b", "c", "d"]
+    right = ["e", "f", "g", "h"]
+
+    lines = [f"{', '.join(left + right)} = data"]
+
+    for number, round_key_set in enumerate(round_keys, start=1):
+        lines.append(f"# Round {number}")
+
+        # Round function on a copy of the left half
+        data = ["m", "n", "o", "p"]
+        lines += [
+            f"{data[x]} = {left[x]} ^ {round_key_set[0][x]:#010x}" for x in range(4)
+        ]
+        data = _arx_mixer(lines, data)
+        lines += [f"{data[x]} ^= {round_key_set[1][x]:#010x}" for x in range(4)]
+        data = _arx_mixer(lines, data)
+        data = _pht_mixer(lines, data)
+
+        lines += [f"{right[x]} ^= {data[x]}" for x in range(4)]
+        left, right = right, left
+
+    lines.append(f"return [{', '.join(right + left)}]")
+
+    return f"def {name}(data):\n" + "\n".join(f"    {line}" for line in lines) + "\n"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile(flat_keys: tuple):
+    round_keys = [
+        [flat_keys[x : x + 4], flat_keys[x + 4 : x + 8]]
+        for x in range(0, len(flat_keys), 8)
+    ]
+
+    namespace: dict = {}
+    code = compile(generate_source(round_keys), SOURCE_NAME, "exec")
+    exec(code, namespace)
+
+    return namespace["encrypt_block"]
+
+
+def compile_encryptor(round_keys):
+    """Compiled, unrolled encryption function for ``round_keys`` (or a key).
+
+    Decryption functions are made by passing the reversed round keys.
+    """
+    round_keys = expand_key(round_keys)
+
+    return _compile(
+        tuple(word for pair in round_keys for keys in pair for word in keys)
+    )
+
+
+def encrypt(data: list, round_keys: list) -> list:
+    """Drop-in replacement for ``fragment_256.encrypt``"""
+    if not isinstance(data, list):
+        data = b2i(string=data, length=4)
+
+    return compile_encryptor(round_keys)(data)
+
+
+def decrypt(data: list, round_keys: list) -> list:
+    """Drop-in replacement for ``fragment_256.decrypt``"""
+    if not isinstance(data, list):
+        data = b2i(string=data, length=4)
+
+    return compile_encryptor(expand_key(round_keys)[::-1])(data)
@@ -0,0 +1,264 @@
+"""Fragment-256 NumPy Batch Engine.
+
+Runs the Fragment-256 primitives across N blocks at once. Each 32-bit word of
+the scalar path becomes a ``uint32`` vector holding that word for every block,
+so the add, xor and rotate steps of the mixers are single NumPy operations.
+"""
+
+import time
+
+import numpy as np
+
+from . import metrics
+from .fragment_256 import BLOCK_SIZE, CONSTANTS, NUMBER_OF_KEYS, b2i, expand_key
+
+BLOCK_WORDS = 8
+
+
+def to_blocks(data) -> np.ndarray:
+    """Bytes-like buffer or array to an (N, 8) uint32 array"""
+    if isinstance(data, np.ndarray):
+        blocks = data.astype(np.uint32, copy=False)
+    else:
+        if len(memoryview(data).cast("B")) % BLOCK_SIZE:
+            raise ValueError(f"data length must be a multiple of {BLOCK_SIZE} bytes.")
+
+        blocks = np.frombuffer(data, dtype=">u4").astype(np.uint32)
+
+    return blocks.reshape(-1, BLOCK_WORDS)
+
+
+def from_blocks(blocks: np.ndarray) -> bytes:
+    """(N, 8) uint32 array to big-endian bytestring"""
+    return blocks.astype(">u4").tobytes()
+
+
+def prepare_round_keys(round_keys) -> np.ndarray:
+    """Round keys to a (rounds, 2, 4) uint32 array.
+
+    Accepts a nested list, flat words, an array or the key bytes.
+    """
+    if isinstance(round_keys, (bytes, bytearray, memoryview)):
+        round_keys = expand_key(round_keys)
+
+    return np.asarray(round_keys, dtype=np.uint32).reshape(-1, 2, 4)
+
+
+def bit_shift(x: np.ndarray, shift: int) -> np.ndarray:
+    """Left circular bit shift"""
+    return (x << shift) | (x >> (32 - shift))
+
+
+def arx_mixer(data: list) -> list:
+    """Four branch ARX network over word vectors."""
+    a, b, c, d = data
+
+    a = a + d
+    b = bit_shift(b ^ a, 13)
+    c = b + c
+    d = bit_shift(d ^ c, 17)
+    a = d + a
+    b = bit_shift(b ^ a, 5)
+    c = b + c
+    d = bit_shift(d ^ c, 7)
+
+    # Word permutation of updated data
+    return [b, c, d, a]
+
+
+def pht_mixer(data: list) -> list:
+    """4 round feistel network that uses Pseudo-Hadamard transform.
+
+    Operates on word vectors.
+    """
+    a, b, c, d = data
+
+    for _ in range(4):
+        # Pseudo-Hadamard transform
+        e = a + b
+        f = e + (b << 1)
+
+        c, d, a, b = a, b, e ^ c, f ^ d
+
+    return [c, d, a, b]
+
+
+def key_schedule_mixer(key_state: list, constants: tuple, repetitions: int) -> list:
+    """Key schedule mixer over word vectors."""
+    for _ in range(repetitions):
+        # Add constants, apply ARX mixer
+        key_state = arx_mixer([key_state[x] ^ constants[x] for x in range(4)])
+
+    return key_state
+
+
+def key_schedule_batch(keys: list) -> np.ndarray:
+    """Key schedules of many keys at once.
+
+    The absorb, extended-mix and squeeze phases run in lockstep across all
+    keys. Keys may differ in length: a key stops absorbing after its last word
+    while longer keys carry on.
+
+    Args:
+        keys (list): Encryption keys (bytes).
+
+    Returns:
+        np.ndarray: (K, 256) uint32 array, row ``k`` holding the round key words
+        of ``keys[k]`` in ``key_schedule`` order. ``prepare_round_keys`` turns a
+        row into round keys.
+    """
+    a = time.perf_counter()
+    key_words = [b2i(string=key, length=4) for key in keys]
+    lengths = np.array([len(x) for x in key_words], dtype=np.intp)
+    count = len(key_words)
+
+    absorbed = np.zeros((count, int(lengths.max(initial=0))), dtype=np.uint32)
+    for index, words in enumerate(key_words):
+        absorbed[index, : len(words)] = words
+
+    # Initial key state.
+    key_state = [np.zeros(count, dtype=np.uint32) for _ in range(4)]
+
+    # ==== Key absorbtion state
+    for column in range(absorbed.shape[1]):
+        updated = key_schedule_mixer(
+            [key_state[0] ^ absorbed[:, column]] + key_state[1:], CONSTANTS, 4
+        )
+
+        active = lengths > column
+        if active.all():
+            key_state = updated
+        else:
+            key_state = [np.where(active, updated[x], key_state[x]) for x in range(4)]
+
+    # ==== Extended key mixing state
+    key_state = key_schedule_mixer(key_state, CONSTANTS, 8)
+
+    # ==== Key squeezing state
+    round_keys = np.empty((count, NUMBER_OF_KEYS), dtype=np.uint32)
+
+    for round_number in range(NUMBER_OF_KEYS):
+        round_keys[:, round_number] = key_state[0]
+        key_state = key_schedule_mixer(key_state, CONSTANTS, 4)
+
+    # Every key of the batch is one observation of its share of the time.
+    if count:
+        metrics.observe_key_schedule((time.perf_counter() - a) / count, count)
+
+    return round_keys
+
+
+def round_function(m, n, o, p, round_keys) -> list:
+    """Vectorized round function.
+
+    ``round_keys[i][x]`` may be a scalar shared by every block or a vector
+    holding one key word per block.
+    """
+    data = [m, n, o, p]
+
+    # Add first key set
+    data = [data[x] ^ round_keys[0][x] for x in range(4)]
+
+    # Apply ARX mixer
+    data = arx_mixer(data=data)
+
+    # Add second key set
+    data = [data[x] ^ round_keys[1][x] for x in range(4)]
+
+    # Apply ARX mixer
+    data = arx_mixer(data=data)
+
+    # Apply permutation function
+    return pht_mixer(data=data)
+
+
+def encrypt_words(words: list, round_keys) -> list:
+    """Feistel network over eight word vectors, one round per ``round_keys`` entry."""
+    a, b, c, d, e, f, g, h = words
+
+    for round_key_set in round_keys:
+        w, x, y, z = round_function(a, b, c, d, round_keys=round_key_set)
+
+        e, f, g, h, a, b, c, d = a, b, c, d, e ^ w, f ^ x, g ^ y, h ^ z
+
+    return [e, f, g, h, a, b, c, d]
+
+
+def _crypt_blocks(data, round_keys, operation: str):
+    blocks = to_blocks(data)
+    metrics.record_bytes(operation, "numpy", blocks.shape[0] * BLOCK_SIZE)
+    words = list(np.ascontiguousarray(blocks.T))
+
+    result = np.stack(encrypt_words(words=words, round_keys=round_keys), axis=1)
+
+    if isinstance(data, np.ndarray):
+        return result
+
+    return from_blocks(result)
+
+
+def encrypt_blocks(data, round_keys):
+    """Encrypt N blocks at once.
+
+    Args:
+        data: (N, 8) uint32 array or bytes-like buffer of N * 32 bytes.
+        round_keys: Output of ``key_schedule``, a (32, 2, 4) array or the key itself.
+
+    Returns:
+        (N, 8) uint32 array for array input, bytes otherwise.
+    """
+    return _crypt_blocks(data, prepare_round_keys(round_keys).tolist(), "encrypt")
+
+
+def decrypt_blocks(data, round_keys):
+    """Decrypt N blocks at once. Takes the same arguments as ``encrypt_blocks``."""
+    return _crypt_blocks(data, prepare_round_keys(round_keys)[::-1].tolist(), "decrypt")
+
+
+def _gather_round_keys(round_key_table, key_index, reverse: bool):
+    """Per-round key sets holding one key word per block, gathered lazily."""
+    table = np.asarray(round_key_table, dtype=np.uint32)
+    table = table.reshape(table.shape[0], -1, 2, 4)
+
+    # Checked up front: np.take would wrap negative indices to other keys.
+    key_index = np.asarray(key_index, dtype=np.intp)
+    if key_index.size and (key_index.min() < 0 or key_index.max() >= len(table)):
+        raise ValueError(f"key_index must be in [0, {len(table)}).")
+
+    # (rounds, 2, 4, K): each key word of a round is a contiguous row to gather from.
+    table = np.ascontiguousarray(table.transpose(1, 2, 3, 0))
+    if reverse:
+        table = table[::-1]
+
+    return (
+        [[np.take(row, key_index) for row in keys] for keys in round_key_set]
+        for round_key_set in table
+    )
+
+
+def encrypt_blocks_multikey(data, key_index, round_key_table):
+    """Encrypt N blocks under different keys in one batch.
+
+    Args:
+        data: (N, 8) uint32 array or bytes-like buffer of N * 32 bytes.
+        key_index: N integers, the row of ``round_key_table`` for each block.
+            An index outside the table raises ``ValueError``.
+        round_key_table: Stacked round keys of K keys, a (K, 256) array as made
+            by ``key_schedule_batch`` or anything shaped (K, 32, 2, 4).
+
+    Returns:
+        (N, 8) uint32 array for array input, bytes otherwise.
+    """
+    return _crypt_blocks(
+        data, _gather_round_keys(round_key_table, key_index, False), "encrypt"
+    )
+
+
+def decrypt_blocks_multikey(data, key_index, round_key_table):
+    """Decrypt N blocks under different keys in one batch.
+
+    Takes the same arguments as ``encrypt_blocks_multikey``.
+    """
+    return _crypt_blocks(
+        data, _gather_round_keys(round_key_table, key_index, True), "decrypt"
+    )
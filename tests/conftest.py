@@ -0,0 +1,74 @@
+"""Shared fixtures. The package is imported from the source tree."""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+)
+
+import fragment  # noqa: E402
+from fragment.fragment_256 import (  # noqa: E402
+    BLOCK_SIZE,
+    decrypt,
+    encrypt,
+    i2b,
+    key_schedule,
+)
+
+KEY = bytes(range(32))
+# Block counts covering an empty input, single blocks and a few odd batches.
+SIZES = (0, 1, 2, 3, 17, 64)
+
+
+@pytest.fixture
+def key() -> bytes:
+    return KEY
+
+
+@pytest.fixture
+def round_keys() -> list:
+    return key_schedule(encryption_key=KEY)
+
+
+@pytest.fixture
+def rng() -> random.Random:
+    return random.Random(256)
+
+
+def scalar_blocks(data, round_keys: list, decrypting: bool = False) -> bytes:
+    """Reference bulk result: scalar ``encrypt``/``decrypt`` block by block"""
+    function = decrypt if decrypting else encrypt
+    data = bytes(data)
+
+    return b"".join(
+        i2b(function(data=data[x : x + BLOCK_SIZE], round_keys=round_keys))
+        for x in range(0, len(data), BLOCK_SIZE)
+    )
+
+
+@pytest.fixture
+def scalar():
+    return scalar_blocks
+
+
+@pytest.fixture(params=("numpy", "scalar"))
+def engine(request, monkeypatch):
+    """Runs a test with NumPy and again without it.
+
+    The scalar run sets ``np`` to ``None`` in each module of the test file's
+    ``NUMPY_MODULES`` and makes ``fragment.vectorized`` fail to import.
+    """
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        for module in request.module.NUMPY_MODULES:
+            monkeypatch.setattr(module, "np", None)
+
+        monkeypatch.setitem(sys.modules, "fragment.vectorized", None)
+        monkeypatch.delattr(fragment, "vectorized", raising=False)
+
+    return request.param
@@ -0,0 +1,94 @@
+"""Asyncio streaming against counter mode."""
+
+import asyncio
+
+import pytest
+
+from fragment import aio, ctr
+
+
+class Reader:
+    """StreamReader stand-in that counts the chunks read"""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.chunks = 0
+
+    async def readexactly(self, size: int) -> bytes:
+        chunk, self.data = self.data[:size], self.data[size:]
+        if chunk:
+            self.chunks += 1
+        if len(chunk) < size:
+            raise asyncio.IncompleteReadError(chunk, size)
+
+        return chunk
+
+
+class Writer:
+    """Slow StreamWriter stand-in that records how far reading ran ahead"""
+
+    def __init__(self, reader: Reader) -> None:
+        self.reader = reader
+        self.chunks: list = []
+        self.ahead = 0
+
+    def write(self, data: bytes) -> None:
+        self.chunks.append(data)
+        self.ahead = max(self.ahead, self.reader.chunks - len(self.chunks))
+
+    async def drain(self) -> None:
+        await asyncio.sleep(0.001)
+
+
+def run(data: bytes, key, nonce: bytes, **kwargs) -> tuple:
+    reader = Reader(data)
+    writer = Writer(reader)
+    length = asyncio.run(aio.encrypt_stream(reader, writer, key, nonce, **kwargs))
+
+    return length, b"".join(writer.chunks), writer
+
+
+@pytest.mark.parametrize("length", (0, 1, 100, 1000))
+def test_matches_ctr(rng, key, length):
+    data = rng.randbytes(length)
+    nonce = rng.randbytes(ctr.nonce_size())
+
+    processed, encrypted, _ = run(data, key, nonce, chunk_size=96)
+
+    assert processed == length
+    assert encrypted == ctr.ctr_encrypt(data, key, nonce)
+    assert run(encrypted, key, nonce, chunk_size=40)[1] == data
+
+
+def test_stream_reader(rng, key):
+    data = rng.randbytes(300)
+    nonce = rng.randbytes(ctr.nonce_size())
+
+    async def main() -> bytes:
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        writer = Writer(Reader(b""))
+
+        await aio.decrypt_stream(reader, writer, key, nonce, initial_counter=7)
+        return b"".join(writer.chunks)
+
+    expected = ctr.CounterMode(key, nonce, initial_counter=7).crypt_at(0, data)
+    assert asyncio.run(main()) == expected
+
+
+@pytest.mark.parametrize("max_in_flight", (1, 3))
+def test_backpressure(rng, key, max_in_flight):
+    nonce = rng.randbytes(ctr.nonce_size())
+
+    _, _, writer = run(
+        rng.randbytes(640), key, nonce, chunk_size=32, max_in_flight=max_in_flight
+    )
+
+    assert len(writer.chunks) == 20
+    assert writer.ahead <= max_in_flight
+
+
+def test_invalid_max_in_flight(key):
+    with pytest.raises(ValueError):
+        run(b"", key, bytes(ctr.nonce_size()), max_in_flight=0)
@@ -0,0 +1,175 @@
+"""Backend registry, profiles and tuning against the scalar cipher."""
+
+import itertools
+import json
+
+import pytest
+
+from fragment import backends
+
+from .conftest import SIZES
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    """Runs a test with its own profile, cache file, registry and pools"""
+    monkeypatch.setenv("FRAGMENT_TUNE_CACHE", str(tmp_path / "tune.json"))
+    monkeypatch.delenv("FRAGMENT_BACKEND", raising=False)
+    monkeypatch.setattr(backends, "_profile", None)
+    monkeypatch.setattr(backends, "_backends", dict(backends._backends))
+    monkeypatch.setattr(backends, "_pools", {})
+
+    yield
+
+    backends._close_pools(set())
+
+
+def profile(*choices, chunk_blocks=None) -> dict:
+    return {
+        "version": backends.PROFILE_VERSION,
+        "environment": backends.environment(),
+        "choices": [
+            {"max_blocks": limit, "backend": name, "workers": workers}
+            for limit, name, workers in choices
+        ],
+        "chunk_blocks": chunk_blocks,
+        "timings": {},
+    }
+
+
+@pytest.mark.parametrize("name", backends.backend_names())
+@pytest.mark.parametrize("blocks", SIZES[1:4])
+def test_backends_match_scalar(rng, round_keys, scalar, name, blocks):
+    if name == "numpy":
+        pytest.importorskip("numpy")
+
+    backend = backends.get_backend(name)
+    workers = 2 if backend.parallel else 1
+    data = rng.randbytes(32 * blocks)
+
+    encrypted = backend.encrypt(data, round_keys, workers)
+    assert encrypted == scalar(data, round_keys)
+    assert backend.decrypt(encrypted, round_keys, workers) == data
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+def test_bulk_follows_profile(rng, key, round_keys, scalar, blocks):
+    backends.set_profile(profile((2, "scalar", 1), (None, "lanes", 1), chunk_blocks=16))
+    data = rng.randbytes(32 * blocks)
+
+    assert backends.select(2)[0].name == "scalar"
+    assert backends.select(3)[0].name == "lanes"
+    assert backends.encrypt_blocks(data, key) == scalar(data, round_keys)
+    assert backends.decrypt_blocks(data, round_keys) == scalar(
+        data, round_keys, decrypting=True
+    )
+
+
+def test_bulk_rejects_partial_blocks(key):
+    backends.set_profile(profile((None, "lanes", 1)))
+
+    with pytest.raises(ValueError):
+        backends.encrypt_blocks(bytes(33), key)
+
+
+def test_unknown_backend_in_profile_falls_back():
+    from fragment.threads import serial_engine
+
+    backends.set_profile(profile((None, "elsewhere", 1)))
+
+    assert backends.select(4) == (backends.get_backend(serial_engine()[0]), 1)
+
+
+def test_forced_backend(monkeypatch):
+    monkeypatch.setenv("FRAGMENT_BACKEND", "unrolled")
+
+    assert backends.profile()["choices"][0]["backend"] == "unrolled"
+    assert backends.select(1 << 20) == (backends.get_backend("unrolled"), 1)
+
+    with pytest.raises(ValueError):
+        backends.forced_profile("nothing")
+
+
+def test_register_backend(rng, round_keys, scalar):
+    calls = []
+
+    def crypt(data, round_keys, workers):
+        calls.append(len(data))
+        return backends.get_backend("scalar").encrypt(data, round_keys, workers)
+
+    backends.register_backend("custom", crypt, crypt)
+    backends.register_backend("missing", crypt, crypt, available=lambda: False)
+    backends.set_profile(profile((None, "custom", 1), chunk_blocks=2))
+    data = rng.randbytes(32 * 5)
+
+    assert "missing" in backends.backend_names()
+    assert "missing" not in backends.available_backends()
+    assert backends.encrypt_blocks(data, round_keys) == scalar(data, round_keys)
+    assert calls == [64, 64, 32]
+
+
+def test_profile_cache(tmp_path):
+    path = str(tmp_path / "nested" / "profile.json")
+    saved = profile((None, "lanes", 1))
+
+    assert backends.save_profile(saved, path) == path
+    assert backends.load_profile(path) == saved
+    assert backends.load_profile(str(tmp_path / "missing.json")) is None
+
+    for stale in (
+        dict(saved, version=backends.PROFILE_VERSION + 1),
+        dict(saved, environment=dict(saved["environment"], cpus=-1)),
+        [saved],
+    ):
+        with open(path, "w") as file:
+            json.dump(stale, file)
+        assert backends.load_profile(path) is None
+
+    with open(path, "w") as file:
+        file.write("{")
+    assert backends.load_profile(path) is None
+
+
+def test_tune(monkeypatch, tmp_path):
+    monkeypatch.setattr(backends, "_candidates", lambda: [("scalar", 1), ("lanes", 1)])
+    path = str(tmp_path / "tuned.json")
+
+    tuned = backends.tune(sizes=(1, 4), path=path)
+
+    assert backends.profile() is tuned
+    assert backends.load_profile(path) == tuned
+    assert tuned["choices"][-1]["max_blocks"] is None
+    assert {choice["backend"] for choice in tuned["choices"]} <= {"scalar", "lanes"}
+    assert set(tuned["timings"]) == {"1", "4", "chunks"}
+    assert tuned["chunk_blocks"] in backends.CHUNK_SIZES
+
+
+@pytest.mark.parametrize("processes_win", (False, True))
+def test_tune_closes_unused_pools(monkeypatch, processes_win):
+    started = []
+    pool = backends._pool
+
+    def spy(workers):
+        started.append(pool(workers))
+        return started[-1]
+
+    # Candidates are timed in order, then the chunk sizes of a serial winner.
+    seconds = [2.0, 1.0] if processes_win else [1.0, 2.0]
+    times = itertools.chain(seconds, itertools.repeat(1.0))
+
+    def fake_time(function, repeats=backends.REPEATS):
+        function()
+        return next(times)
+
+    monkeypatch.setattr(backends, "_pool", spy)
+    monkeypatch.setattr(backends, "_time", fake_time)
+    monkeypatch.setattr(
+        backends, "_candidates", lambda: [("lanes", 1), ("processes", 2)]
+    )
+
+    tuned = backends.tune(sizes=(1,), save=False)
+
+    assert started
+    assert tuned["choices"][0]["backend"] == ("processes" if processes_win else "lanes")
+    assert list(backends._pools) == ([2] if processes_win else [])
+    assert started[0]._closed is not processes_win
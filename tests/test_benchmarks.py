@@ -0,0 +1,76 @@
+"""Benchmark suite timing and regression gate."""
+
+import os
+import sys
+
+BENCHMARKS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"
+)
+sys.path.insert(0, BENCHMARKS)
+
+import suite  # noqa: E402
+
+
+def test_measure(monkeypatch):
+    monkeypatch.setattr(suite, "MIN_SAMPLE_TIME", 0.001)
+    calls = []
+
+    result = suite.measure(lambda: calls.append(None), warmup=2, samples=5)
+
+    assert set(result) == {"min", "median", "iqr", "loops"}
+    assert 0 < result["min"] <= result["median"]
+    # Loops are doubled from one until a sample is long enough.
+    assert result["loops"] & (result["loops"] - 1) == 0
+    assert len(calls) >= 2 + 5 * result["loops"]
+
+    result = suite.measure(
+        lambda: None, warmup=0, samples=2, reference=suite._reference
+    )
+    assert 0 < result["reference"]
+
+
+def test_compare_gates_on_the_fastest_sample():
+    def metric(fastest, median):
+        return {"min": fastest, "median": median, "iqr": 0.0, "loops": 1}
+
+    baseline = {
+        "metrics": {
+            "steady": metric(1.0, 1.1),
+            "jittery": metric(1.0, 1.1),
+            "slower": metric(1.0, 1.1),
+            "gone": metric(1.0, 1.1),
+            "old format": {"median": 1.0, "iqr": 0.0, "loops": 1},
+        }
+    }
+    results = {
+        "steady": metric(1.05, 1.1),
+        "jittery": metric(1.1, 2.0),
+        "slower": metric(1.3, 1.3),
+        "new": metric(5.0, 5.0),
+        "old format": metric(5.0, 5.0),
+    }
+
+    assert suite.compare(results, baseline, tolerance=0.25) == ["slower"]
+
+
+def test_compare_scales_by_the_speed_of_the_machine():
+    def metric(fastest, reference):
+        return {"min": fastest, "median": fastest, "iqr": 0.0, "reference": reference}
+
+    baseline = {"metrics": {"throttled": metric(1.0, 1.0), "slower": metric(1.0, 1.0)}}
+    results = {"throttled": metric(1.5, 1.5), "slower": metric(1.5, 1.1)}
+
+    assert suite.compare(results, baseline, tolerance=0.25) == ["slower"]
+
+
+def test_remeasure_keeps_the_faster_run(monkeypatch):
+    runs = iter([1.0, 3.0])
+    monkeypatch.setattr(suite, "benchmarks", lambda: {"op": (None, 1)})
+    monkeypatch.setattr(suite, "measure", lambda *args: {"min": next(runs)})
+    results = {"op": {"min": 2.0}}
+
+    suite.remeasure(results, ["op"])
+    assert results == {"op": {"min": 1.0}}
+
+    suite.remeasure(results, ["op"])
+    assert results == {"op": {"min": 1.0}}
@@ -0,0 +1,63 @@
+"""Buffer API against the scalar cipher."""
+
+import threading
+
+import pytest
+
+from fragment import buffers
+
+from .conftest import SIZES
+
+# The scalar run uses the lane engine.
+NUMPY_MODULES = (buffers,)
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+def test_matches_scalar(engine, rng, round_keys, scalar, blocks):
+    data = rng.randbytes(32 * blocks)
+    out = bytearray(len(data))
+
+    buffers.encrypt_into(out, data, round_keys)
+    assert out == scalar(data, round_keys)
+
+    buffers.decrypt_into(out, out, round_keys)
+    assert out == data
+
+
+def test_chunked_workspace(rng, round_keys, scalar, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(buffers, "CHUNK_BLOCKS", 4)
+    monkeypatch.setattr(buffers, "_local", threading.local())
+
+    for blocks in (3, 4, 9):
+        data = rng.randbytes(32 * blocks)
+        out = bytearray(len(data))
+
+        buffers.encrypt_into(out, data, round_keys)
+        assert out == scalar(data, round_keys)
+
+
+def test_buffer_types(engine, rng, key, round_keys, scalar):
+    data = rng.randbytes(32 * 3)
+    expected = scalar(data, round_keys)
+
+    # A larger output buffer keeps its tail.
+    out = bytearray(b"\xaa" * (len(data) + 5))
+    buffers.encrypt_into(memoryview(out), memoryview(data), key)
+    assert out == expected + b"\xaa" * 5
+
+    if engine == "numpy":
+        import numpy as np
+
+        array = np.frombuffer(data, dtype=np.uint8).copy()
+        buffers.encrypt_into(array, array, round_keys)
+        assert array.tobytes() == expected
+
+
+def test_invalid_buffers(engine, round_keys):
+    with pytest.raises(ValueError):
+        buffers.encrypt_into(bytearray(64), bytes(33), round_keys)
+    with pytest.raises(ValueError):
+        buffers.encrypt_into(bytearray(32), bytes(64), round_keys)
+    with pytest.raises(TypeError):
+        buffers.encrypt_into(bytes(32), bytes(32), round_keys)
@@ -0,0 +1,40 @@
+"""Cipher context against the scalar cipher."""
+
+import pytest
+
+from fragment.cipher import Fragment256
+from fragment.fragment_256 import b2i, decrypt, encrypt, i2b
+
+from .conftest import SIZES
+
+# The cipher only reaches NumPy through fragment.vectorized.
+NUMPY_MODULES = ()
+
+
+def test_blocks(rng, key, round_keys):
+    cipher = Fragment256(key)
+    block = rng.randbytes(32)
+    expected = encrypt(data=block, round_keys=round_keys)
+
+    assert cipher.encrypt_block(block) == i2b(expected)
+    assert cipher.decrypt_block(i2b(expected)) == block
+    assert cipher.encrypt_block(b2i(string=block, length=4)) == expected
+    assert cipher.decrypt_block(expected) == decrypt(
+        data=expected, round_keys=round_keys
+    )
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+def test_bulk(engine, rng, key, round_keys, scalar, blocks):
+    cipher = Fragment256(key)
+    data = rng.randbytes(32 * blocks)
+    encrypted = cipher.encrypt_blocks(data)
+
+    assert encrypted == scalar(data, round_keys)
+    assert cipher.decrypt_blocks(encrypted) == data
+    assert cipher.decrypt_blocks(data) == scalar(data, round_keys, decrypting=True)
+
+
+def test_partial_block_rejected(engine, key):
+    with pytest.raises(ValueError):
+        Fragment256(key).encrypt_blocks(bytes(33))
@@ -0,0 +1,102 @@
+"""File encryption from the command line."""
+
+import pytest
+
+from fragment import cli, ctr
+
+from .conftest import KEY
+
+
+@pytest.fixture
+def files(tmp_path):
+    return [str(tmp_path / name) for name in ("plain", "encrypted", "decrypted")]
+
+
+@pytest.mark.parametrize("length", (0, 1, 33, 5000))
+@pytest.mark.parametrize("workers", (1, 2))
+def test_round_trip(rng, files, length, workers):
+    plain, encrypted, decrypted = files
+    data = rng.randbytes(length)
+    with open(plain, "wb") as file:
+        file.write(data)
+
+    assert cli.crypt_file(plain, encrypted, KEY, False, workers) == length
+    assert cli.crypt_file(encrypted, decrypted, KEY, True, workers) == length
+
+    with open(encrypted, "rb") as file:
+        nonce = file.read(cli.NONCE_SIZE)
+        assert file.read() == ctr.ctr_encrypt(data, KEY, nonce)
+    with open(decrypted, "rb") as file:
+        assert file.read() == data
+
+
+def test_main(rng, files, capsys):
+    plain, encrypted, decrypted = files
+    data = rng.randbytes(100)
+    with open(plain, "wb") as file:
+        file.write(data)
+
+    for command, source, target in (
+        ("encrypt", plain, encrypted),
+        ("decrypt", encrypted, decrypted),
+    ):
+        assert cli.main([command, source, target, "--key", KEY.hex(), "-j", "1"]) == 0
+
+    with open(decrypted, "rb") as file:
+        assert file.read() == data
+    assert "decrypted 100 bytes" in capsys.readouterr().err
+
+
+def test_same_file_rejected(files):
+    plain = files[0]
+    with open(plain, "wb") as file:
+        file.write(b"keep me")
+
+    with pytest.raises(ValueError):
+        cli.crypt_file(plain, plain, KEY, False, 1)
+
+    with open(plain, "rb") as file:
+        assert file.read() == b"keep me"
+
+
+def test_short_input_rejected(files):
+    plain, encrypted, _ = files
+    with open(plain, "wb") as file:
+        file.write(bytes(cli.NONCE_SIZE - 1))
+
+    with pytest.raises(ValueError):
+        cli.crypt_file(plain, encrypted, KEY, True, 1)
+
+
+@pytest.mark.parametrize("case", ("same file", "bad key", "missing input"))
+def test_main_reports_errors(files, capsys, case):
+    plain, encrypted, _ = files
+    with open(plain, "wb") as file:
+        file.write(b"keep me")
+
+    source, target, key = {
+        "same file": (plain, plain, KEY.hex()),
+        "bad key": (plain, encrypted, "not hex"),
+        "missing input": (plain + ".missing", encrypted, KEY.hex()),
+    }[case]
+
+    assert cli.main(["encrypt", source, target, "--key", key, "-j", "1"]) == 1
+
+    error = capsys.readouterr().err
+    assert error.startswith("fragment: error: ")
+    assert "Traceback" not in error
+    with open(plain, "rb") as file:
+        assert file.read() == b"keep me"
+
+
+@pytest.mark.parametrize("workers", ("0", "-2", "x"))
+def test_invalid_workers(files, workers, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["encrypt", files[0], files[1], "--key", KEY.hex(), "-j", workers])
+
+    assert "--workers" in capsys.readouterr().err
+
+
+def test_shards():
+    assert cli.shards(100, 1) == [(0, 100)]
+    assert cli.shards(100, 3) == [(0, 64), (64, 36)]
@@ -0,0 +1,102 @@
+"""Chunked containers against counter mode."""
+
+import io
+import struct
+
+import pytest
+
+from fragment import container, ctr
+from fragment.container import ContainerError, ContainerReader, ContainerWriter
+
+CHUNK_SIZE = 64
+
+
+def write(data: bytes, key, **kwargs) -> io.BytesIO:
+    file = io.BytesIO()
+    with ContainerWriter(file, key, chunk_size=CHUNK_SIZE, **kwargs) as writer:
+        # Uneven writes, so chunks are cut across write boundaries.
+        for x in range(0, len(data), 50):
+            writer.write(data[x : x + 50])
+
+    return file
+
+
+@pytest.mark.parametrize("length", (0, 1, 63, 64, 65, 640, 1000))
+def test_round_trip(rng, key, length):
+    data = rng.randbytes(length)
+    file = write(data, key)
+    reader = ContainerReader(file, key, require_authentication=False)
+
+    assert reader.chunk_count == -(-length // CHUNK_SIZE)
+    assert reader.length == length
+    assert not reader.authenticated
+    assert reader.read_all() == data
+
+    # The chunks hold one counter mode stream.
+    payload = file.getvalue()[container.HEADER.size :][:length]
+    assert payload == ctr.ctr_encrypt(data, key, reader.nonce)
+
+
+def test_random_chunks(rng, key):
+    data = rng.randbytes(1000)
+    reader = ContainerReader(
+        write(data, key, nonce=bytes(24)), key, require_authentication=False
+    )
+
+    assert reader.nonce == bytes(24)
+    for number in (15, 0, 7):
+        chunk = data[number * CHUNK_SIZE : (number + 1) * CHUNK_SIZE]
+        assert reader.read_chunk(number) == chunk
+
+    chunks = list(reader.read_chunks([3, 1]))
+    assert chunks == [data[192:256], data[64:128]]
+
+
+def test_write_after_close(key):
+    file = io.BytesIO()
+    writer = ContainerWriter(file, key)
+    writer.close()
+
+    with pytest.raises(ValueError):
+        writer.write(b"x")
+
+
+@pytest.mark.parametrize("chunk_size", (0, 16, 33))
+def test_invalid_chunk_size(key, chunk_size):
+    with pytest.raises(ValueError):
+        ContainerWriter(io.BytesIO(), key, chunk_size=chunk_size)
+
+
+def corrupt(stored: bytes, position: int, value: bytes) -> io.BytesIO:
+    return io.BytesIO(stored[:position] + value + stored[position + len(value) :])
+
+
+@pytest.mark.parametrize(
+    "position, value",
+    (
+        (0, b"XXXX"),
+        (4, struct.pack(">H", 2)),
+        (6, struct.pack(">H", 0x80)),
+        (8, struct.pack(">I", 48)),
+        (-4, b"XXXX"),
+        (-20, struct.pack(">Q", 1)),
+    ),
+)
+def test_malformed(rng, key, position, value):
+    stored = write(rng.randbytes(200), key).getvalue()
+    position %= len(stored)
+
+    with pytest.raises(ContainerError):
+        ContainerReader(
+            corrupt(stored, position, value), key, require_authentication=False
+        )
+
+
+def test_truncated(rng, key):
+    stored = write(rng.randbytes(200), key).getvalue()
+
+    for length in (0, container.HEADER.size, len(stored) - 1):
+        with pytest.raises(ContainerError):
+            ContainerReader(
+                io.BytesIO(stored[:length]), key, require_authentication=False
+            )
@@ -0,0 +1,146 @@
+"""Counter mode against counter blocks encrypted by the scalar cipher."""
+
+import pytest
+
+from fragment import ctr
+from fragment.fragment_256 import b2i, encrypt, i2b, round_function
+
+COUNTER_BITS = (32, 64, 128, 192, 256)
+NUMPY_MODULES = (ctr,)
+
+
+def reference(round_keys, nonce, counter_bits, first, count) -> bytes:
+    return b"".join(
+        i2b(
+            encrypt(
+                data=nonce + (first + x).to_bytes(counter_bits // 8, "big"),
+                round_keys=round_keys,
+            )
+        )
+        for x in range(count)
+    )
+
+
+def xor(x: bytes, y: bytes) -> bytes:
+    return bytes(a ^ b for a, b in zip(x, y))
+
+
+@pytest.mark.parametrize("counter_bits", COUNTER_BITS)
+def test_keystream_layout(engine, rng, round_keys, counter_bits):
+    nonce = rng.randbytes(ctr.nonce_size(counter_bits))
+    mode = ctr.CounterMode(round_keys, nonce, counter_bits, initial_counter=5)
+
+    assert mode.keystream(3, 7) == reference(round_keys, nonce, counter_bits, 8, 7)
+
+
+@pytest.mark.parametrize("counter_bits", (128, 192, 256))
+def test_counter_carry_past_64_bits(engine, rng, round_keys, counter_bits):
+    nonce = rng.randbytes(ctr.nonce_size(counter_bits))
+    first = (1 << 64) - 3
+    # Small batches put the carry both inside a batch and between batches.
+    mode = ctr.CounterMode(
+        round_keys, nonce, counter_bits, initial_counter=first, batch_blocks=4
+    )
+
+    assert mode.keystream(0, 9) == reference(round_keys, nonce, counter_bits, first, 9)
+
+
+def test_counter_limit(engine, rng, round_keys):
+    nonce = rng.randbytes(ctr.nonce_size(64))
+    mode = ctr.CounterMode(round_keys, nonce, initial_counter=(1 << 64) - 3)
+
+    assert len(mode.keystream(0, 3)) == 96
+    with pytest.raises(ValueError):
+        mode.keystream(0, 4)
+
+
+@pytest.mark.parametrize(
+    "offset, length", ((0, 0), (0, 1), (5, 27), (31, 2), (32, 64), (7, 200))
+)
+def test_crypt_at(engine, rng, round_keys, offset, length):
+    nonce = rng.randbytes(ctr.nonce_size())
+    data = rng.randbytes(length)
+    mode = ctr.CounterMode(round_keys, nonce, batch_blocks=3)
+
+    stream = reference(round_keys, nonce, 64, 0, -(-(offset + length) // 32))
+    encrypted = mode.crypt_at(offset, data)
+
+    assert encrypted == xor(data, stream[offset:])
+    assert mode.crypt_at(offset, encrypted) == data
+
+
+def test_round_trip_and_streaming(engine, rng, key):
+    nonce = rng.randbytes(ctr.nonce_size())
+    data = rng.randbytes(1000)
+    encrypted = ctr.ctr_encrypt(data, key, nonce)
+
+    assert ctr.ctr_decrypt(encrypted, key, nonce) == data
+    assert ctr.ctr_encrypt(b"", key, nonce) == b""
+
+    mode = ctr.CounterMode(key, nonce)
+    pieces = [mode.update(data[x : x + 77]) for x in range(0, len(data), 77)]
+    assert b"".join(pieces) == encrypted
+
+
+def test_crypt_into_in_place(engine, rng, round_keys):
+    nonce = rng.randbytes(ctr.nonce_size())
+    data = rng.randbytes(100)
+    buffer = bytearray(data)
+    mode = ctr.CounterMode(round_keys, nonce)
+
+    mode.crypt_into(10, buffer, buffer)
+
+    assert bytes(buffer) == mode.crypt_at(10, data)
+
+
+@pytest.mark.parametrize(
+    "counter_bits, nonce_length, initial_counter",
+    ((48, 26, 0), (64, 23, 0), (64, 24, -1), (32, 28, 1 << 32)),
+)
+def test_invalid_parameters(round_keys, counter_bits, nonce_length, initial_counter):
+    with pytest.raises(ValueError):
+        ctr.CounterMode(round_keys, bytes(nonce_length), counter_bits, initial_counter)
+
+
+@pytest.mark.parametrize("counter_bits", COUNTER_BITS)
+def test_first_round_reuse(engine, rng, round_keys, counter_bits):
+    nonce = rng.randbytes(ctr.nonce_size(counter_bits))
+    mode = ctr.CounterMode(round_keys, nonce, counter_bits)
+
+    # Only counters confined to the right half leave the first round fixed.
+    if counter_bits <= 128:
+        m, n, o, p = b2i(string=nonce[:16], length=4)
+        assert mode._first_round == round_function(
+            m=m, n=n, o=o, p=p, round_keys=round_keys[0]
+        )
+    else:
+        assert mode._first_round is None
+
+    first = (1 << counter_bits) - 4
+    mode = ctr.CounterMode(round_keys, nonce, counter_bits, initial_counter=first)
+    assert mode.keystream(0, 4) == reference(round_keys, nonce, counter_bits, first, 4)
+
+
+@pytest.mark.parametrize("sizes", ((), (0,), (5,), (31, 1, 0, 64, 3), (100, 7, 33)))
+def test_iter(engine, rng, key, sizes):
+    nonce = rng.randbytes(ctr.nonce_size())
+    chunks = [rng.randbytes(size) for size in sizes]
+    data = b"".join(chunks)
+
+    pieces = list(ctr.encrypt_iter([bytearray(x) for x in chunks], key, nonce))
+
+    assert b"".join(pieces) == ctr.ctr_encrypt(data, key, nonce)
+    assert all(len(piece) % 32 == 0 for piece in pieces[:-1])
+    assert b"".join(ctr.decrypt_iter(pieces, key, nonce)) == data
+
+
+def test_iter_is_lazy(rng, key):
+    nonce = rng.randbytes(ctr.nonce_size())
+
+    def endless():
+        while True:
+            yield bytes(40)
+
+    first = next(ctr.encrypt_iter(endless(), key, nonce))
+
+    assert first == ctr.ctr_encrypt(bytes(32), key, nonce)
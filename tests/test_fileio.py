@@ -0,0 +1,115 @@
+"""Seekable encrypted files against counter mode."""
+
+import io
+
+import pytest
+
+from fragment import cli, ctr, fileio
+from fragment.fileio import FILL_SIZE, NONCE_SIZE, EncryptedFile
+
+
+def open_new(key) -> tuple:
+    raw = io.BytesIO()
+    return raw, EncryptedFile(raw, key)
+
+
+def test_layout_matches_ctr(rng, key):
+    data = rng.randbytes(1000)
+    raw, file = open_new(key)
+
+    assert file.write(data) == len(data)
+
+    stored = raw.getvalue()
+    assert stored[:NONCE_SIZE] == file.nonce
+    assert stored[NONCE_SIZE:] == ctr.ctr_encrypt(data, key, file.nonce)
+
+
+@pytest.mark.parametrize(
+    "offset, length", ((0, 0), (0, 1), (31, 2), (33, 100), (990, 50))
+)
+def test_random_access_read(rng, key, offset, length):
+    data = rng.randbytes(1000)
+    raw, file = open_new(key)
+    file.write(data)
+
+    assert file.seek(offset) == offset
+    assert file.read(length) == data[offset : offset + length]
+    assert file.tell() == min(offset + length, len(data))
+
+
+@pytest.mark.parametrize("fill_size", (32, FILL_SIZE))
+def test_gaps_read_as_zeros(rng, key, monkeypatch, fill_size):
+    monkeypatch.setattr(fileio, "FILL_SIZE", fill_size)
+    data = rng.randbytes(10)
+    raw, file = open_new(key)
+    file.write(data)
+
+    file.seek(100)
+    file.write(b"tail")
+    file.truncate(300)
+
+    expected = data + bytes(90) + b"tail" + bytes(196)
+    file.seek(0)
+    assert file.read() == expected
+    assert raw.getvalue()[NONCE_SIZE:] == ctr.ctr_encrypt(expected, key, file.nonce)
+
+
+def test_overwrite_and_truncate(rng, key):
+    data = bytearray(rng.randbytes(200))
+    raw, file = open_new(key)
+    file.write(data)
+
+    patch = rng.randbytes(45)
+    file.seek(70)
+    file.write(patch)
+    data[70:115] = patch
+
+    assert file.seek(-10, io.SEEK_END) == 190
+    assert file.seek(-5, io.SEEK_CUR) == 185
+    file.seek(0)
+    assert file.read() == data
+
+    assert file.truncate(100) == 100
+    file.seek(0)
+    assert file.read() == data[:100]
+    assert len(raw.getvalue()) == NONCE_SIZE + 100
+
+
+def test_reopen_and_buffered(rng, key):
+    data = rng.randbytes(500)
+    raw, file = open_new(key)
+    file.write(data)
+
+    reopened = EncryptedFile(io.BytesIO(raw.getvalue()), key)
+    assert reopened.nonce == file.nonce
+
+    buffered = io.BufferedReader(reopened, buffer_size=64)
+    buffered.seek(123)
+    assert buffered.read(200) == data[123:323]
+
+
+def test_reads_cli_output(rng, key, tmp_path):
+    data = rng.randbytes(777)
+    plain, encrypted = tmp_path / "plain", tmp_path / "encrypted"
+    plain.write_bytes(data)
+    cli.crypt_file(str(plain), str(encrypted), key, False, 1)
+
+    with EncryptedFile(open(encrypted, "rb"), key) as file:
+        file.seek(300)
+        assert file.read(100) == data[300:400]
+
+
+def test_invalid(key):
+    with pytest.raises(ValueError):
+        EncryptedFile(io.BytesIO(bytes(NONCE_SIZE - 1)), key)
+
+    raw, file = open_new(key)
+    with pytest.raises(ValueError):
+        file.seek(-1)
+    with pytest.raises(ValueError):
+        file.seek(0, 3)
+
+    file.close()
+    assert raw.closed
+    with pytest.raises(ValueError):
+        file.read(1)
@@ -0,0 +1,56 @@
+"""Scalar reference cipher: known answers and round trips."""
+
+import pytest
+
+from fragment.fragment_256 import b2i, decrypt, encrypt, i2b, key_schedule
+
+# Recorded from the original scalar implementation.
+KNOWN_ANSWERS = (
+    (
+        bytes(range(32)),
+        bytes(range(32, 64)),
+        "f97e72efc3cde5cd5a0dd54b92474a0269493803bde2ab4be198710f6f20b6d8",
+    ),
+    (
+        bytes(32),
+        bytes(32),
+        "c7ec6605471970f23e2f4b69fafb243c2bca84fe7c844af76cd7140a02d7278c",
+    ),
+)
+
+
+@pytest.mark.parametrize("key, block, expected", KNOWN_ANSWERS)
+def test_known_answers(key, block, expected):
+    round_keys = key_schedule(encryption_key=key)
+
+    assert i2b(encrypt(data=block, round_keys=round_keys)).hex() == expected
+
+
+def test_key_schedule_shape(round_keys):
+    assert len(round_keys) == 32
+    assert all(len(pair) == 2 and all(len(x) == 4 for x in pair) for pair in round_keys)
+    assert all(0 <= word < 1 << 32 for pair in round_keys for x in pair for word in x)
+
+
+def test_round_trip(rng, round_keys):
+    for _ in range(8):
+        block = rng.randbytes(32)
+        encrypted = encrypt(data=block, round_keys=round_keys)
+
+        assert i2b(decrypt(data=encrypted, round_keys=round_keys)) == block
+
+
+def test_bytes_and_words_agree(rng, round_keys):
+    block = rng.randbytes(32)
+
+    assert encrypt(data=block, round_keys=round_keys) == encrypt(
+        data=b2i(string=block, length=4), round_keys=round_keys
+    )
+
+
+def test_key_instead_of_round_keys(key, round_keys):
+    block = bytes(range(32, 64))
+
+    assert encrypt(data=block, round_keys=key) == encrypt(
+        data=block, round_keys=round_keys
+    )
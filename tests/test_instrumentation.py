@@ -0,0 +1,65 @@
+"""Call counters and key schedule timers of the scalar cipher."""
+
+import pytest
+
+from fragment import fragment_256
+from fragment.fragment_256 import (
+    disable_instrumentation,
+    enable_instrumentation,
+    instrumentation_snapshot,
+    reset_instrumentation,
+)
+
+
+@pytest.fixture
+def instrumented():
+    reset_instrumentation()
+    enable_instrumentation()
+    yield
+    disable_instrumentation()
+    reset_instrumentation()
+
+
+def test_counts(round_keys, instrumented):
+    fragment_256.encrypt(data=bytes(32), round_keys=round_keys)
+    calls = instrumentation_snapshot()["calls"]
+
+    assert calls["round_function"] == 32
+    assert calls["arx_mixer"] == 64
+    assert calls["pht_mixer"] == 32
+    assert calls["key_schedule_mixer"] == 0
+
+
+def test_key_schedule_phases(round_keys, instrumented):
+    assert fragment_256.key_schedule(encryption_key=bytes(range(32))) == round_keys
+    phases = instrumentation_snapshot()["phases"]
+
+    assert {phase["calls"] for phase in phases.values()} == {1}
+    assert all(phase["seconds"] > 0 for phase in phases.values())
+
+
+def test_enable_and_disable(round_keys):
+    original = fragment_256.arx_mixer
+
+    enable_instrumentation()
+    try:
+        assert instrumentation_snapshot()["enabled"]
+        assert fragment_256.arx_mixer is not original
+        assert fragment_256.arx_mixer.__wrapped__ is original
+        assert fragment_256.arx_mixer.__name__ == "arx_mixer"
+
+        # Enabling twice does not wrap twice.
+        enable_instrumentation()
+        assert fragment_256.arx_mixer.__wrapped__ is original
+    finally:
+        disable_instrumentation()
+
+    assert not instrumentation_snapshot()["enabled"]
+    assert fragment_256.arx_mixer is original
+
+    calls = instrumentation_snapshot()["calls"]
+    fragment_256.encrypt(data=bytes(32), round_keys=round_keys)
+    assert instrumentation_snapshot()["calls"] == calls
+
+    reset_instrumentation()
+    assert set(instrumentation_snapshot()["calls"].values()) == {0}
@@ -0,0 +1,182 @@
+"""Merkle tree integrity and authenticated containers."""
+
+import io
+
+import pytest
+
+from fragment import container, integrity
+from fragment.container import ContainerError, ContainerReader, ContainerWriter
+from fragment.fragment_256 import key_schedule
+from fragment.integrity import IntegrityError, MerkleTree
+
+CHUNK_SIZE = 64
+# Leaf counts with odd nodes promoted on one or several levels.
+COUNTS = (1, 2, 3, 5, 6, 7, 9)
+
+
+@pytest.fixture
+def mac_keys(round_keys):
+    return integrity.mac_key(round_keys, bytes(24))
+
+
+def test_mac_key_is_separate(key, round_keys, mac_keys):
+    assert mac_keys != round_keys
+    assert integrity.mac_key(key, bytes(24)) == mac_keys
+    assert integrity.mac_key(round_keys, bytes(23) + b"\x01") != mac_keys
+    assert integrity.mac_key(key_schedule(encryption_key=bytes(32)), bytes(24)) != (
+        mac_keys
+    )
+
+
+def test_batched_macs(rng, mac_keys):
+    labels = [integrity.leaf_label(x) for x in range(4)]
+
+    for length in (0, 1, 32, 45):
+        data = rng.randbytes(4 * length)
+        tags = integrity.macs(mac_keys, labels, data, length)
+        single = [
+            integrity.macs(
+                mac_keys, [label], data[x * length : (x + 1) * length], length
+            )
+            for x, label in enumerate(labels)
+        ]
+
+        assert tags == [tag for (tag,) in single]
+        assert len(set(tags)) == 4
+
+
+def test_padding_and_labels_matter(mac_keys):
+    tag = integrity.leaf_tag(mac_keys, 0, b"abc")
+
+    assert integrity.leaf_tag(mac_keys, 0, b"abc\x00") != tag
+    assert integrity.leaf_tag(mac_keys, 1, b"abc") != tag
+    assert integrity.leaf_tag(mac_keys, 0, b"abd") != tag
+
+
+@pytest.mark.parametrize("count", COUNTS)
+def test_paths(rng, mac_keys, count):
+    leaves = [rng.randbytes(32) for _ in range(count)]
+    tree = MerkleTree(mac_keys, leaves)
+    stored = tree.to_bytes()
+
+    assert len(stored) == integrity.tree_size(count)
+    assert stored[-32:] == tree.root
+
+    for index in range(count):
+        path = tree.path(index)
+        offsets = integrity.path_offsets(count, index)
+
+        assert [None if x is None else stored[x : x + 32] for x in offsets] == path
+        assert (
+            integrity.root_from_path(mac_keys, count, index, leaves[index], path)
+            == tree.root
+        )
+        assert (
+            integrity.root_from_path(mac_keys, count, index, bytes(32), path)
+            != tree.root
+        )
+
+
+def write(data: bytes, key) -> bytes:
+    file = io.BytesIO()
+    with ContainerWriter(
+        file, key, chunk_size=CHUNK_SIZE, authenticated=True
+    ) as writer:
+        writer.write(data)
+
+    return file.getvalue()
+
+
+@pytest.mark.parametrize("count", COUNTS)
+def test_authenticated_round_trip(rng, key, count):
+    data = rng.randbytes(CHUNK_SIZE * count - 7)
+    reader = ContainerReader(io.BytesIO(write(data, key)), key)
+
+    assert reader.authenticated
+    reader.verify()
+    assert reader.read_all() == data
+    for number in range(count):
+        chunk = data[number * CHUNK_SIZE : (number + 1) * CHUNK_SIZE]
+        assert reader.read_chunk(number) == chunk
+
+
+def tampered(stored: bytes, position: int) -> io.BytesIO:
+    data = bytearray(stored)
+    data[position] ^= 1
+
+    return io.BytesIO(data)
+
+
+def test_tampered_chunk(rng, key):
+    stored = write(rng.randbytes(CHUNK_SIZE * 5), key)
+    position = ContainerReader(io.BytesIO(stored), key).index[3][0] + 10
+    reader = ContainerReader(tampered(stored, position), key)
+
+    with pytest.raises(IntegrityError, match="chunk 3"):
+        reader.verify()
+    with pytest.raises(IntegrityError, match="chunk 3"):
+        reader.read_chunk(3)
+    with pytest.raises(IntegrityError):
+        reader.read_all()
+
+    # Other chunks only read the stored tags of their path.
+    assert reader.read_chunk(2) == ContainerReader(io.BytesIO(stored), key).read_chunk(
+        2
+    )
+    # Unverified reads decrypt the damaged chunk.
+    assert len(reader.read_chunk(3, verify=False)) == CHUNK_SIZE
+
+
+def test_tampered_tree(rng, key):
+    stored = write(rng.randbytes(CHUNK_SIZE * 5), key)
+    reader = ContainerReader(io.BytesIO(stored), key)
+    tree = reader._tree_offset
+
+    # Stored leaf of chunk 3, sibling of chunk 2.
+    reader = ContainerReader(tampered(stored, tree + 3 * 32), key)
+    with pytest.raises(IntegrityError, match="chunk 3"):
+        reader.verify()
+    with pytest.raises(IntegrityError, match="chunk 2"):
+        reader.read_chunk(2)
+    reader.read_chunk(0)
+
+    # Root
+    root = tree + integrity.tree_size(5) - 1
+    reader = ContainerReader(tampered(stored, root), key)
+    with pytest.raises(IntegrityError, match="integrity tree"):
+        reader.verify()
+    with pytest.raises(IntegrityError):
+        reader.read_chunk(4)
+
+
+def test_wrong_key(rng, key):
+    stored = write(rng.randbytes(100), key)
+
+    with pytest.raises(IntegrityError):
+        ContainerReader(io.BytesIO(stored), bytes(32)).verify()
+
+
+def test_unauthenticated_container(key):
+    file = io.BytesIO()
+    ContainerWriter(file, key, chunk_size=CHUNK_SIZE).close()
+    reader = ContainerReader(file, key, require_authentication=False)
+
+    with pytest.raises(ContainerError):
+        reader.verify()
+    with pytest.raises(ContainerError):
+        reader.read_chunk(0, verify=True)
+
+
+def test_cleared_flag_is_refused(rng, key):
+    data = rng.randbytes(CHUNK_SIZE * 3)
+    stored = bytearray(write(data, key))
+    # The flags field follows the magic and the version.
+    stored[7] &= ~container.FLAG_MERKLE & 0xFF
+
+    with pytest.raises(IntegrityError, match="no integrity tree"):
+        ContainerReader(io.BytesIO(stored), key)
+
+    # Only an explicit opt-out reads it, unverified.
+    reader = ContainerReader(io.BytesIO(stored), key, require_authentication=False)
+    assert not reader.authenticated
+    assert reader.read_all() == data
@@ -0,0 +1,92 @@
+"""Key schedule cache and key expansion."""
+
+import pytest
+
+from fragment.fragment_256 import encrypt, expand_key, key_schedule
+from fragment.keycache import KeyScheduleCache, schedule_size
+
+
+def test_hits_and_misses(key, round_keys):
+    cache = KeyScheduleCache()
+    first = cache.get(key)
+
+    assert first == round_keys
+    assert cache.get(bytearray(key)) is first
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_entry_budget():
+    cache = KeyScheduleCache(max_entries=2)
+    keys = [bytes([x]) * 32 for x in range(3)]
+
+    for key in keys:
+        cache.get(key)
+    # The least recently used key went first.
+    cache.get(keys[2])
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert not cache.invalidate(keys[0])
+    assert cache.invalidate(keys[1])
+    assert len(cache) == 1
+
+
+def test_byte_budget(round_keys):
+    size = schedule_size(round_keys)
+    cache = KeyScheduleCache(max_bytes=2 * size)
+
+    for x in range(4):
+        cache.get(bytes([x]) * 32)
+
+    assert len(cache) == 2
+    assert cache.size <= 2 * size
+
+    cache.configure(max_entries=1)
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_expand_key_forms(key, round_keys):
+    assert expand_key(round_keys) is round_keys
+
+    for form in (key, bytearray(key), memoryview(key)):
+        assert expand_key(form) == round_keys
+
+
+def test_expand_key_arrays(rng, key, round_keys):
+    np = pytest.importorskip("numpy")
+    from fragment.vectorized import key_schedule_batch, prepare_round_keys
+
+    block = rng.randbytes(32)
+    expected = encrypt(data=block, round_keys=round_keys)
+
+    for schedule in (
+        prepare_round_keys(round_keys),
+        key_schedule_batch([key])[0],
+        np.asarray(round_keys, dtype=np.uint32),
+    ):
+        assert expand_key(schedule) == round_keys
+        assert encrypt(data=block, round_keys=schedule) == expected
+
+
+def test_expand_key_rejects_partial_schedules(key, round_keys):
+    np = pytest.importorskip("numpy")
+
+    for array in (
+        np.frombuffer(key, dtype=np.uint8),
+        np.asarray(round_keys[:4], dtype=np.uint32),
+        np.zeros(264, dtype=np.uint32),
+    ):
+        with pytest.raises(ValueError):
+            expand_key(array)
+
+
+@pytest.mark.parametrize("value", (tuple(key_schedule(bytes(32))), "key", None, 7))
+def test_expand_key_rejects_other_types(value):
+    with pytest.raises(TypeError):
+        expand_key(value)
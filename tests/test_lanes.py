@@ -0,0 +1,38 @@
+"""Big-integer lane engine against the scalar cipher."""
+
+import pytest
+
+from fragment import lanes
+
+from .conftest import SIZES
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+@pytest.mark.parametrize("width", (1, 3, lanes.DEFAULT_LANES))
+def test_matches_scalar(rng, round_keys, scalar, blocks, width):
+    data = rng.randbytes(32 * blocks)
+    encrypted = lanes.encrypt_blocks(data, round_keys, lanes=width)
+
+    assert encrypted == scalar(data, round_keys)
+    assert lanes.decrypt_blocks(encrypted, round_keys, lanes=width) == data
+
+
+def test_carry_heavy_blocks(round_keys, scalar):
+    # All-ones words overflow every addition into the guard bits.
+    data = b"\xff" * 32 * 5 + bytes(32) * 2
+
+    assert lanes.encrypt_blocks(data, round_keys, lanes=4) == scalar(data, round_keys)
+
+
+def test_buffer_types_and_key(rng, key, round_keys, scalar):
+    data = rng.randbytes(32 * 3)
+    expected = scalar(data, round_keys)
+
+    for buffer in (bytearray(data), memoryview(data)):
+        assert lanes.encrypt_blocks(buffer, key) == expected
+
+
+@pytest.mark.parametrize("length", (1, 31, 33))
+def test_partial_block_rejected(round_keys, length):
+    with pytest.raises(ValueError):
+        lanes.encrypt_blocks(bytes(length), round_keys)
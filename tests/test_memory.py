@@ -0,0 +1,57 @@
+"""Benchmark operations against the memory budgets in benchmarks/memory.json."""
+
+import json
+import os
+import sys
+
+import pytest
+
+BENCHMARKS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"
+)
+sys.path.insert(0, BENCHMARKS)
+
+import memory  # noqa: E402
+import suite  # noqa: E402
+
+with open(memory.BUDGETS) as file:
+    BUDGETS = json.load(file)
+
+
+@pytest.fixture(scope="module")
+def operations() -> dict:
+    return memory.operations()
+
+
+@pytest.mark.parametrize("name", sorted(BUDGETS))
+def test_within_budget(operations, name):
+    if name not in operations:
+        pytest.skip(f"{name} is not available here")
+
+    function, _ = operations[name]
+    result = memory.measure(function)
+
+    assert set(result) == set(BUDGETS[name])
+    assert memory.check({name: result}, BUDGETS) == []
+
+
+def test_budgets_cover_every_operation(operations):
+    assert set(operations) <= set(BUDGETS)
+
+
+def test_per_block_engines_use_their_smallest_batch(operations):
+    for engine in suite.PER_BLOCK_ENGINES:
+        for size in suite.SCALAR_BATCH_SIZES[1:]:
+            assert f"bulk.{engine}.{size}" not in set(operations) | set(BUDGETS)
+
+
+def test_allocated_counts_freed_memory():
+    def churn():
+        for _ in range(10):
+            bytes(1000)
+
+    result = memory.measure(churn)
+
+    assert result["retained"] < 1000
+    assert result["peak"] < 2000
+    assert result["allocated"] >= 10 * 1000
@@ -0,0 +1,125 @@
+"""Runtime metrics: recording, per-thread shards and the Prometheus text."""
+
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from fragment import integrity, lanes, metrics
+from fragment.cipher import Fragment256
+
+# The cipher only reaches NumPy through fragment.vectorized.
+NUMPY_MODULES = ()
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.enable()
+    yield registry
+    metrics.disable()
+
+
+def test_disabled_records_nothing(rng, round_keys):
+    assert not metrics.enabled()
+
+    lanes.encrypt_blocks(rng.randbytes(64), round_keys)
+
+    assert 'fragment_bytes_total{operation="encrypt"' not in metrics.render()
+
+
+def test_enable_returns_the_active_registry(registry):
+    assert metrics.enabled()
+    assert metrics.enable() is registry
+
+
+def test_cipher_operation_labels(registry, engine, rng, key):
+    cipher = Fragment256(key)
+    cipher.decrypt_blocks(cipher.encrypt_blocks(rng.randbytes(96)))
+    cipher.decrypt_blocks(rng.randbytes(32))
+
+    snapshot = registry.snapshot()
+    assert snapshot["bytes"] == {("encrypt", engine): 96, ("decrypt", engine): 128}
+    assert snapshot["calls"] == {("encrypt", engine): 1, ("decrypt", engine): 2}
+
+
+def test_every_key_schedule_is_observed(registry, key):
+    Fragment256(key)
+    integrity.mac_key(key, b"nonce")
+
+    assert registry.snapshot()["key_schedule"]["count"] == 2
+
+
+def test_key_schedule_batch_is_observed_per_key(registry, key):
+    vectorized = pytest.importorskip("fragment.vectorized")
+
+    vectorized.key_schedule_batch([key, key, bytes(8)])
+
+    histogram = registry.snapshot()["key_schedule"]
+    assert histogram["count"] == 3
+    assert sum(histogram["buckets"]) == 3
+
+
+def test_finished_threads_are_retired(registry):
+    registry.record_bytes("encrypt", "lanes", 1)
+    barrier = threading.Barrier(5)
+
+    def work():
+        registry.record_bytes("encrypt", "lanes", 32)
+        registry.observe_key_schedule(0.003)
+        barrier.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    assert len(registry._shards) == 5
+
+    for thread in threads:
+        thread.join()
+
+    # Only the shard of this thread is left; the others' counts are kept.
+    assert len(registry._shards) == 1
+    snapshot = registry.snapshot()
+    assert snapshot["bytes"] == {("encrypt", "lanes"): 129}
+    assert snapshot["calls"] == {("encrypt", "lanes"): 5}
+    assert snapshot["key_schedule"]["count"] == 4
+    assert snapshot["key_schedule"]["buckets"][2] == 4
+
+
+def test_render(registry):
+    registry.record_bytes("encrypt", "numpy", 64)
+    registry.record_bytes("encrypt", "numpy", 32)
+    for seconds in (0.0005, 0.003, 5.0):
+        registry.observe_key_schedule(seconds)
+
+    lines = metrics.render().splitlines()
+
+    assert 'fragment_bytes_total{operation="encrypt",engine="numpy"} 96' in lines
+    assert 'fragment_calls_total{operation="encrypt",engine="numpy"} 2' in lines
+    assert 'fragment_key_schedule_seconds_bucket{le="0.001"} 1' in lines
+    assert 'fragment_key_schedule_seconds_bucket{le="0.005"} 2' in lines
+    assert 'fragment_key_schedule_seconds_bucket{le="1.0"} 2' in lines
+    assert 'fragment_key_schedule_seconds_bucket{le="+Inf"} 3' in lines
+    assert "fragment_key_schedule_seconds_count 3" in lines
+    assert "# TYPE fragment_key_cache_hits_total counter" in lines
+
+
+def test_serve(registry):
+    registry.record_bytes("decrypt", "lanes", 32)
+    server = metrics.serve(port=0)
+    url = f"http://{metrics.DEFAULT_HOST}:{server.server_port}"
+
+    try:
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+            body = response.read().decode()
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{url}/other")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'fragment_bytes_total{operation="decrypt",engine="lanes"} 32' in body
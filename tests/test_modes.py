@@ -0,0 +1,99 @@
+"""Block modes against the scalar cipher."""
+
+import pytest
+
+from fragment import modes
+from fragment.fragment_256 import encrypt, i2b
+
+from .conftest import SIZES
+
+NUMPY_MODULES = (modes,)
+
+
+def xor(x: bytes, y: bytes) -> bytes:
+    return bytes(a ^ b for a, b in zip(x, y))
+
+
+def reference_cbc(data: bytes, round_keys: list, iv: bytes) -> bytes:
+    state, out = iv, b""
+
+    for x in range(0, len(data), 32):
+        state = i2b(encrypt(data=xor(data[x : x + 32], state), round_keys=round_keys))
+        out += state
+
+    return out
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+def test_ecb(engine, rng, round_keys, scalar, blocks):
+    data = rng.randbytes(32 * blocks)
+    encrypted = modes.ecb_encrypt(data, round_keys)
+
+    assert encrypted == scalar(data, round_keys)
+    assert modes.ecb_decrypt(encrypted, round_keys) == data
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+@pytest.mark.parametrize("unroll", (False, True))
+def test_cbc(engine, rng, round_keys, monkeypatch, blocks, unroll):
+    if unroll:
+        monkeypatch.setattr(modes, "UNROLL_MIN_BLOCKS", 1)
+
+    data = rng.randbytes(32 * blocks)
+    iv = rng.randbytes(32)
+    encrypted = modes.cbc_encrypt(data, round_keys, iv)
+
+    assert encrypted == reference_cbc(data, round_keys, iv)
+    assert modes.cbc_decrypt(encrypted, round_keys, iv) == data
+
+
+@pytest.mark.parametrize("length", (32, 33, 63, 64, 65, 95, 96, 97, 200))
+def test_cts_round_trip(engine, rng, key, length):
+    data = rng.randbytes(length)
+    iv = rng.randbytes(32)
+    encrypted = modes.cbc_cts_encrypt(data, key, iv)
+
+    assert len(encrypted) == length
+    assert modes.cbc_cts_decrypt(bytearray(encrypted), key, iv) == data
+
+
+@pytest.mark.parametrize("length", (33, 50, 63, 64, 96, 100))
+def test_cts_layout(engine, rng, round_keys, length):
+    data = rng.randbytes(length)
+    iv = rng.randbytes(32)
+    padded = data + bytes(-length % 32)
+    chained = reference_cbc(padded, round_keys, iv)
+    tail = length - (length - 1) // 32 * 32
+
+    # CS3: CBC over the zero padded message, last two blocks swapped and the
+    # block before last cut to the length of the final partial block.
+    expected = chained[:-64] + chained[-32:] + chained[-64:-32][:tail]
+
+    assert modes.cbc_cts_encrypt(data, round_keys, iv) == expected
+
+
+def test_single_block_cts_is_cbc(rng, round_keys):
+    data = rng.randbytes(32)
+    iv = rng.randbytes(32)
+
+    assert modes.cbc_cts_encrypt(data, round_keys, iv) == modes.cbc_encrypt(
+        data, round_keys, iv
+    )
+
+
+def test_invalid_arguments(round_keys):
+    for function in (modes.ecb_encrypt, modes.ecb_decrypt):
+        with pytest.raises(ValueError):
+            function(bytes(33), round_keys)
+
+    for function in (modes.cbc_encrypt, modes.cbc_decrypt):
+        with pytest.raises(ValueError):
+            function(bytes(33), round_keys, bytes(32))
+        with pytest.raises(ValueError):
+            function(bytes(32), round_keys, bytes(31))
+
+    for function in (modes.cbc_cts_encrypt, modes.cbc_cts_decrypt):
+        with pytest.raises(ValueError):
+            function(bytes(31), round_keys, bytes(32))
+        with pytest.raises(ValueError):
+            function(bytes(40), round_keys, bytes(16))
@@ -0,0 +1,64 @@
+"""Multi-key batches against the scalar cipher, one key per block."""
+
+import pytest
+
+from fragment.fragment_256 import key_schedule
+
+np = pytest.importorskip("numpy")
+
+from fragment import vectorized  # noqa: E402
+
+
+@pytest.fixture
+def keys(rng):
+    return [bytes(range(32)), bytes(32), rng.randbytes(32)]
+
+
+@pytest.mark.parametrize("blocks", (0, 1, 5, 64))
+def test_matches_scalar(rng, scalar, keys, blocks):
+    data = rng.randbytes(32 * blocks)
+    key_index = [rng.randrange(len(keys)) for _ in range(blocks)]
+    table = vectorized.key_schedule_batch(keys)
+
+    expected = b"".join(
+        scalar(data[32 * x : 32 * x + 32], key_schedule(encryption_key=keys[k]))
+        for x, k in enumerate(key_index)
+    )
+    encrypted = vectorized.encrypt_blocks_multikey(data, key_index, table)
+
+    assert encrypted == expected
+    assert vectorized.decrypt_blocks_multikey(encrypted, key_index, table) == data
+
+
+def test_table_shapes(rng, keys):
+    data = rng.randbytes(32 * 6)
+    key_index = np.array([2, 0, 1, 1, 0, 2])
+    flat = vectorized.key_schedule_batch(keys)
+    nested = np.stack(
+        [np.asarray(key_schedule(encryption_key=k), dtype=np.uint32) for k in keys]
+    )
+
+    assert vectorized.encrypt_blocks_multikey(
+        data, key_index, nested
+    ) == vectorized.encrypt_blocks_multikey(data, key_index, flat)
+
+
+def test_single_key_matches_encrypt_blocks(rng, key, round_keys):
+    blocks = vectorized.to_blocks(rng.randbytes(32 * 4))
+    table = vectorized.key_schedule_batch([key])
+    encrypted = vectorized.encrypt_blocks_multikey(blocks, np.zeros(4, int), table)
+
+    assert np.array_equal(encrypted, vectorized.encrypt_blocks(blocks, round_keys))
+
+
+@pytest.mark.parametrize("index", (-1, 3))
+def test_key_index_out_of_range(rng, keys, index):
+    data = rng.randbytes(32 * 3)
+    table = vectorized.key_schedule_batch(keys)
+
+    for function in (
+        vectorized.encrypt_blocks_multikey,
+        vectorized.decrypt_blocks_multikey,
+    ):
+        with pytest.raises(ValueError):
+            function(data, [0, index, 1], table)
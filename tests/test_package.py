@@ -0,0 +1,42 @@
+"""Lazy package exports."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import fragment
+
+SOURCE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+)
+
+
+@pytest.mark.parametrize("name", sorted(fragment._EXPORTS))
+def test_exports_resolve(name):
+    if fragment._EXPORTS[name] == "vectorized":
+        pytest.importorskip("numpy")
+
+    assert getattr(fragment, name) is getattr(
+        getattr(fragment, fragment._EXPORTS[name]), name
+    )
+
+
+def test_unknown_name():
+    with pytest.raises(AttributeError):
+        fragment.does_not_exist
+
+
+def test_import_is_cheap():
+    script = "import sys, fragment; print('numpy' in sys.modules, end='')"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": SOURCE},
+        check=True,
+    )
+
+    assert result.stdout == "False"
+    assert result.stderr == ""
@@ -0,0 +1,86 @@
+"""Persistent worker pool against the scalar cipher."""
+
+import time
+
+import pytest
+
+from fragment.pool import CipherPool
+
+from .conftest import SIZES
+
+TIMEOUT = 30
+
+
+@pytest.fixture
+def pool():
+    with CipherPool(workers=2, slab_size=64, max_keys=2) as pool:
+        yield pool
+
+
+def kill(pool, worker):
+    pool._processes[worker].kill()
+
+    # Segments sent before the pool notices are failed, not retried.
+    deadline = time.monotonic() + TIMEOUT
+    while pool._alive[worker] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_matches_scalar(rng, round_keys, scalar, pool):
+    for blocks in SIZES:
+        data = rng.randbytes(32 * blocks)
+        encrypted = pool.encrypt(data, round_keys).result(TIMEOUT)
+
+        assert encrypted == scalar(data, round_keys)
+        assert pool.decrypt(encrypted, round_keys).result(TIMEOUT) == data
+
+
+def test_key_lru(rng, scalar, pool):
+    keys = [rng.randbytes(32) for _ in range(5)]
+    data = rng.randbytes(32 * 5)
+    # Cycling through more keys than the workers hold evicts and resends them.
+    order = keys * 2 + keys[::-1]
+
+    futures = [pool.encrypt(data, key) for key in order]
+    for key, future in zip(order, futures):
+        assert future.result(TIMEOUT) == scalar(data, key)
+
+    assert len(pool._key_ids) == 2
+    assert all(len(known) <= 2 for known in pool._known_keys)
+
+
+def test_invalid_key_fails_only_its_job(rng, round_keys, scalar, pool):
+    data = rng.randbytes(32 * 3)
+
+    with pytest.raises(TypeError):
+        pool.encrypt(data, [[1]]).result(TIMEOUT)
+    with pytest.raises(RuntimeError):
+        pool.encrypt(data, [[[1, 2, 3, 4]]]).result(TIMEOUT)
+
+    assert pool.encrypt(data, round_keys).result(TIMEOUT) == scalar(data, round_keys)
+
+
+def test_dead_workers(rng, round_keys, scalar, pool):
+    data = rng.randbytes(32 * 8)
+
+    kill(pool, 0)
+    assert pool.encrypt(data, round_keys).result(TIMEOUT) == scalar(data, round_keys)
+
+    kill(pool, 1)
+    with pytest.raises(RuntimeError):
+        pool.encrypt(data, round_keys).result(TIMEOUT)
+
+
+def test_invalid_arguments(round_keys):
+    with pytest.raises(ValueError):
+        CipherPool(workers=1, slab_size=16)
+    with pytest.raises(ValueError):
+        CipherPool(workers=1, max_keys=0)
+
+    pool = CipherPool(workers=1)
+    with pytest.raises(ValueError):
+        pool.encrypt(bytes(33), round_keys)
+
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.encrypt(bytes(32), round_keys)
@@ -0,0 +1,73 @@
+"""Workload profiling grouped by cipher primitive."""
+
+import pytest
+
+from fragment import profiling
+
+# Serial backends that need no optional dependency.
+ENGINES = ("scalar", "unrolled", "lanes")
+
+
+@pytest.mark.parametrize("name", profiling.WORKLOADS)
+def test_workloads_run(name):
+    profiling.workload(name, engine="lanes", size=100)()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_match(rng, round_keys, scalar, engine):
+    data = rng.randbytes(64)
+    function = profiling._engine(engine)
+
+    assert function(data, round_keys) == scalar(data, round_keys)
+
+
+def test_cprofile(tmp_path):
+    output = str(tmp_path / "profile")
+    function = profiling.workload("block", iterations=3)
+
+    groups = profiling.profile(function, output)
+
+    assert {"arx_mixer", "pht_mixer", "round_function"} <= set(groups)
+    assert (tmp_path / "profile.pstats").exists()
+
+    lines = (tmp_path / "profile.folded").read_text().splitlines()
+    assert lines
+    assert all(line.startswith("profiling.workload_root") for line in lines)
+    assert "fragment_256.arx_mixer" in "\n".join(lines)
+
+
+def test_sampling(tmp_path):
+    function = profiling.workload("key_schedule", iterations=20)
+
+    groups = profiling.profile(
+        function, str(tmp_path / "profile"), profiler="sampling", interval=0.0005
+    )
+
+    assert sum(groups.values()) > 0
+    assert not (tmp_path / "profile.pstats").exists()
+
+
+def test_group_and_format():
+    stacks = profiling.Counter(
+        {
+            ((profiling.__file__, "workload_root"),): 1,
+            (
+                (profiling.__file__, "workload_root"),
+                ("/elsewhere/x.py", "arx_mixer"),
+            ): 2,
+            ((profiling.__file__.replace("profiling", "lanes"), "_arx_mixer"),): 3,
+        }
+    )
+    groups = profiling.group(stacks)
+
+    assert groups == {"other": 3, "arx_mixer": 3}
+    assert "50.0%" in profiling.format_groups(groups, "us")
+
+
+def test_unknown_names():
+    with pytest.raises(ValueError):
+        profiling.workload("nothing")
+    with pytest.raises(ValueError):
+        profiling._engine("nothing")
+    with pytest.raises(ValueError):
+        profiling.profile(lambda: None, "unused", profiler="nothing")
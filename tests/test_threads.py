@@ -0,0 +1,54 @@
+"""Thread pool engine against the scalar cipher."""
+
+import pytest
+
+from fragment import threads
+
+from .conftest import SIZES
+
+
+@pytest.fixture(params=(False, True))
+def parallel(request, monkeypatch):
+    """Runs a test serially and again split across threads"""
+    monkeypatch.setattr(threads, "MIN_BLOCKS_PER_THREAD", 1)
+    monkeypatch.setattr(threads, "_parallel", {})
+
+    name, _ = threads.serial_engine()
+    for workers in (2, 3):
+        threads._parallel[name, workers] = request.param
+
+    return request.param
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+@pytest.mark.parametrize("workers", (1, 2, 3))
+def test_matches_scalar(rng, round_keys, scalar, parallel, blocks, workers):
+    data = rng.randbytes(32 * blocks)
+    encrypted = threads.encrypt_blocks(data, round_keys, workers)
+
+    assert encrypted == scalar(data, round_keys)
+    assert threads.decrypt_blocks(encrypted, round_keys, workers) == data
+
+
+def test_partial_block_rejected(round_keys):
+    with pytest.raises(ValueError):
+        threads.encrypt_blocks(bytes(33), round_keys, 2)
+
+
+def test_executor_per_worker_count():
+    assert threads.executor(2) is threads.executor(2)
+    assert threads.executor(3) is not threads.executor(2)
+    assert threads.executor(3)._max_workers == 3
+    assert threads.executor() is threads.executor(threads.default_workers())
+
+
+def test_parallelism_measured_per_worker_count(monkeypatch):
+    monkeypatch.setattr(threads, "MIN_BLOCKS_PER_THREAD", 16)
+    monkeypatch.setattr(threads, "_parallel", {})
+    name, _ = threads.serial_engine()
+
+    assert not threads.threads_parallel(1)
+    threads.threads_parallel(2)
+    threads.threads_parallel(3)
+
+    assert set(threads._parallel) == {(name, 2), (name, 3)}
@@ -0,0 +1,49 @@
+"""Generated straight-line engine against the scalar cipher."""
+
+from fragment import unrolled
+from fragment.fragment_256 import b2i, decrypt, encrypt, key_schedule
+
+
+def test_matches_scalar(rng, round_keys):
+    for _ in range(8):
+        block = rng.randbytes(32)
+
+        assert unrolled.encrypt(block, round_keys) == encrypt(
+            data=block, round_keys=round_keys
+        )
+        assert unrolled.decrypt(block, round_keys) == decrypt(
+            data=block, round_keys=round_keys
+        )
+
+
+def test_edge_blocks(round_keys):
+    for block in (bytes(32), b"\xff" * 32):
+        words = b2i(string=block, length=4)
+
+        assert unrolled.encrypt(words, round_keys) == encrypt(
+            data=words, round_keys=round_keys
+        )
+
+
+def test_key_forms(rng, key, round_keys):
+    block = rng.randbytes(32)
+    expected = encrypt(data=block, round_keys=round_keys)
+
+    assert unrolled.encrypt(block, key) == expected
+    assert unrolled.encrypt(block, bytearray(key)) == expected
+
+
+def test_compiled_once_per_schedule(round_keys):
+    assert unrolled.compile_encryptor(round_keys) is unrolled.compile_encryptor(
+        key_schedule(encryption_key=bytes(range(32)))
+    )
+    assert unrolled.compile_encryptor(round_keys) is not unrolled.compile_encryptor(
+        bytes(32)
+    )
+
+
+def test_generated_source(round_keys):
+    source = unrolled.generate_source(round_keys, name="block")
+
+    assert source.startswith("def block(data):")
+    assert source.count("# Round") == len(round_keys)
@@ -0,0 +1,74 @@
+"""NumPy batch engine against the scalar cipher."""
+
+import pytest
+
+from .conftest import SIZES
+
+np = pytest.importorskip("numpy")
+
+from fragment import vectorized  # noqa: E402
+from fragment.fragment_256 import key_schedule  # noqa: E402
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+def test_encrypt_matches_scalar(rng, round_keys, scalar, blocks):
+    data = rng.randbytes(32 * blocks)
+    encrypted = vectorized.encrypt_blocks(data, round_keys)
+
+    assert isinstance(encrypted, bytes)
+    assert encrypted == scalar(data, round_keys)
+    assert vectorized.decrypt_blocks(encrypted, round_keys) == data
+
+
+@pytest.mark.parametrize("blocks", SIZES)
+def test_decrypt_matches_scalar(rng, round_keys, scalar, blocks):
+    data = rng.randbytes(32 * blocks)
+
+    assert vectorized.decrypt_blocks(data, round_keys) == scalar(
+        data, round_keys, decrypting=True
+    )
+
+
+def test_buffer_types(rng, round_keys, scalar):
+    data = rng.randbytes(32 * 5)
+    expected = scalar(data, round_keys)
+
+    for buffer in (bytearray(data), memoryview(data)):
+        assert vectorized.encrypt_blocks(buffer, round_keys) == expected
+
+
+def test_array_input(rng, round_keys, scalar):
+    data = rng.randbytes(32 * 4)
+    blocks = vectorized.to_blocks(data)
+    encrypted = vectorized.encrypt_blocks(blocks, round_keys)
+
+    assert isinstance(encrypted, np.ndarray)
+    assert encrypted.shape == (4, 8)
+    assert vectorized.from_blocks(encrypted) == scalar(data, round_keys)
+    assert np.array_equal(vectorized.decrypt_blocks(encrypted, round_keys), blocks)
+
+
+def test_round_key_forms(rng, key, round_keys, scalar):
+    data = rng.randbytes(32 * 3)
+    expected = scalar(data, round_keys)
+
+    for form in (key, round_keys, np.asarray(round_keys, dtype=np.uint32)):
+        assert vectorized.encrypt_blocks(data, form) == expected
+
+
+@pytest.mark.parametrize("length", (1, 31, 33, 65))
+def test_partial_block_rejected(round_keys, length):
+    with pytest.raises(ValueError):
+        vectorized.encrypt_blocks(bytes(length), round_keys)
+
+
+def test_key_schedule_batch(rng, round_keys):
+    keys = [bytes(range(32)), bytes(32), rng.randbytes(16), rng.randbytes(48), b""]
+    batch = vectorized.key_schedule_batch(keys)
+
+    assert batch.shape == (len(keys), 256)
+    assert vectorized.prepare_round_keys(batch[0]).tolist() == round_keys
+    for row, key in zip(batch, keys):
+        assert vectorized.prepare_round_keys(row).tolist() == key_schedule(
+            encryption_key=key
+        )